@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException
-from auth.dependencies import get_current_admin
+from auth.dependencies import get_current_admin, revocation_store
 from db.mongo import db
 from typing import List
 
@@ -21,6 +21,5 @@ async def get_logs(admin=Depends(get_current_admin)):
 
 @router.post("/revoke-token", summary="Revoke a user token", description="Revoke a user's token to prevent further access. Admin access required.")
 async def revoke_token(token: str, admin=Depends(get_current_admin)):
-    # Implement token revocation logic, e.g., add token to blacklist collection
-    # For now, just a placeholder response
-    return {"message": f"Token {token} revoked successfully."}
+    expires_at = await revocation_store.revoke(token)
+    return {"message": "Token revoked successfully.", "expires_at": expires_at.isoformat() + "Z"}
@@ -1,4 +1,6 @@
-from fastapi import APIRouter, Query, HTTPException, Depends
+import asyncio
+from fastapi import APIRouter, Query, HTTPException, Depends, Path
+from fastapi.responses import PlainTextResponse, Response
 from typing import List, Optional
 from apps.backend.models import AdminStatsSummary, AdminPredictionOut, AdminPaymentOut
 from apps.backend.services.admin_service import (
@@ -8,39 +10,94 @@ from apps.backend.services.admin_service import (
     get_admin_users,
     get_admin_clients,
 )
+from apps.backend.services.analytics_export import AGGREGATIONS, AnalyticsExporter
+from apps.backend.services.payment_store import PaymentStore
+from auth.dependencies import get_current_admin
+from dependencies import get_analytics_exporter, get_payment_store
+from utils.fast_json import ORJSONResponse
+from utils.profiling import profile_store, render_flamegraph_svg
 
 router = APIRouter()
 
-def is_admin_user():
-    # TODO: Implement actual admin check logic
-    return True
-
 @router.get("/stats/summary", response_model=AdminStatsSummary)
-async def stats_summary(admin: bool = Depends(is_admin_user)):
-    if not admin:
-        raise HTTPException(status_code=403, detail="Not authorized")
-    return get_admin_stats_summary()
+async def stats_summary(admin=Depends(get_current_admin), store: PaymentStore = Depends(get_payment_store)):
+    return await get_admin_stats_summary(store)
 
 @router.get("/predictions", response_model=List[AdminPredictionOut])
-async def list_predictions(page: int = Query(1, ge=1), page_size: int = Query(20, ge=1, le=100), admin: bool = Depends(is_admin_user)):
-    if not admin:
-        raise HTTPException(status_code=403, detail="Not authorized")
-    return get_admin_predictions(page, page_size)
+async def list_predictions(page: int = Query(1, ge=1), page_size: int = Query(20, ge=1, le=100), admin=Depends(get_current_admin)):
+    # Already validated into AdminPredictionOut by the service
+    return ORJSONResponse(get_admin_predictions(page, page_size))
 
 @router.get("/payments", response_model=List[AdminPaymentOut])
-async def list_payments(page: int = Query(1, ge=1), page_size: int = Query(20, ge=1, le=100), admin: bool = Depends(is_admin_user)):
-    if not admin:
-        raise HTTPException(status_code=403, detail="Not authorized")
-    return get_admin_payments(page, page_size)
+async def list_payments(
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=100),
+    admin=Depends(get_current_admin),
+    store: PaymentStore = Depends(get_payment_store),
+):
+    return ORJSONResponse(await get_admin_payments(store, page, page_size))
 
 @router.get("/users")
-async def list_users(admin: bool = Depends(is_admin_user)):
-    if not admin:
-        raise HTTPException(status_code=403, detail="Not authorized")
-    return get_admin_users()
+async def list_users(admin=Depends(get_current_admin)):
+    return ORJSONResponse(get_admin_users())
 
 @router.get("/clients")
-async def list_clients(admin: bool = Depends(is_admin_user)):
-    if not admin:
-        raise HTTPException(status_code=403, detail="Not authorized")
-    return get_admin_clients()
+async def list_clients(admin=Depends(get_current_admin)):
+    return ORJSONResponse(get_admin_clients())
+
+@router.get("/profiles")
+async def list_profiles(admin=Depends(get_current_admin)):
+    """Routes with profiling samples, collected when PROFILING_ENABLED is set."""
+    return profile_store.routes()
+
+@router.get("/profiles/flamegraph")
+async def profile_flamegraph(
+    route: str = Query(..., description="Route template, e.g. /kp-chart/"),
+    format: str = Query("svg", pattern="^(svg|folded)$"),
+    admin=Depends(get_current_admin),
+):
+    """Aggregated flame graph for one route, as SVG or as folded stacks for external tools."""
+    folded = profile_store.folded(route)
+    if not folded:
+        raise HTTPException(status_code=404, detail="No samples for this route")
+    if format == "folded":
+        return PlainTextResponse("".join(f"{stack} {count}\n" for stack, count in sorted(folded.items())))
+    return Response(render_flamegraph_svg(folded, route), media_type="image/svg+xml")
+
+@router.delete("/profiles")
+async def clear_profiles(admin=Depends(get_current_admin)):
+    profile_store.clear()
+    return {"message": "Profiles cleared"}
+
+@router.post("/analytics/export")
+async def export_analytics(admin=Depends(get_current_admin), exporter: AnalyticsExporter = Depends(get_analytics_exporter)):
+    """Export new predictions and payments and a clients snapshot to the Parquet datasets now."""
+    written = await exporter.export()
+    if written is None:
+        raise HTTPException(status_code=409, detail="An analytics export is already running")
+    return {"exported": written}
+
+@router.get("/analytics/{dataset}")
+async def query_analytics(
+    dataset: str = Path(..., pattern="^(predictions|payments|clients)$"),
+    group_by: Optional[str] = Query(None, description="Comma-separated columns, e.g. astrologer_id,month"),
+    metrics: str = Query("count", description=f"Comma-separated aggregation:column pairs ({', '.join(AGGREGATIONS)}); bare count counts rows"),
+    from_month: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$"),
+    to_month: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$"),
+    admin=Depends(get_current_admin),
+    exporter: AnalyticsExporter = Depends(get_analytics_exporter),
+):
+    """
+    Aggregate over the exported Parquet datasets, never the operational store.
+    Data is as fresh as the last export.
+    """
+    columns = [column.strip() for column in (group_by or "").split(",") if column.strip()]
+    pairs = []
+    for metric in metrics.split(","):
+        aggregation, _, column = metric.strip().partition(":")
+        pairs.append((aggregation, column or "*"))
+    try:
+        rows = await asyncio.to_thread(exporter.query, dataset, columns, pairs, from_month, to_month)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return ORJSONResponse(rows)
@@ -1,29 +1,126 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-import openai
+from typing import TYPE_CHECKING, AsyncIterator, List, Optional
+from apps.backend.services.chat_cache import ChatResponseCache
+from apps.backend.services.chat_context import get_chart_context
+from utils.tracing import span, tracer, traced
+import asyncio
+import json
+import logging
 import os
 
-# Load OpenAI API key from environment variables
-openai.api_key = os.getenv("OPENAI_API_KEY")
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+logger = logging.getLogger(__name__)
+
+OPENAI_CHAT_MODEL = os.getenv("OPENAI_CHAT_MODEL", "gpt-3.5-turbo")
+OPENAI_EMBEDDING_MODEL = os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-ada-002")
 
 router = APIRouter()
 
+response_cache = ChatResponseCache()
+_client: Optional["AsyncOpenAI"] = None
+
+def get_openai_client() -> "AsyncOpenAI":
+    """
+    Shared async OpenAI client, created on first use. OPENAI_BASE_URL can point
+    it at a compatible server (or a local fake in tests). The SDK is imported
+    here rather than at module level since it is slow to import.
+    """
+    global _client
+    if _client is None:
+        from openai import AsyncOpenAI
+        _client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), base_url=os.getenv("OPENAI_BASE_URL") or None)
+    return _client
+
 class ChatRequest(BaseModel):
     question: str
+    # Stream tokens back as server-sent events instead of one JSON body.
+    stream: bool = False
+    # Reference a stored chart instead of pasting it into the question.
+    client_id: Optional[str] = None
+    prediction_id: Optional[str] = None
 
 class ChatResponse(BaseModel):
     answer: str
 
+def _sse(payload) -> str:
+    return f"data: {json.dumps(payload)}\n\n"
+
+async def _embed(question: str) -> Optional[List[float]]:
+    try:
+        with span("openai.embeddings", model=OPENAI_EMBEDDING_MODEL):
+            response = await get_openai_client().embeddings.create(model=OPENAI_EMBEDDING_MODEL, input=question)
+        return response.data[0].embedding
+    except Exception as e:
+        # The semantic tier is an optimisation; fall through to a completion on failure.
+        logger.warning(f"Embedding lookup failed: {e}")
+        return None
+
+async def _stream_answer(messages: List[dict], question: str, context: str, embedding) -> AsyncIterator[str]:
+    parts = []
+    # The body is sent after the endpoint returned, so this span is ended by hand rather than nested.
+    stream_span = tracer.start_span("openai.chat_completion", model=OPENAI_CHAT_MODEL, stream=True) if tracer.enabled else None
+    try:
+        stream = await get_openai_client().chat.completions.create(model=OPENAI_CHAT_MODEL, messages=messages, stream=True)
+        async for chunk in stream:
+            token = chunk.choices[0].delta.content if chunk.choices else None
+            if token:
+                parts.append(token)
+                yield _sse({"token": token})
+    except Exception as e:
+        logger.error(f"Chat stream failed: {e}")
+        if stream_span is not None:
+            stream_span.record_exception(e)
+        yield _sse({"error": f"Error communicating with OpenAI: {str(e)}"})
+        return
+    finally:
+        if stream_span is not None:
+            stream_span.set_attribute("tokens", len(parts))
+            tracer.end_span(stream_span)
+    response_cache.set(question, "".join(parts), context, embedding)
+    yield "data: [DONE]\n\n"
+
+async def _cached_stream(answer: str) -> AsyncIterator[str]:
+    yield _sse({"token": answer})
+    yield "data: [DONE]\n\n"
+
+def _stream_response(body: AsyncIterator[str]) -> StreamingResponse:
+    return StreamingResponse(body, media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
 @router.post("/chat", response_model=ChatResponse)
+@traced("chat_endpoint")
 async def chat_endpoint(request: ChatRequest):
+    chart = None
+    if request.client_id or request.prediction_id:
+        with span("chat.chart_context"):
+            chart = await asyncio.to_thread(get_chart_context, request.client_id, request.prediction_id)
+        if chart is None:
+            raise HTTPException(status_code=404, detail="Chart not found")
+    # Answers are scoped to the chart they were given, so one client's answer is never served to another.
+    context = chart.version if chart else ""
+    answer = response_cache.get(request.question, context)
+    embedding = None
+    if answer is None and response_cache.semantic:
+        embedding = await _embed(request.question)
+        if embedding is not None:
+            answer = response_cache.get_similar(embedding, context)
+    if answer is not None:
+        return _stream_response(_cached_stream(answer)) if request.stream else {"answer": answer}
+    response_cache.record_miss()
+
+    messages = [{"role": "user", "content": request.question}]
+    if chart:
+        messages.insert(0, {"role": "system", "content": f"Answer using this KP astrology chart.\n{chart.text}"})
+    if request.stream:
+        return _stream_response(_stream_answer(messages, request.question, context, embedding))
     try:
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "user", "content": request.question}
-            ]
-        )
-        answer = response.choices[0].message["content"]
-        return {"answer": answer}
+        with span("openai.chat_completion", model=OPENAI_CHAT_MODEL, stream=False):
+            response = await get_openai_client().chat.completions.create(model=OPENAI_CHAT_MODEL, messages=messages)
+        answer = response.choices[0].message.content
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error communicating with OpenAI: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error communicating with OpenAI: {str(e)}")
+    response_cache.set(request.question, answer, context, embedding)
+    return {"answer": answer}
@@ -1,38 +1,157 @@
-from fastapi import APIRouter, HTTPException
-from apps.backend.models import KPPredictionRequest, KPPredictionResult
+import asyncio
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Path, Request
+from fastapi.responses import Response, StreamingResponse
+from apps.backend.models import KPPredictionRequest, KPPredictionResult, PredictionBatchExportRequest
+from apps.backend.pdf_generator import render_prediction_pdf, report_version
+from apps.backend.services import chart_format
 from apps.backend.services.kp_chart_service import calculate_kp_chart
-from apps.backend.storage import save_prediction
+from apps.backend.services.pdf_export import stream_predictions_zip
+from apps.backend.storage import save_prediction, get_prediction, get_prediction_json
+from auth.dependencies import get_current_user
+from utils.fast_json import ORJSONResponse
+from utils.negotiation import JSON_MEDIA_TYPE, MSGPACK_MEDIA_TYPES, MsgPackResponse, negotiated_response, preferred_media_type
 
 router = APIRouter()
 
+CHART_BINARY_MEDIA_TYPE = chart_format.CHART_MEDIA_TYPE.split(";")[0]
+
 @router.post("/", response_model=KPPredictionResult)
-async def create_kp_chart_prediction(request: KPPredictionRequest):
+async def create_kp_chart_prediction(request: KPPredictionRequest, http_request: Request):
     try:
         result = calculate_kp_chart(request.name, request.birth_date)
-        save_prediction(result.dict())
-        return result
+        result.id = save_prediction(result.dict(exclude={"id"}))
+        # Built by calculate_kp_chart, so skip re-validating it against the response model
+        return negotiated_response(http_request, result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-from fastapi.responses import StreamingResponse
-from fastapi import Path
-from io import BytesIO
-from apps.backend.pdf_generator import generate_prediction_pdf
+@router.get("/{prediction_id}", response_model=KPPredictionResult)
+async def get_kp_chart_prediction(request: Request, prediction_id: str):
+    """
+    Fetch a saved chart as JSON, MessagePack or, with
+    `Accept: application/vnd.astrobalendar.kp-chart`, a one-record chart file
+    (services/chart_format.py). The JSON encoding is cached, so repeat reads are
+    not re-encoded.
+    """
+    media_type = preferred_media_type(request, (JSON_MEDIA_TYPE, *MSGPACK_MEDIA_TYPES, CHART_BINARY_MEDIA_TYPE))
+    if media_type in MSGPACK_MEDIA_TYPES or media_type == CHART_BINARY_MEDIA_TYPE:
+        prediction = get_prediction(prediction_id)
+        if prediction is None:
+            raise HTTPException(status_code=404, detail="Prediction not found")
+        if media_type in MSGPACK_MEDIA_TYPES:
+            return MsgPackResponse(prediction)
+        record = chart_format.encode_chart(prediction)
+        if record is None:
+            raise HTTPException(status_code=406, detail="Chart does not fit the binary chart format")
+        return Response(chart_format.file_header() + record, media_type=chart_format.CHART_MEDIA_TYPE)
+    encoded = get_prediction_json(prediction_id)
+    if encoded is None:
+        raise HTTPException(status_code=404, detail="Prediction not found")
+    return ORJSONResponse(encoded)
+
+@router.post("/pdf/batch")
+async def export_prediction_pdfs(request: PredictionBatchExportRequest, current_user=Depends(get_current_user)):
+    """
+    Render many prediction reports in parallel and stream them back as a ZIP archive.
+    """
+    if not request.prediction_ids:
+        raise HTTPException(status_code=400, detail="No prediction ids given")
+    stored = {prediction_id: get_prediction(prediction_id) for prediction_id in dict.fromkeys(request.prediction_ids)}
+    missing = [prediction_id for prediction_id, prediction in stored.items() if prediction is None]
+    if missing:
+        raise HTTPException(status_code=404, detail={"message": "Predictions not found", "ids": missing})
+    predictions = list(stored.values())
+    return StreamingResponse(stream_predictions_zip(predictions), media_type="application/zip", headers={
+        "Content-Disposition": "attachment; filename=predictions.zip"
+    })
+
+def _etag_matches(header: str, etag: str) -> bool:
+    candidates = [tag.strip() for tag in header.split(",")]
+    return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single `bytes=` range into inclusive (start, end). Returns None for
+    unsatisfiable ranges; multi-range requests are served as the whole file.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip() != "bytes" or "," in spec:
+        return (0, size - 1)
+    first, _, last = spec.strip().partition("-")
+    try:
+        if first == "":
+            length = int(last)
+            if length <= 0:
+                return None
+            return (max(0, size - length), size - 1)
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return (0, size - 1)
+    if start >= size or end < start:
+        return None
+    return (start, min(end, size - 1))
+
+def _last_modified(prediction: dict) -> Optional[datetime]:
+    value = prediction.get("updated_at") or prediction.get("created_at")
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
 
 @router.get("/pdf/{prediction_id}")
-async def get_prediction_pdf(prediction_id: str = Path(..., description="Prediction ID")):
-    # Placeholder: Load prediction data by ID from storage
-    # For now, return dummy data
-    prediction_data = {
-        "name": "Sample User",
-        "birth_date": "2025-05-01",
-        "planetary_positions": [
-            {"planet": "Sun", "longitude": 100.0, "house": 1},
-            {"planet": "Moon", "longitude": 150.0, "house": 2},
-        ],
-        "prediction_summary": "This is a sample prediction summary."
+async def get_prediction_pdf(request: Request, prediction_id: str = Path(..., description="Prediction ID")):
+    """
+    Download a prediction report. Responses are validated by ETag (the renderer
+    version and the hash of the prediction content) and support byte ranges so
+    clients can resume downloads.
+    """
+    prediction_data = get_prediction(prediction_id)
+    if prediction_data is None:
+        raise HTTPException(status_code=404, detail="Prediction not found")
+
+    etag = f'"{report_version(prediction_data)}"'
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "private, no-cache",
+        "Content-Disposition": f"attachment; filename=prediction_{prediction_id}.pdf",
     }
-    pdf_bytes = generate_prediction_pdf(prediction_data)
-    return StreamingResponse(BytesIO(pdf_bytes), media_type="application/pdf", headers={
-        "Content-Disposition": f"attachment; filename=prediction_{prediction_id}.pdf"
-    })
+    modified = _last_modified(prediction_data)
+    if modified:
+        headers["Last-Modified"] = format_datetime(modified, usegmt=True)
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if _etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+    elif modified and request.headers.get("if-modified-since"):
+        try:
+            since = parsedate_to_datetime(request.headers["if-modified-since"])
+            if modified.replace(microsecond=0) <= since:
+                return Response(status_code=304, headers=headers)
+        except (TypeError, ValueError):
+            pass
+
+    # Cached by report version, so repeat downloads of an unchanged report skip rendering.
+    pdf_bytes = await asyncio.to_thread(render_prediction_pdf, prediction_data)
+    size = len(pdf_bytes)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range == etag):
+        byte_range = _parse_range(range_header, size)
+        if byte_range is None:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+        start, end = byte_range
+        if (start, end) != (0, size - 1):
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            return Response(pdf_bytes[start:end + 1], status_code=206, media_type="application/pdf", headers=headers)
+
+    return Response(pdf_bytes, media_type="application/pdf", headers=headers)
@@ -1,22 +1,53 @@
-from fastapi import APIRouter, HTTPException, status
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.responses import JSONResponse
-from fastapi import Body, Path
+from fastapi import Body, Header, Path, Request
+from typing import Optional
 from apps.backend.models import PaymentRequest, PaymentResult
-from apps.backend.services.payment_service import create_checkout_session, verify_payment, initiate_upi_payment
+from apps.backend.services.payment_gateway import PaymentGateway, get_stripe
+from apps.backend.services.payment_store import PaymentStore
+from apps.backend.services.payment_service import create_checkout_session, verify_payment, initiate_upi_payment, handle_webhook
+from dependencies import get_payment_gateway, get_payment_store
 
 router = APIRouter()
 
 @router.post("/create-session")
-async def create_session(payment_request: PaymentRequest = Body(...)):
+async def create_session(
+    payment_request: PaymentRequest = Body(...),
+    gateway: PaymentGateway = Depends(get_payment_gateway),
+):
     try:
-        session_id = create_checkout_session(payment_request)
+        session_id = await create_checkout_session(gateway, payment_request)
         return {"session_id": session_id}
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Payment provider timed out")
     except Exception as e:
+        # Stripe's HTTP client raises APIConnectionError for timeouts and unreachable hosts,
+        # once the gateway has run out of retries; that is not the caller's fault.
+        if isinstance(e, get_stripe().error.APIConnectionError):
+            raise HTTPException(status_code=504, detail="Payment provider timed out")
         raise HTTPException(status_code=400, detail=str(e))
 
+@router.post("/webhook")
+async def stripe_webhook(
+    request: Request,
+    stripe_signature: Optional[str] = Header(None),
+    store: PaymentStore = Depends(get_payment_store),
+):
+    """
+    Stripe webhook receiver. Events are verified, de-duplicated by event id and
+    recorded in the payment store.
+    """
+    payload = await request.body()
+    try:
+        recorded = await handle_webhook(store, payload, stripe_signature)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"received": True, "duplicate": not recorded}
+
 @router.get("/verify/{session_id}", response_model=PaymentResult)
-async def verify_payment_status(session_id: str = Path(...)):
-    payment = verify_payment(session_id)
+async def verify_payment_status(session_id: str = Path(...), store: PaymentStore = Depends(get_payment_store)):
+    payment = await verify_payment(store, session_id)
     if not payment:
         raise HTTPException(status_code=404, detail="Payment not found or not completed")
     return payment
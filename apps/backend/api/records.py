@@ -0,0 +1,230 @@
+"""
+Firestore-backed predictions, users and events (formerly the standalone app in main.py).
+"""
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, EmailStr
+from typing import List, Optional, Dict, Any
+from datetime import datetime
+import logging
+from dependencies import get_firestore, get_prediction_writer
+from utils.firebase_utils import server_timestamp
+from utils.fast_json import ORJSONResponse, dumps
+from utils.firestore_batch import FirestoreBatchWriter
+from utils.tracing import span
+
+logger = logging.getLogger("uvicorn.error")
+
+router = APIRouter()
+
+# Models
+class PredictionRequest(BaseModel):
+    birthDate: str = Field(..., description="Birth date in ISO 8601 format")
+    birthTime: str = Field(..., description="Birth time in ISO 8601 format")
+    birthPlace: str = Field(..., description="Birth place as city name or coordinates")
+    predictionType: str = Field(..., description="Type of prediction (general, career, health, etc.)")
+
+class PredictionResponse(BaseModel):
+    predictionText: str
+    rulingPlanets: List[str]
+    chartData: dict
+    interpretationMeta: Optional[dict] = None
+
+# Prediction endpoint
+@router.post("/predict", response_model=PredictionResponse)
+async def predict(
+    prediction: PredictionRequest,
+    db=Depends(get_firestore),
+    prediction_writer: FirestoreBatchWriter = Depends(get_prediction_writer),
+):
+    """
+    Generate astrological prediction based on birth details.
+    """
+    try:
+        # Store the prediction request in Firestore
+        pred_ref = db.collection('predictions').document()
+        pred_data = {
+            **prediction.dict(),
+            'created_at': server_timestamp(),
+            'status': 'completed'
+        }
+        # The document id is assigned locally, so the response does not wait for the batch commit
+        await prediction_writer.set(pred_ref, pred_data)
+        
+        # Here you would implement the actual prediction logic
+        # This is a placeholder response
+        return {
+            "predictionText": "Sample prediction based on birth details.",
+            "rulingPlanets": ["Sun", "Moon"],
+            "chartData": {"sign": "Aries", "house": 1},
+            "interpretationMeta": {"confidence": 0.95},
+            "predictionId": pred_ref.id
+        }
+    except Exception as e:
+        logger.error(f"Prediction failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# User Management Endpoints
+class UserCreate(BaseModel):
+    name: str
+    email: EmailStr
+    password: str
+
+class UserResponse(BaseModel):
+    id: str
+    name: str
+    email: str
+    created_at: datetime
+
+@router.post("/users/", response_model=UserResponse)
+async def create_user(user: UserCreate, db=Depends(get_firestore)):
+    """Create a new user"""
+    try:
+        # Check if user already exists
+        with span("firestore.query", collection="users"):
+            existing_user = await db.collection('users').where('email', '==', user.email).limit(1).get()
+        if existing_user:
+            raise HTTPException(status_code=400, detail="Email already registered")
+            
+        # Create user in Firestore
+        user_ref = db.collection('users').document()
+        user_data = {
+            'name': user.name,
+            'email': user.email,
+            'created_at': server_timestamp(),
+            'updated_at': server_timestamp()
+        }
+        with span("firestore.set", collection="users"):
+            await user_ref.set(user_data)
+        
+        # In a real app, you would:
+        # 1. Hash the password
+        # 2. Create the user in Firebase Auth
+        # 3. Then store additional data in Firestore
+        
+        return {**user_data, 'id': user_ref.id}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"User creation failed: {str(e)}")
+        raise HTTPException(status_code=400, detail="Failed to create user")
+
+@router.get("/users/{user_id}", response_model=UserResponse)
+async def get_user(user_id: str, db=Depends(get_firestore)):
+    """Get user by ID"""
+    try:
+        user_ref = db.collection('users').document(user_id)
+        with span("firestore.get", collection="users"):
+            user = await user_ref.get()
+        if user.exists:
+            user_data = user.to_dict()
+            # Convert Firestore timestamp to datetime
+            user_data['created_at'] = user_data['created_at'].isoformat()
+            if 'updated_at' in user_data:
+                user_data['updated_at'] = user_data['updated_at'].isoformat()
+            return {**user_data, 'id': user.id}
+        raise HTTPException(status_code=404, detail="User not found")
+    except Exception as e:
+        logger.error(f"Failed to get user: {str(e)}")
+        raise HTTPException(status_code=400, detail="Failed to retrieve user")
+
+# Event Management Endpoints
+class EventCreate(BaseModel):
+    title: str
+    description: Optional[str] = None
+    event_date: datetime
+    user_id: str
+
+class EventResponse(EventCreate):
+    id: str
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
+@router.post("/events/", response_model=EventResponse)
+async def create_event(event: EventCreate, db=Depends(get_firestore)):
+    """Create a new event"""
+    try:
+        # Verify user exists
+        user_ref = db.collection('users').document(event.user_id)
+        with span("firestore.get", collection="users"):
+            user_exists = (await user_ref.get()).exists
+        if not user_exists:
+            raise HTTPException(status_code=404, detail="User not found")
+            
+        event_ref = db.collection('events').document()
+        event_data = {
+            **event.dict(),
+            'created_at': server_timestamp(),
+            'updated_at': server_timestamp()
+        }
+        with span("firestore.set", collection="events"):
+            await event_ref.set(event_data)
+        
+        # Return the created event with ID
+        return {**event_data, 'id': event_ref.id}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Event creation failed: {str(e)}")
+        raise HTTPException(status_code=400, detail="Failed to create event")
+
+EVENTS_DEFAULT_PAGE_SIZE = 100
+EVENTS_MAX_PAGE_SIZE = 1000
+
+def _serialize_event(event) -> Dict[str, Any]:
+    """Flatten an event snapshot into JSON-ready values."""
+    event_data = {
+        key: value.isoformat() if isinstance(value, datetime) else value
+        for key, value in (event.to_dict() or {}).items()
+    }
+    return {'id': event.id, **event_data}
+
+@router.get("/events/{user_id}", response_model=List[EventResponse])
+async def get_user_events(
+    user_id: str,
+    limit: int = Query(EVENTS_DEFAULT_PAGE_SIZE, ge=1, le=EVENTS_MAX_PAGE_SIZE),
+    start_after: Optional[str] = Query(None, description="Id of the last event of the previous page"),
+    from_date: Optional[datetime] = Query(None, description="Only events on or after this date"),
+    to_date: Optional[datetime] = Query(None, description="Only events before this date"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    db=Depends(get_firestore),
+):
+    """
+    List a user's events ordered by event date, one page at a time. The id of the
+    page's last event is returned in the X-Next-Cursor header; pass it back as
+    `start_after` to fetch the next page. `format=ndjson` streams every matching
+    event as newline-delimited JSON instead, for exports.
+    Served by the (user_id, event_date) composite index in firestore.indexes.json.
+    """
+    try:
+        query = db.collection('events').where('user_id', '==', user_id)
+        if from_date:
+            query = query.where('event_date', '>=', from_date)
+        if to_date:
+            query = query.where('event_date', '<', to_date)
+        query = query.order_by('event_date')
+        if fields:
+            query = query.select([field.strip() for field in fields.split(',') if field.strip()])
+        if start_after:
+            cursor = await db.collection('events').document(start_after).get()
+            if not cursor.exists or (cursor.to_dict() or {}).get('user_id') != user_id:
+                raise HTTPException(status_code=400, detail="Invalid start_after cursor")
+            query = query.start_after(cursor)
+
+        if format == "ndjson":
+            async def export():
+                async for event in query.stream():
+                    yield dumps(_serialize_event(event), default=str) + b"\n"
+            return StreamingResponse(export(), media_type="application/x-ndjson")
+
+        with span("firestore.query", collection="events", limit=limit):
+            result = [_serialize_event(event) async for event in query.limit(limit).stream()]
+        headers = {"X-Next-Cursor": result[-1]['id']} if len(result) == limit else {}
+        # Projected pages carry only some fields, so skip response model validation
+        return ORJSONResponse(result, headers=headers)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to get events: {str(e)}")
+        raise HTTPException(status_code=400, detail="Failed to retrieve events")
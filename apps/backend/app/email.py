@@ -6,10 +6,17 @@ from fastapi import HTTPException, status
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.application import MIMEApplication
-import smtplib
-from typing import Optional
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
 import urllib.parse
 from urllib.parse import urlparse
+from .email_queue import EmailQueue, OutboundEmail, SMTPConnectionPool
+from apps.backend.pdf_generator import render_prediction_pdf
+from apps.backend.storage import get_prediction
+from utils.metrics import cache_requests
+from utils.tracing import traced
 
 logger = logging.getLogger(__name__)
 
@@ -25,6 +32,51 @@ class EmailService:
             'akuraastrology.com',
             'firebasestorage.googleapis.com'  # For Firebase Storage URLs
         ]
+        self.pool = SMTPConnectionPool(
+            self.smtp_server,
+            self.smtp_port,
+            self.smtp_username,
+            self.smtp_password,
+            size=int(os.getenv('SMTP_POOL_SIZE', 2)),
+            use_tls=os.getenv('SMTP_USE_TLS', 'true').lower() == 'true',
+        )
+        self.queue = EmailQueue(
+            self.pool,
+            build_message=self._build_message,
+            prepare=self._prepare_attachment,
+            batch_size=int(os.getenv('EMAIL_BATCH_SIZE', 20)),
+            max_retries=int(os.getenv('EMAIL_MAX_RETRIES', 3)),
+        )
+        # One keep-alive HTTP session for all attachment downloads, created on first use.
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.http_pool_size = int(os.getenv('ATTACHMENT_HTTP_POOL_SIZE', 20))
+        # Downloaded attachments keyed by URL: (etag, content, fetched_at). Entries younger
+        # than the freshness window are reused outright, older ones are revalidated with
+        # If-None-Match so an unchanged PDF is never transferred twice.
+        self._attachment_cache: "OrderedDict[str, Tuple[Optional[str], bytes, float]]" = OrderedDict()
+        self._attachment_cache_bytes = 0
+        self.attachment_cache_max_bytes = int(os.getenv('ATTACHMENT_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+        self.attachment_fresh_seconds = float(os.getenv('ATTACHMENT_CACHE_FRESH_SECONDS', 300))
+        self._inflight_downloads: Dict[str, asyncio.Future] = {}
+
+    async def start(self):
+        """Start the background sender. Called from the application lifespan."""
+        await self.queue.start()
+
+    async def stop(self):
+        """Flush queued messages and close pooled SMTP and HTTP connections."""
+        await self.queue.stop()
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.http_pool_size, keepalive_timeout=60),
+                timeout=aiohttp.ClientTimeout(total=60),
+            )
+        return self._session
 
     def _is_valid_url(self, url: str) -> bool:
         """Validate that the URL is from an allowed domain."""
@@ -37,41 +89,83 @@ class EmailService:
             return False
 
     async def _download_file(self, url: str) -> Optional[bytes]:
-        """Download file from URL with size limit (10MB)."""
+        """Download file from URL with size limit (10MB), reusing cached copies."""
         if not self._is_valid_url(url):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Invalid file URL"
             )
 
+        cached = self._attachment_cache.get(url)
+        if cached and time.monotonic() - cached[2] < self.attachment_fresh_seconds:
+            self._attachment_cache.move_to_end(url)
+            cache_requests.inc(cache="email_attachment", result="hit")
+            return cached[1]
+        cache_requests.inc(cache="email_attachment", result="revalidate" if cached else "miss")
+
+        # Concurrent sends of the same attachment share a single download.
+        inflight = self._inflight_downloads.get(url)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+        future = asyncio.get_running_loop().create_future()
+        self._inflight_downloads[url] = future
+        try:
+            content = await self._fetch(url, cached)
+            future.set_result(content)
+            return content
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting on it.
+            future.exception()
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        finally:
+            del self._inflight_downloads[url]
+
+    @traced("email.download_attachment")
+    async def _fetch(self, url: str, cached: Optional[Tuple[Optional[str], bytes, float]]) -> bytes:
         max_size = 10 * 1024 * 1024  # 10MB
+        too_large = HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"File too large. Maximum size is {max_size/1024/1024}MB"
+        )
+        headers = {}
+        if cached and cached[0]:
+            headers['If-None-Match'] = cached[0]
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url) as response:
-                    if response.status != 200:
-                        raise HTTPException(
-                            status_code=status.HTTP_400_BAD_REQUEST,
-                            detail="Failed to download file"
-                        )
-                    
-                    # Check content length
-                    content_length = int(response.headers.get('content-length', 0))
-                    if content_length > max_size:
-                        raise HTTPException(
-                            status_code=status.HTTP_400_BAD_REQUEST,
-                            detail=f"File too large. Maximum size is {max_size/1024/1024}MB"
-                        )
-                    
-                    # Read in chunks to handle large files
-                    content = b''
-                    async for chunk in response.content.iter_chunked(8192):
-                        content += chunk
-                        if len(content) > max_size:
-                            raise HTTPException(
-                                status_code=status.HTTP_400_BAD_REQUEST,
-                                detail=f"File too large. Maximum size is {max_size/1024/1024}MB"
-                            )
-                    return content
+            async with self._get_session().get(url, headers=headers) as response:
+                if response.status == 304 and cached:
+                    self._store_attachment(url, cached[0], cached[1])
+                    return cached[1]
+                if response.status != 200:
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail="Failed to download file"
+                    )
+
+                # Check content length
+                content_length = int(response.headers.get('content-length', 0))
+                if content_length > max_size:
+                    raise too_large
+
+                # Read into a buffer sized up front from Content-Length when the server sends
+                # one; otherwise grow it in place (amortized linear, unlike bytes concatenation).
+                buffer = bytearray(content_length)
+                size = 0
+                async for chunk in response.content.iter_chunked(64 * 1024):
+                    end = size + len(chunk)
+                    if end > max_size:
+                        raise too_large
+                    buffer[size:end] = chunk
+                    size = end
+                del buffer[size:]
+                content = bytes(buffer)
+                self._store_attachment(url, response.headers.get('ETag'), content)
+                return content
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Error downloading file: {e}")
             raise HTTPException(
@@ -79,6 +173,99 @@ class EmailService:
                 detail="Failed to download file"
             )
 
+    def _store_attachment(self, url: str, etag: Optional[str], content: bytes):
+        previous = self._attachment_cache.pop(url, None)
+        if previous:
+            self._attachment_cache_bytes -= len(previous[1])
+        if len(content) > self.attachment_cache_max_bytes:
+            return
+        self._attachment_cache[url] = (etag, content, time.monotonic())
+        self._attachment_cache_bytes += len(content)
+        while self._attachment_cache_bytes > self.attachment_cache_max_bytes:
+            _, (_, evicted, _) = self._attachment_cache.popitem(last=False)
+            self._attachment_cache_bytes -= len(evicted)
+
+    def _build_message(self, email: OutboundEmail) -> MIMEMultipart:
+        msg = MIMEMultipart()
+        msg['From'] = self.from_email
+        msg['To'] = email.to_email
+        msg['Subject'] = email.subject
+
+        # Attach HTML body
+        msg.attach(MIMEText(email.body, 'html'))
+
+        # Attach the file
+        if email.attachment is not None:
+            part = MIMEApplication(email.attachment, Name=email.filename)
+            part['Content-Disposition'] = f'attachment; filename="{email.filename}"'
+            msg.attach(part)
+        return msg
+
+    async def _prepare_attachment(self, email: OutboundEmail):
+        """Render or download the attachment just before sending, on the queue worker."""
+        if email.attachment is not None:
+            return
+        if email.prediction is not None:
+            email.attachment = await asyncio.to_thread(render_prediction_pdf, email.prediction)
+        elif email.attachment_url:
+            email.attachment = await self._download_file(email.attachment_url)
+
+    @traced("email.queue_prediction_email")
+    async def queue_prediction_email(
+        self,
+        to_email: str,
+        subject: str,
+        body: str,
+        prediction_id: str,
+        filename: str = "prediction.pdf"
+    ) -> str:
+        """
+        Queue an email carrying a stored prediction's report, rendered in-process
+        on the queue worker rather than fetched from an uploaded copy.
+        """
+        prediction = get_prediction(prediction_id)
+        if prediction is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Prediction not found"
+            )
+        email = OutboundEmail(
+            to_email=to_email,
+            subject=subject,
+            body=body,
+            prediction=prediction,
+            filename=filename,
+        )
+        return await self.queue.enqueue(email)
+
+    @traced("email.queue_email_with_attachment")
+    async def queue_email_with_attachment(
+        self,
+        to_email: str,
+        subject: str,
+        body: str,
+        attachment_url: str,
+        filename: str = "prediction.pdf"
+    ) -> str:
+        """
+        Queue an email with an attachment from a URL and return its message id
+        without waiting for the download or the SMTP round trip.
+        """
+        if not self._is_valid_url(attachment_url):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid file URL"
+            )
+        email = OutboundEmail(
+            to_email=to_email,
+            subject=subject,
+            body=body,
+            attachment_url=attachment_url,
+            filename=filename,
+        )
+        return await self.queue.enqueue(email)
+
+    @traced("email.send_email_with_attachment")
     async def send_email_with_attachment(
         self,
         to_email: str,
@@ -88,7 +275,7 @@ class EmailService:
         filename: str = "prediction.pdf"
     ) -> bool:
         """
-        Send an email with an attachment from a URL.
+        Send an email with an attachment from a URL and wait for delivery.
         
         Args:
             to_email: Recipient email address
@@ -106,35 +293,25 @@ class EmailService:
             if not file_content:
                 return False
 
-            # Create message
-            msg = MIMEMultipart()
-            msg['From'] = self.from_email
-            msg['To'] = to_email
-            msg['Subject'] = subject
-            
-            # Attach HTML body
-            msg.attach(MIMEText(body, 'html'))
-            
-            # Attach the file
-            part = MIMEApplication(file_content, Name=filename)
-            part['Content-Disposition'] = f'attachment; filename="{filename}"'
-            msg.attach(part)
+            email = OutboundEmail(
+                to_email=to_email,
+                subject=subject,
+                body=body,
+                attachment=file_content,
+                filename=filename,
+                delivered=asyncio.get_running_loop().create_future(),
+            )
+            await self.queue.enqueue(email)
+            await email.delivered
 
-            # Send the email
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.starttls()
-                server.login(self.smtp_username, self.smtp_password)
-                server.send_message(msg)
-                
             logger.info(f"Email sent to {to_email} with attachment from {attachment_url}")
             return True
-            
+
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Error sending email: {e}")
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Failed to send email"
             )
-
-# Singleton instance
-email_service = EmailService()
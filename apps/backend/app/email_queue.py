@@ -0,0 +1,327 @@
+import asyncio
+import logging
+import queue
+import random
+import smtplib
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from email.message import Message
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from utils.metrics import REGISTRY, timed
+from utils.tracing import current_span, span
+
+logger = logging.getLogger(__name__)
+
+emails_queued = REGISTRY.counter("emails_queued_total", "Emails accepted onto the outbound queue", ("attachment",))
+emails_sent = REGISTRY.counter("emails_sent_total", "Emails handed to the SMTP server")
+emails_failed = REGISTRY.counter("emails_failed_total", "Emails given up on after retries")
+email_batch_seconds = REGISTRY.histogram("email_send_batch_seconds", "Time to send one batch over a pooled SMTP connection")
+email_queue_depth = REGISTRY.gauge("email_queue_depth", "Emails waiting on the outbound queue")
+
+
+class SMTPConnectionPool:
+    """
+    A bounded pool of persistent, authenticated SMTP connections.
+
+    smtplib is blocking, so connections are only used from executor threads. A
+    connection stays open across messages and is health-checked with NOOP when it
+    has been idle for longer than `max_idle` seconds.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        size: int = 2,
+        use_tls: bool = True,
+        timeout: float = 30.0,
+        max_idle: float = 60.0,
+    ):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.size = size
+        self.use_tls = use_tls
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self._idle: "queue.LifoQueue[Tuple[smtplib.SMTP, float]]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._closed = False
+
+    def _connect(self) -> smtplib.SMTP:
+        conn = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.use_tls:
+                conn.starttls()
+            if self.username and self.password:
+                conn.login(self.username, self.password)
+        except Exception:
+            self._discard(conn)
+            raise
+        return conn
+
+    @staticmethod
+    def _discard(conn: smtplib.SMTP):
+        try:
+            conn.quit()
+        except Exception:
+            conn.close()
+
+    def acquire(self) -> smtplib.SMTP:
+        self._slots.acquire()
+        try:
+            while True:
+                try:
+                    conn, last_used = self._idle.get_nowait()
+                except queue.Empty:
+                    return self._connect()
+                if time.monotonic() - last_used < self.max_idle:
+                    return conn
+                try:
+                    if conn.noop()[0] == 250:
+                        return conn
+                except smtplib.SMTPException:
+                    pass
+                except OSError:
+                    pass
+                self._discard(conn)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, conn: smtplib.SMTP, broken: bool = False):
+        try:
+            if broken or self._closed:
+                self._discard(conn)
+            else:
+                self._idle.put((conn, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    def open(self):
+        self._closed = False
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._discard(conn)
+
+
+@dataclass
+class OutboundEmail:
+    to_email: str
+    subject: str
+    body: str
+    attachment_url: Optional[str] = None
+    attachment: Optional[bytes] = None
+    # A stored prediction to render into the attachment instead of downloading one.
+    prediction: Optional[dict] = None
+    filename: str = "prediction.pdf"
+    message_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    attempts: int = 0
+    # Set by EmailService.send_email_with_attachment when the caller waits for delivery.
+    delivered: Optional[asyncio.Future] = None
+    # Span of the request that queued the email; the worker's spans continue its trace.
+    trace_parent: Optional[object] = None
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return False
+    if isinstance(error, smtplib.SMTPResponseException):
+        # 4xx replies are transient, 5xx are permanent.
+        return 400 <= error.smtp_code < 500
+    return isinstance(error, (smtplib.SMTPException, OSError))
+
+
+class EmailQueue:
+    """
+    Background outbound queue. Workers drain up to `batch_size` messages at a time
+    and send them back to back over one pooled connection. Transient failures are
+    retried with exponential backoff and jitter up to `max_retries` times.
+    """
+
+    def __init__(
+        self,
+        pool: SMTPConnectionPool,
+        build_message: Callable[[OutboundEmail], Message],
+        prepare: Optional[Callable[[OutboundEmail], Awaitable[None]]] = None,
+        workers: Optional[int] = None,
+        batch_size: int = 20,
+        max_retries: int = 3,
+        retry_backoff: float = 2.0,
+    ):
+        self.pool = pool
+        self.build_message = build_message
+        self.prepare = prepare
+        self.workers = workers or pool.size
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        # Retries waiting out their backoff, and the email each will requeue
+        self._retry_tasks: Dict[asyncio.Task, OutboundEmail] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def qsize(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    async def start(self):
+        if self.running:
+            return
+        self._queue = asyncio.Queue()
+        self.pool.open()
+        self._executor = ThreadPoolExecutor(max_workers=self.pool.size, thread_name_prefix="smtp")
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def _drain(self):
+        while True:
+            await self._queue.join()
+            if not self._retry_tasks:
+                return
+            # Each waiting retry puts its email back on the queue when its delay is up.
+            await asyncio.wait(list(self._retry_tasks))
+
+    async def stop(self, drain: bool = True, timeout: float = 30.0):
+        """
+        Stop the workers. With `drain`, first waits up to `timeout` seconds for
+        queued emails and pending retries to go out. Emails still unsent after
+        that are given up on like any other failure: logged, counted and their
+        `delivered` futures failed.
+        """
+        if not self.running:
+            return
+        if drain:
+            try:
+                await asyncio.wait_for(self._drain(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning(
+                    f"Email queue stopped with {self.qsize()} messages queued and {len(self._retry_tasks)} awaiting retry"
+                )
+        unsent = list(self._retry_tasks.values())
+        for task in [*self._tasks, *self._retry_tasks]:
+            task.cancel()
+        await asyncio.gather(*self._tasks, *self._retry_tasks, return_exceptions=True)
+        self._tasks = []
+        self._retry_tasks = {}
+        # Both block: in-flight sends finish on the executor, and closing sends SMTP QUIT.
+        await asyncio.to_thread(self._executor.shutdown, True)
+        await asyncio.to_thread(self.pool.close)
+        while not self._queue.empty():
+            unsent.append(self._queue.get_nowait())
+            self._queue.task_done()
+        for email in unsent:
+            self._fail(email, RuntimeError("Email queue stopped before the email was sent"))
+
+    async def enqueue(self, email: OutboundEmail) -> str:
+        if not self.running:
+            await self.start()
+        if email.trace_parent is None:
+            email.trace_parent = current_span()
+        await self._queue.put(email)
+        attachment = "prediction" if email.prediction else "url" if email.attachment_url else "inline" if email.attachment else "none"
+        emails_queued.inc(attachment=attachment)
+        email_queue_depth.set(self._queue.qsize())
+        return email.message_id
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+            unsettled = list(batch)
+            try:
+                ready = []
+                for email in batch:
+                    try:
+                        with span("email.prepare", parent=email.trace_parent, root=email.trace_parent is None, message_id=email.message_id):
+                            if self.prepare:
+                                await self.prepare(email)
+                            ready.append((email, self.build_message(email)))
+                    except Exception as e:
+                        unsettled.remove(email)
+                        self._fail(email, e)
+                if ready:
+                    with timed(email_batch_seconds), span("email.send_batch", root=True, emails=len(ready)):
+                        results = await loop.run_in_executor(self._executor, self._send_batch, ready)
+                    for email, error in results:
+                        if error is None:
+                            logger.info(f"Email {email.message_id} sent to {email.to_email}")
+                            emails_sent.inc()
+                            if email.delivered and not email.delivered.done():
+                                email.delivered.set_result(True)
+                        elif _is_retryable(error) and email.attempts < self.max_retries:
+                            self._schedule_retry(email, error)
+                        else:
+                            self._fail(email, error)
+            except asyncio.CancelledError:
+                # Stopped mid-batch; the server may or may not have taken these.
+                for email in unsettled:
+                    self._fail(email, RuntimeError("Email queue stopped before delivery was confirmed"))
+                raise
+            except Exception as e:
+                logger.error(f"Email worker error: {e}", exc_info=True)
+                for email in batch:
+                    self._fail(email, e)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+                email_queue_depth.set(self._queue.qsize())
+
+    def _send_batch(self, batch: List[Tuple[OutboundEmail, Message]]):
+        results = []
+        try:
+            conn = self.pool.acquire()
+        except Exception as e:
+            return [(email, e) for email, _ in batch]
+        broken = False
+        for email, message in batch:
+            email.attempts += 1
+            if broken:
+                results.append((email, smtplib.SMTPServerDisconnected("connection lost earlier in batch")))
+                continue
+            try:
+                conn.send_message(message)
+                results.append((email, None))
+            except Exception as e:
+                broken = not isinstance(e, (smtplib.SMTPRecipientsRefused, smtplib.SMTPResponseException))
+                results.append((email, e))
+        self.pool.release(conn, broken=broken)
+        return results
+
+    def _schedule_retry(self, email: OutboundEmail, error: Exception):
+        delay = self.retry_backoff * (2 ** (email.attempts - 1)) * random.uniform(0.5, 1.5)
+        logger.warning(f"Retrying email {email.message_id} in {delay:.1f}s after error: {error}")
+
+        async def requeue():
+            await asyncio.sleep(delay)
+            await self._queue.put(email)
+
+        task = asyncio.create_task(requeue())
+        self._retry_tasks[task] = email
+        task.add_done_callback(lambda done: self._retry_tasks.pop(done, None))
+
+    def _fail(self, email: OutboundEmail, error: Exception):
+        logger.error(f"Giving up on email {email.message_id} to {email.to_email}: {error}")
+        emails_failed.inc()
+        if email.delivered and not email.delivered.done():
+            email.delivered.set_exception(error)
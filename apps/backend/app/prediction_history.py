@@ -0,0 +1,133 @@
+"""
+Prediction history and prediction id sequences, persisted in MongoDB.
+
+Running numbers come from an atomic `$inc` on one counter document per
+(user, prediction id prefix), so every worker draws from the same sequence and
+prediction ids stay unique. History entries are stored in `prediction_history` and paged
+newest first by `_id`.
+
+Each worker keeps the newest HISTORY_RECENT_PER_USER entries of up to
+HISTORY_CACHED_USERS users in memory (fixed-size ring buffers, least recently
+used users evicted), so the first page of a busy user's history skips the
+database. A worker's own writes show up at once; entries written by other
+workers do once the buffer is reloaded, at most HISTORY_CACHE_SECONDS later.
+"""
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Deque, List, Optional, Tuple
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import DESCENDING, ReturnDocument
+from db.mongo import db
+from utils.metrics import cache_requests
+from utils.tracing import span
+
+HISTORY_RECENT_PER_USER = int(os.getenv("HISTORY_RECENT_PER_USER", "50"))
+HISTORY_CACHED_USERS = int(os.getenv("HISTORY_CACHED_USERS", "10000"))
+HISTORY_CACHE_SECONDS = float(os.getenv("HISTORY_CACHE_SECONDS", "30"))
+
+history_collection = db["prediction_history"]
+counters_collection = db["counters"]
+
+
+class _Recent:
+    """The newest entries of one user, newest last."""
+
+    __slots__ = ("entries", "complete", "loaded_at")
+
+    def __init__(self, entries: List[dict], complete: bool, maxlen: int):
+        self.entries: Deque[dict] = deque(reversed(entries), maxlen=maxlen)
+        # True when the user has no entries beyond the buffer
+        self.complete = complete
+        self.loaded_at = time.monotonic()
+
+
+def _public(entry: dict) -> dict:
+    return {key: value for key, value in entry.items() if key != "_id"}
+
+
+class PredictionHistory:
+    def __init__(
+        self,
+        history=history_collection,
+        counters=counters_collection,
+        recent_per_user: int = HISTORY_RECENT_PER_USER,
+        cached_users: int = HISTORY_CACHED_USERS,
+        cache_seconds: float = HISTORY_CACHE_SECONDS,
+    ):
+        self.history = history
+        self.counters = counters
+        self.recent_per_user = recent_per_user
+        self.cached_users = cached_users
+        self.cache_seconds = cache_seconds
+        self._recent: "OrderedDict[str, _Recent]" = OrderedDict()
+
+    async def next_sequence(self, user_id: str, prefix: str) -> int:
+        """The next running number for (user, prefix), atomic across workers."""
+        with span("mongo.find_one_and_update", collection="counters"):
+            counter = await self.counters.find_one_and_update(
+                {"_id": f"prediction:{user_id}:{prefix}"},
+                {"$inc": {"seq": 1}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        return counter["seq"]
+
+    async def append(self, entry: dict) -> dict:
+        entry = {"_id": ObjectId(), **entry}
+        with span("mongo.insert_one", collection="prediction_history"):
+            await self.history.insert_one(entry)
+        recent = self._recent.get(entry["user_id"])
+        if recent is not None:
+            if len(recent.entries) == recent.entries.maxlen:
+                recent.complete = False
+            recent.entries.append(entry)
+        return _public(entry)
+
+    async def _query(self, user_id: str, limit: int, before: Optional[ObjectId] = None) -> List[dict]:
+        query = {"user_id": user_id}
+        if before is not None:
+            query["_id"] = {"$lt": before}
+        with span("mongo.find", collection="prediction_history", limit=limit):
+            return await self.history.find(query).sort("_id", DESCENDING).limit(limit).to_list(length=limit)
+
+    async def _recent_entries(self, user_id: str) -> _Recent:
+        recent = self._recent.get(user_id)
+        if recent is not None and time.monotonic() - recent.loaded_at < self.cache_seconds:
+            self._recent.move_to_end(user_id)
+            cache_requests.inc(cache="prediction_history", result="hit")
+            return recent
+        cache_requests.inc(cache="prediction_history", result="miss")
+        entries = await self._query(user_id, self.recent_per_user + 1)
+        recent = _Recent(entries[:self.recent_per_user], len(entries) <= self.recent_per_user, self.recent_per_user)
+        self._recent[user_id] = recent
+        self._recent.move_to_end(user_id)
+        while len(self._recent) > self.cached_users:
+            self._recent.popitem(last=False)
+        return recent
+
+    async def page(self, user_id: str, limit: int, before: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+        """
+        Up to `limit` entries older than cursor `before`, newest first, and the
+        cursor of the next page (None on the last page). Raises ValueError for a
+        malformed cursor.
+        """
+        cursor = None
+        if before is not None:
+            try:
+                cursor = ObjectId(before)
+            except (InvalidId, TypeError):
+                raise ValueError("Invalid cursor")
+        recent = await self._recent_entries(user_id)
+        newest_first = list(reversed(recent.entries))
+        if cursor is not None:
+            newest_first = [entry for entry in newest_first if entry["_id"] < cursor]
+        if recent.complete or len(newest_first) > limit:
+            entries = newest_first[:limit + 1]
+        else:
+            # Reaches past what the buffer holds
+            entries = await self._query(user_id, limit + 1, cursor)
+        page = entries[:limit]
+        next_cursor = str(page[-1]["_id"]) if len(entries) > limit else None
+        return [_public(entry) for entry in page], next_cursor
@@ -0,0 +1,239 @@
+"""
+In-memory demo accounts, prediction ids and history, and the email endpoint
+(formerly the standalone app in app/main.py). Prediction history and running
+numbers are kept in MongoDB by app/prediction_history.py.
+"""
+from datetime import datetime
+from fastapi import APIRouter, Request, HTTPException, Depends, Query, status
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from pymongo.errors import DuplicateKeyError
+from pydantic import BaseModel, EmailStr, HttpUrl, model_validator
+from typing import Optional, Dict, Any
+from uuid import uuid4
+import os
+import logging
+from dependencies import get_email_service, get_prediction_history
+from utils.fast_json import ORJSONResponse
+from .email import EmailService
+from .prediction_history import PredictionHistory
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Security
+security = HTTPBearer()
+
+# Environment variables
+API_KEYS = os.getenv("API_KEYS", "").split(",") if os.getenv("API_KEYS") else []
+# Sequence numbers to draw before giving up on a prediction id that is already taken
+PREDICTION_ID_ATTEMPTS = 3
+
+def verify_api_key(authorization: HTTPAuthorizationCredentials = Depends(security)) -> bool:
+    """Verify the API key from the Authorization header."""
+    if not API_KEYS:
+        logger.warning("No API keys configured, allowing all requests")
+        return True
+        
+    token = authorization.credentials
+    if token not in API_KEYS:
+        logger.warning(f"Invalid API key attempt: {token}")
+        raise HTTPException(
+            status_code=401,
+            detail="Invalid API key"
+        )
+    return True
+
+# In-memory user store for demo
+users_db = {}
+
+class UserBase(BaseModel):
+    email: EmailStr
+    display_name: str
+    role: str  # 'astrologer', 'client', or 'student'
+    phone: Optional[str] = None
+    photo_url: Optional[str] = None
+
+class UserCreate(UserBase):
+    password: str
+
+class UserOut(UserBase):
+    id: str
+
+class EmailRequest(BaseModel):
+    """Request model for sending emails with PDF attachments."""
+    email: EmailStr
+    url: Optional[HttpUrl] = None
+    prediction_id: Optional[str] = None
+    subject: Optional[str] = "Your Astrobalendar Prediction"
+    message: Optional[str] = "Here's your requested prediction from Astrobalendar."
+
+    @model_validator(mode="after")
+    def check_attachment_source(self):
+        if (self.url is None) == (self.prediction_id is None):
+            raise ValueError("Provide exactly one of url or prediction_id")
+        return self
+
+@router.post("/api/signup", response_model=UserOut)
+def signup(user: UserCreate):
+    # Simulate unique email constraint
+    for u in users_db.values():
+        if u['email'] == user.email:
+            raise HTTPException(status_code=400, detail="Email already registered")
+    user_id = str(uuid4())
+    user_dict = user.dict()
+    user_dict['id'] = user_id
+    users_db[user_id] = user_dict
+    return user_dict
+
+@router.post("/api/login", response_model=UserOut)
+def login(email: EmailStr, password: str):
+    for u in users_db.values():
+        if u['email'] == email and u['password'] == password:
+            return u
+    raise HTTPException(status_code=401, detail="Invalid credentials")
+
+PREDICTION_HISTORY_DEFAULT_PAGE_SIZE = 20
+PREDICTION_HISTORY_MAX_PAGE_SIZE = 100
+
+@router.post("/api/predict")
+async def predict(request: Request, history: PredictionHistory = Depends(get_prediction_history)):
+    data = await request.json()
+    # Expect user_id, role, display_name in request (for demo)
+    user_id = data.get('user_id')
+    role = data.get('role')
+    display_name = data.get('display_name', '')
+    if not user_id or not role or not display_name:
+        return {"error": "user_id, role, and display_name required"}
+
+    # Generate prefix
+    if role == 'astrologer':
+        prefix = 'AB'
+    elif role == 'client':
+        prefix = 'CL'
+    else:
+        prefix = 'OT'
+    name_part = (display_name[:3].upper() + 'XXX')[:3]
+
+    # Simulate KP Astrology logic
+    prediction_result = {
+        "ascendant": "Aries 15°",
+        "moon_sign": "Cancer",
+        "dasa": "Mars",
+        "bhukti": "Venus",
+        "antara": "Mercury",
+        "sub_lord": "Saturn",
+        "sub_sub_lord": "Jupiter",
+        "ruling_planets": ["Mars", "Venus", "Saturn"],
+    }
+
+    match_status = (
+        "match"
+        if prediction_result["sub_sub_lord"] in prediction_result["ruling_planets"]
+        else "needs_correction"
+    )
+
+    # Store prediction in user history
+    for _ in range(PREDICTION_ID_ATTEMPTS):
+        # Running number per id prefix, shared by all workers; the dash keeps user "1" #11 apart from user "11" #1
+        n = await history.next_sequence(user_id, prefix)
+        prediction_id = f"{prefix}{name_part}{user_id}-{n}"
+        entry = {
+            "prediction_id": prediction_id,
+            "user_id": user_id,
+            "role": role,
+            "display_name": display_name,
+            "prediction": prediction_result,
+            "match_status": match_status,
+            "timestamp": datetime.utcnow().isoformat() + 'Z',
+        }
+        try:
+            await history.append(entry)
+            break
+        except DuplicateKeyError:
+            # Only ids written outside this route can be taken already.
+            logger.warning(f"Prediction id {prediction_id} already taken, drawing the next number")
+    else:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Could not allocate a unique prediction id")
+
+    return {
+        "prediction": prediction_result,
+        "match_status": match_status,
+        "prediction_id": prediction_id,
+    }
+
+@router.get("/api/predictions/{user_id}")
+async def get_user_prediction_history(
+    user_id: str,
+    limit: int = Query(PREDICTION_HISTORY_DEFAULT_PAGE_SIZE, ge=1, le=PREDICTION_HISTORY_MAX_PAGE_SIZE),
+    before: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    history: PredictionHistory = Depends(get_prediction_history),
+):
+    """
+    A user's predictions, newest first, one page at a time. When there are
+    older entries the X-Next-Cursor header holds the cursor to pass as `before`.
+    """
+    try:
+        entries, next_cursor = await history.page(user_id, limit, before)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid before cursor")
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    return ORJSONResponse(entries, headers=headers)
+
+@router.post("/api/send-email", status_code=status.HTTP_202_ACCEPTED)
+async def send_email(
+    request: EmailRequest,
+    _: bool = Depends(verify_api_key),
+    email_service: EmailService = Depends(get_email_service),
+) -> Dict[str, Any]:
+    """
+    Queue an email with a PDF attachment. Returns as soon as the message is
+    queued; the attachment is downloaded and sent by the background sender.
+    
+    Request body:
+    - email: Recipient's email address
+    - url: URL of the PDF to attach (must be from an allowed domain), or
+    - prediction_id: id of a stored prediction whose report is rendered and attached
+    - subject: (optional) Email subject
+    - message: (optional) Email body
+    
+    Requires valid API key in the Authorization header.
+    """
+    try:
+        body = f"""
+            <html>
+                <body>
+                    <p>Hello,</p>
+                    <p>{request.message}</p>
+                    <p>Best regards,<br>Astrobalendar Team</p>
+                    <p><small>This is an automated message. Please do not reply to this email.</small></p>
+                </body>
+            </html>
+            """
+        if request.prediction_id:
+            message_id = await email_service.queue_prediction_email(
+                to_email=request.email,
+                subject=request.subject,
+                body=body,
+                prediction_id=request.prediction_id,
+                filename="astrobalendar-prediction.pdf"
+            )
+        else:
+            message_id = await email_service.queue_email_with_attachment(
+                to_email=request.email,
+                subject=request.subject,
+                body=body,
+                attachment_url=str(request.url),
+                filename="astrobalendar-prediction.pdf"
+            )
+
+        return {"status": "queued", "message": "Email queued for delivery", "message_id": message_id}
+        
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        logger.error(f"Error in send_email endpoint: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred while sending the email"
+        )
@@ -0,0 +1,177 @@
+"""
+The backend's single ASGI application: every router, one middleware stack and
+one set of shared resources (see dependencies.Resources).
+
+Run with `uvicorn app_factory:create_app --factory`; main.py and app/main.py
+expose the same app for existing deployments. Importing this module is
+kept cheap: the OpenAI, Stripe, Firebase and ReportLab SDKs are imported by
+their accessors on first use, and no connection is opened until a request (or
+the lifespan) needs one. `python -m utils.startup` reports what importing it
+costs against the cold start budget.
+"""
+import logging
+import os
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Optional, Sequence
+from fastapi import APIRouter, FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from utils.fast_json import ORJSONResponse
+from utils.http_metrics import PrometheusMiddleware, metrics_endpoint
+from utils.profiling import PROFILING_ENABLED, ProfilingMiddleware
+from utils.rate_limit import RateLimitMiddleware
+from utils.tracing import TRACING_ENABLED, TracingMiddleware
+from apps.backend.api import admin, calendar, chat, clients, kp_chart, payments, predict, records
+from app import routes as app_routes
+from auth import advanced_features, routes as auth_routes
+from dependencies import Resources
+import admin_utils
+import protected_routes
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ALLOWED_ORIGINS = [
+    "http://localhost:3000",
+    "http://localhost:5173",
+    "https://astrobalendar.com",
+    "https://astrobalendar.netlify.app",
+    "https://akuraastrology.netlify.app",
+    "https://stately-gingersnap-b43e3e3.netlify.app",
+]
+
+# (router, prefix). When two routers declare the same method and path, the one
+# listed first serves it: the deployed /api/predict in app.routes supersedes
+# api/predict, and advanced_features supersedes the basic /auth routes.
+ROUTERS = [
+    (app_routes.router, ""),
+    (records.router, ""),
+    (kp_chart.router, "/api/kp-chart"),
+    (chat.router, "/api"),
+    (predict.router, "/api"),
+    (calendar.router, "/api/calendar"),
+    (clients.router, "/api/clients"),
+    (payments.router, "/api/payments"),
+    (admin.router, "/api/admin"),
+    (advanced_features.router, ""),
+    (auth_routes.router, ""),
+    (protected_routes.router, ""),
+    (admin_utils.router, ""),
+]
+
+
+def allowed_origins() -> list:
+    configured = os.getenv("ALLOWED_ORIGINS")
+    if configured:
+        return [origin.strip() for origin in configured.split(",") if origin.strip()]
+    return DEFAULT_ALLOWED_ORIGINS
+
+
+def include_router(app: FastAPI, router: APIRouter, prefix: str = ""):
+    """Include `router`, skipping routes whose method and path are already served."""
+    taken = {
+        (route.path, method)
+        for route in app.router.routes
+        for method in getattr(route, "methods", None) or ()
+    }
+    shadowed = [
+        route for route in router.routes
+        if any((prefix + route.path, method) in taken for method in getattr(route, "methods", None) or ())
+    ]
+    for route in shadowed:
+        logger.debug(f"Skipping {sorted(route.methods)} {prefix + route.path}: already served")
+    if not shadowed:
+        app.include_router(router, prefix=prefix)
+        return
+    trimmed = APIRouter()
+    trimmed.routes.extend(route for route in router.routes if route not in shadowed)
+    app.include_router(trimmed, prefix=prefix)
+
+
+def install_middleware(app: FastAPI, origins: Sequence[str]):
+    """The shared middleware stack, innermost first."""
+    # Registered before CORS so that 429 responses still carry CORS headers.
+    app.add_middleware(RateLimitMiddleware)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=list(origins),
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    # Opt-in profiler and tracer; not installed at all unless enabled.
+    if PROFILING_ENABLED:
+        app.add_middleware(ProfilingMiddleware)
+    if TRACING_ENABLED:
+        app.add_middleware(TracingMiddleware)
+    # Outermost, so that request metrics cover every other middleware.
+    app.add_middleware(PrometheusMiddleware)
+    app.add_api_route("/metrics", metrics_endpoint, methods=["GET"], include_in_schema=False)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    resources: Resources = app.state.resources
+    await resources.start()
+    try:
+        yield
+    finally:
+        await resources.close()
+
+
+async def home():
+    """Root endpoint that returns a welcome message."""
+    return {
+        "message": "Welcome to Astrobalendar API",
+        "status": "running",
+        "timestamp": datetime.utcnow().isoformat(),
+        "documentation": "/docs"
+    }
+
+
+async def health():
+    """Liveness: the process is serving requests. Touches no dependency."""
+    return {"status": "ok"}
+
+
+async def readiness(request: Request):
+    """Readiness: Firestore and MongoDB answer within the probe timeout."""
+    resources: Resources = request.app.state.resources
+    checks = {}
+    for name, probe in (("firestore", resources.firestore_probe), ("mongodb", resources.mongo_probe)):
+        healthy, error = await probe()
+        checks[name] = "ok" if healthy else error
+    healthy = all(result == "ok" for result in checks.values())
+    if not healthy:
+        logger.error(f"Readiness check failed: {checks}")
+    return JSONResponse(
+        {"status": "healthy" if healthy else "unhealthy", "checks": checks, "timestamp": datetime.utcnow().isoformat()},
+        status_code=200 if healthy else 503,
+    )
+
+
+async def ping(request: Request):
+    """MongoDB round trip (formerly served by the Flask backend_server.py)."""
+    healthy, error = await request.app.state.resources.mongo_probe()
+    if not healthy:
+        return JSONResponse({"status": "MongoDB ping failed", "error": error}, status_code=500)
+    return {"status": "MongoDB is alive"}
+
+
+def create_app(origins: Optional[Sequence[str]] = None) -> FastAPI:
+    app = FastAPI(
+        title="Astrobalendar API",
+        version="1.0.0",
+        lifespan=lifespan,
+        default_response_class=ORJSONResponse,
+    )
+    # Clients inside are created on first use; the lifespan starts and closes them.
+    app.state.resources = Resources.create()
+    install_middleware(app, origins if origins is not None else allowed_origins())
+    app.add_api_route("/", home, methods=["GET"])
+    app.add_api_route("/health", health, methods=["GET"], include_in_schema=False)
+    app.add_api_route("/health/ready", readiness, methods=["GET"], include_in_schema=False)
+    app.add_api_route("/ping", ping, methods=["GET"], include_in_schema=False)
+    for router, prefix in ROUTERS:
+        include_router(app, router, prefix)
+    return app
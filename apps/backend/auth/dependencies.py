@@ -6,6 +6,7 @@ from typing import Optional
 from db.mongo import db
 from bson.objectid import ObjectId
 from auth.schemas import UserOut
+from auth.revocation import TokenRevocationStore
 import os
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
@@ -13,10 +14,12 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "supersecretkey123")
 JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
 
+revocation_store = TokenRevocationStore(db.revoked_tokens)
+
 class TokenData(BaseModel):
     sub: Optional[str] = None
 
-async def get_current_user(token: str = Depends(oauth2_scheme)) -> UserOut:
+async def get_current_user_document(token: str = Depends(oauth2_scheme)) -> dict:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -30,7 +33,18 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> UserOut:
         token_data = TokenData(sub=user_id)
     except JWTError:
         raise credentials_exception
+    if await revocation_store.is_revoked(token):
+        raise credentials_exception
     user = await db.users.find_one({"_id": ObjectId(token_data.sub)})
     if user is None:
         raise credentials_exception
+    return user
+
+async def get_current_user(user: dict = Depends(get_current_user_document)) -> UserOut:
+    return UserOut(**user, id=str(user["_id"]))
+
+async def get_current_admin(user: dict = Depends(get_current_user_document)) -> UserOut:
+    # The role is read from the stored user, not the token, so a demotion applies immediately.
+    if user.get("role") != "admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Insufficient permissions")
     return UserOut(**user, id=str(user["_id"]))
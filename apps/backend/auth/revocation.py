@@ -0,0 +1,186 @@
+import asyncio
+import hashlib
+import logging
+import math
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Set
+
+from jose import JWTError, jwt
+
+TOKEN_REVOCATION_SYNC_SECONDS = float(os.getenv("TOKEN_REVOCATION_SYNC_SECONDS", "30"))
+TOKEN_REVOCATION_CAPACITY = int(os.getenv("TOKEN_REVOCATION_CAPACITY", "100000"))
+TOKEN_REVOCATION_ERROR_RATE = float(os.getenv("TOKEN_REVOCATION_ERROR_RATE", "0.001"))
+# How long to wait before retrying a sync that failed.
+TOKEN_REVOCATION_RETRY_SECONDS = float(os.getenv("TOKEN_REVOCATION_RETRY_SECONDS", "5"))
+# Used when a revoked token carries no readable `exp` claim (matches the refresh token lifetime).
+DEFAULT_REVOCATION_TTL = timedelta(days=7)
+
+logger = logging.getLogger(__name__)
+
+
+def token_key(token: str) -> str:
+    """Stable identifier for a token; the raw JWT is never persisted."""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over string keys using double hashing."""
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        capacity = max(capacity, 1)
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.capacity = capacity
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, key: str) -> None:
+        for pos in self._positions(key):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class TokenRevocationStore:
+    """
+    Persistent token denylist with an in-process Bloom filter in front of it.
+
+    Revoked tokens are stored in Mongo keyed on the token hash, with a TTL index on
+    `exp` so entries disappear once the token would have expired anyway. Each worker
+    keeps a Bloom filter of the denylist that is rebuilt in the background every
+    `sync_interval` seconds, so a token that is not in the filter is accepted without
+    touching the database. Only filter hits (revoked tokens and rare false positives)
+    are confirmed against Mongo.
+
+    If a sync fails the store keeps serving from the last filter it loaded (empty
+    before the first success, i.e. fail open), logs a warning and retries after
+    `retry_interval` seconds rather than on every request.
+    """
+
+    def __init__(
+        self,
+        collection,
+        sync_interval: float = TOKEN_REVOCATION_SYNC_SECONDS,
+        capacity: int = TOKEN_REVOCATION_CAPACITY,
+        error_rate: float = TOKEN_REVOCATION_ERROR_RATE,
+        retry_interval: float = TOKEN_REVOCATION_RETRY_SECONDS,
+    ):
+        self._collection = collection
+        self.sync_interval = sync_interval
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.retry_interval = retry_interval
+        self._bloom = BloomFilter(capacity, error_rate)
+        # Confirmed revocations and false positives seen since the last sync, so repeated
+        # filter hits skip the DB. Both are small: the filter itself holds the full list.
+        self._revoked: Dict[str, datetime] = {}
+        self._not_revoked: Set[str] = set()
+        self._loaded = False
+        self._indexes_created = False
+        self._last_sync = 0.0
+        self._retry_at = 0.0
+        self._sync_task: Optional[asyncio.Task] = None
+        self._sync_lock = asyncio.Lock()
+
+    async def _ensure_indexes(self):
+        if not self._indexes_created:
+            await self._collection.create_index("exp", expireAfterSeconds=0)
+            self._indexes_created = True
+
+    async def revoke(self, token: str) -> datetime:
+        """Add a token to the denylist until its own expiry. Returns that expiry."""
+        try:
+            claims = jwt.get_unverified_claims(token)
+            exp = datetime.utcfromtimestamp(int(claims["exp"]))
+        except (JWTError, KeyError, TypeError, ValueError):
+            exp = datetime.utcnow() + DEFAULT_REVOCATION_TTL
+        key = token_key(token)
+        await self._ensure_indexes()
+        await self._collection.update_one(
+            {"_id": key},
+            {"$set": {"exp": exp, "revoked_at": datetime.utcnow()}},
+            upsert=True,
+        )
+        self._bloom.add(key)
+        self._revoked[key] = exp
+        self._not_revoked.discard(key)
+        return exp
+
+    async def is_revoked(self, token: str) -> bool:
+        if not self._loaded:
+            await self._first_sync()
+        else:
+            self._schedule_sync()
+        key = token_key(token)
+        if key not in self._bloom:
+            return False
+        exp = self._revoked.get(key)
+        if exp is not None:
+            return exp > datetime.utcnow()
+        if key in self._not_revoked:
+            return False
+        doc = await self._collection.find_one({"_id": key}, {"exp": 1})
+        if doc is None:
+            self._not_revoked.add(key)
+            return False
+        self._revoked[key] = doc["exp"]
+        return doc["exp"] > datetime.utcnow()
+
+    async def _first_sync(self):
+        if time.monotonic() < self._retry_at:
+            return
+        try:
+            await self.sync()
+        except Exception as exc:
+            self._sync_failed(exc)
+
+    def _schedule_sync(self):
+        now = time.monotonic()
+        if now - self._last_sync < self.sync_interval or now < self._retry_at:
+            return
+        if self._sync_task is None or self._sync_task.done():
+            self._sync_task = asyncio.ensure_future(self.sync())
+            self._sync_task.add_done_callback(self._sync_done)
+
+    def _sync_done(self, task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            self._sync_failed(task.exception())
+
+    def _sync_failed(self, exc: BaseException):
+        self._retry_at = time.monotonic() + self.retry_interval
+        logger.warning(
+            "Token revocation sync failed, serving the last loaded denylist; retrying in %.0fs: %r",
+            self.retry_interval, exc,
+        )
+
+    async def sync(self):
+        """Rebuild the Bloom filter from the persistent denylist."""
+        async with self._sync_lock:
+            if self._loaded and time.monotonic() - self._last_sync < self.sync_interval:
+                return
+            await self._ensure_indexes()
+            now = datetime.utcnow()
+            live = {"exp": {"$gt": now}}
+            expected = await self._collection.count_documents(live)
+            bloom = BloomFilter(max(self.capacity, 2 * expected), self.error_rate)
+            async for doc in self._collection.find(live, {"_id": 1}):
+                bloom.add(doc["_id"])
+            # Tokens revoked locally while the query was running must survive the swap.
+            self._revoked = {k: v for k, v in self._revoked.items() if v > now}
+            for key in self._revoked:
+                bloom.add(key)
+            self._bloom = bloom
+            self._not_revoked = set()
+            self._last_sync = time.monotonic()
+            self._loaded = True
@@ -1,24 +1,20 @@
-from flask import Flask, jsonify
-from pymongo import MongoClient
+"""
+Development server with auto-reload: `python backend_server.py`.
+
+Runs the unified application from app_factory; production uses
+`uvicorn app.main:app` (see render.yaml).
+"""
+import os
 from dotenv import load_dotenv
 load_dotenv()  # Must be called BEFORE any imports that use env vars
 
-from flask import Flask, jsonify
-from db.mongo import db  # now safe to import after env vars loaded
-
-app = Flask(__name__)
-
-@app.route("/")
-def home():
-    return jsonify({"message": "✅ Backend connected to MongoDB!"})
-
-@app.route("/ping")
-def ping():
-    try:
-        db.command("ping")
-        return jsonify({"status": "✅ MongoDB is alive!"})
-    except Exception as e:
-        return jsonify({"status": "❌ MongoDB ping failed", "error": str(e)}), 500
+import uvicorn
 
 if __name__ == "__main__":
-    app.run(debug=True)
+    uvicorn.run(
+        "app_factory:create_app",
+        factory=True,
+        host=os.getenv("HOST", "127.0.0.1"),
+        port=int(os.getenv("PORT", "8000")),
+        reload=True,
+    )
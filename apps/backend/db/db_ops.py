@@ -1,19 +1,101 @@
 from bson.objectid import ObjectId
+from pymongo.errors import BulkWriteError
+from typing import Any, AsyncIterator, Dict, Iterable, List, NamedTuple, Optional
+from utils.tracing import span
 from .mongo import db
 
 users_collection = db["users"]
 events_collection = db["calendar_events"]
+horoscopes_collection = db["horoscopes"]
+
+# Documents sent per insert_many call; bounds memory when importing from a generator.
+BULK_INSERT_CHUNK_SIZE = 1000
+# Documents fetched per cursor round trip.
+DEFAULT_BATCH_SIZE = 500
+
+Projection = Optional[Dict[str, Any]]
+
+class BulkInsertResult(NamedTuple):
+    inserted_ids: List[Any]
+    # writeErrors from the server, e.g. duplicate keys; the other documents are still inserted.
+    errors: List[dict]
+
+async def bulk_insert(collection, documents: Iterable[dict], chunk_size: int = BULK_INSERT_CHUNK_SIZE) -> BulkInsertResult:
+    """
+    Insert documents with unordered insert_many calls, so one bad document does
+    not stop the rest and the server can apply each chunk in parallel.
+    """
+    inserted_ids, errors = [], []
+
+    async def flush(chunk):
+        try:
+            with span("mongo.insert_many", collection=collection.name, documents=len(chunk)):
+                result = await collection.insert_many(chunk, ordered=False)
+            inserted_ids.extend(result.inserted_ids)
+        except BulkWriteError as e:
+            failed = {error["index"] for error in e.details.get("writeErrors", [])}
+            inserted_ids.extend(doc["_id"] for index, doc in enumerate(chunk) if index not in failed)
+            errors.extend(e.details.get("writeErrors", []))
+
+    chunk = []
+    for document in documents:
+        chunk.append(document)
+        if len(chunk) >= chunk_size:
+            await flush(chunk)
+            chunk = []
+    if chunk:
+        await flush(chunk)
+    return BulkInsertResult(inserted_ids, errors)
+
+async def iter_documents(
+    collection,
+    query: dict,
+    projection: Projection = None,
+    sort: Optional[list] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    limit: int = 0,
+) -> AsyncIterator[dict]:
+    """
+    Stream matching documents without materialising the result set.
+    """
+    cursor = collection.find(query, projection, batch_size=batch_size, limit=limit)
+    if sort:
+        cursor = cursor.sort(sort)
+    async for document in cursor:
+        yield document
 
 # Users
-def create_user(user_data):
-    return users_collection.insert_one(user_data).inserted_id
+async def create_user(user_data):
+    with span("mongo.insert_one", collection="users"):
+        return (await users_collection.insert_one(user_data)).inserted_id
 
-def get_user_by_email(email):
-    return users_collection.find_one({"email": email})
+async def get_user_by_email(email, projection: Projection = None):
+    with span("mongo.find_one", collection="users"):
+        return await users_collection.find_one({"email": email}, projection)
 
 # Events
-def create_event(event_data):
-    return events_collection.insert_one(event_data).inserted_id
+async def create_event(event_data):
+    with span("mongo.insert_one", collection="calendar_events"):
+        return (await events_collection.insert_one(event_data)).inserted_id
+
+async def create_events(events: Iterable[dict]) -> BulkInsertResult:
+    return await bulk_insert(events_collection, events)
+
+def iter_events_by_user(
+    user_id, projection: Projection = None, batch_size: int = DEFAULT_BATCH_SIZE, limit: int = 0
+) -> AsyncIterator[dict]:
+    # Served by the user_id+eventDate index created in mongo.ensure_indexes.
+    return iter_documents(
+        events_collection, {"user_id": ObjectId(user_id)}, projection,
+        sort=[("eventDate", 1)], batch_size=batch_size, limit=limit,
+    )
+
+async def get_events_by_user(user_id, projection: Projection = None, limit: int = 0) -> List[dict]:
+    with span("mongo.find", collection="calendar_events") as find_span:
+        events = [event async for event in iter_events_by_user(user_id, projection, limit=limit)]
+        find_span.set_attribute("documents", len(events))
+        return events
 
-def get_events_by_user(user_id):
-    return list(events_collection.find({"user_id": ObjectId(user_id)}))
+# Horoscopes
+async def create_horoscopes(horoscopes: Iterable[dict]) -> BulkInsertResult:
+    return await bulk_insert(horoscopes_collection, horoscopes)
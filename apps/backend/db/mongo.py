@@ -1,50 +1,155 @@
-from motor.motor_asyncio import AsyncIOMotorClient
-import os
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import ConfigurationError
+from typing import Optional
 from dotenv import load_dotenv
+import logging
+import os
 
 load_dotenv()
 
-from pymongo.errors import ConfigurationError
+logger = logging.getLogger(__name__)
 
-import os
-from pymongo import MongoClient
-from pymongo.errors import ConfigurationError, ConnectionFailure
+DATABASE_NAME = os.getenv("DATABASE_NAME", "astrobalendar")
 
-from dotenv import load_dotenv
-import os
-from pymongo import MongoClient
-from pymongo.errors import ConfigurationError
+# Pool and timeout tuning; see .env.example
+MONGODB_MAX_POOL_SIZE = int(os.getenv("MONGODB_MAX_POOL_SIZE", "10"))
+MONGODB_MIN_POOL_SIZE = int(os.getenv("MONGODB_MIN_POOL_SIZE", "0"))
+MONGODB_MAX_IDLE_TIME_MS = int(os.getenv("MONGODB_MAX_IDLE_TIME_MS", "300000"))
+MONGODB_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGODB_WAIT_QUEUE_TIMEOUT_MS", "10000"))
+MONGODB_CONNECT_TIMEOUT_MS = int(os.getenv("MONGODB_CONNECT_TIMEOUT_MS", "10000"))
+MONGODB_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGODB_SOCKET_TIMEOUT_MS = int(os.getenv("MONGODB_SOCKET_TIMEOUT_MS", "45000"))
+# zlib ships with Python; snappy and zstd need python-snappy / zstandard installed
+MONGODB_COMPRESSORS = os.getenv("MONGODB_COMPRESSORS", "zlib")
+# Validators are applied in "warn" mode by default so existing documents and writers keep working
+MONGODB_VALIDATION_ACTION = os.getenv("MONGODB_VALIDATION_ACTION", "warn")
 
-load_dotenv()
+_client: Optional[AsyncIOMotorClient] = None
+
+def get_client() -> AsyncIOMotorClient:
+    """
+    The process-wide Motor client. Created by init_db() in the app lifespan, or
+    on first use by scripts that do not run one.
+    """
+    global _client
+    if _client is None:
+        uri = os.getenv("MONGODB_URI")
+        if not uri:
+            raise ConfigurationError(
+                "\n❌ MONGODB_URI environment variable is not set.\n"
+                "   Please set it before starting the backend, e.g.:\n"
+                "   export MONGODB_URI='your-mongo-uri'\n"
+            )
+        _client = AsyncIOMotorClient(
+            uri,
+            maxPoolSize=MONGODB_MAX_POOL_SIZE,
+            minPoolSize=MONGODB_MIN_POOL_SIZE,
+            maxIdleTimeMS=MONGODB_MAX_IDLE_TIME_MS,
+            waitQueueTimeoutMS=MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+            connectTimeoutMS=MONGODB_CONNECT_TIMEOUT_MS,
+            serverSelectionTimeoutMS=MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+            socketTimeoutMS=MONGODB_SOCKET_TIMEOUT_MS,
+            compressors=MONGODB_COMPRESSORS or None,
+        )
+    return _client
+
+def get_database() -> AsyncIOMotorDatabase:
+    return get_client()[DATABASE_NAME]
+
+class _LazyCollection:
+    """Collection handle that resolves against the current client on every use."""
+
+    def __init__(self, name: str):
+        self._name = name
+
+    def __getattr__(self, attr):
+        return getattr(get_database()[self._name], attr)
+
+    def __repr__(self):
+        return f"<lazy collection {DATABASE_NAME}.{self._name}>"
 
-MONGO_URI = os.getenv("MONGODB_URI")
-if not MONGO_URI:
-    raise ConfigurationError(
-        "\n❌ MONGODB_URI environment variable is not set.\n"
-        "   Please set it before starting the backend, e.g.:\n"
-        "   export MONGODB_URI='your-mongo-uri'\n"
+class _LazyDatabase:
+    """
+    Stand-in for the database object so modules can keep `from db.mongo import db`
+    and bind collections at import time without opening a connection.
+    """
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return _LazyCollection(name)
+
+    def __getitem__(self, name):
+        return _LazyCollection(name)
+
+    def command(self, *args, **kwargs):
+        return get_database().command(*args, **kwargs)
+
+db = _LazyDatabase()
+
+async def ensure_indexes(database: AsyncIOMotorDatabase):
+    # Login looks users up by email; without this it is a collection scan.
+    await database.users.create_index([("email", ASCENDING)], unique=True, name="email_unique")
+    await database.calendar_events.create_index(
+        [("user_id", ASCENDING), ("eventDate", ASCENDING)], name="user_id_eventDate"
+    )
+    # History pages are a user's entries newest first (app/prediction_history.py).
+    await database.prediction_history.create_index(
+        [("user_id", ASCENDING), ("_id", DESCENDING)], name="user_id_newest"
     )
+    await database.prediction_history.create_index([("prediction_id", ASCENDING)], unique=True, name="prediction_id_unique")
+    # Payments are listed and exported in the order they were recorded (services/payment_store.py).
+    await database.payments.create_index([("recorded_at", ASCENDING), ("_id", ASCENDING)], name="recorded_at")
+    # Lock documents (services/analytics_export.py) are removed once expired.
+    await database.locks.create_index([("expires_at", ASCENDING)], expireAfterSeconds=0, name="expires_at_ttl")
 
-client = MongoClient(MONGO_URI)
-db = client[os.getenv("DATABASE_NAME", "astrobalendar")]
+async def apply_validators(database: AsyncIOMotorDatabase):
+    from .schema_validators import calendar_events_validator, users_validator
 
-async def check_db_connection():
+    existing = set(await database.list_collection_names())
+    for name, validator in (("users", users_validator), ("calendar_events", calendar_events_validator)):
+        options = {"validator": validator, "validationLevel": "moderate", "validationAction": MONGODB_VALIDATION_ACTION}
+        if name in existing:
+            await database.command({"collMod": name, **options})
+        else:
+            await database.create_collection(name, **options)
+
+async def init_db() -> bool:
+    """
+    Create the shared client and bring validators and indexes up to date. Called
+    once from the app lifespan. Each step runs even if the other fails, since
+    collMod needs privileges an index build does not; failures are logged so the
+    app can still start, and the result is True only if both succeeded.
+    """
     try:
-        # The ping command is cheap and does not require auth.
-        await client.admin.command('ping')
-        return True
+        database = get_database()
     except Exception as e:
-        print(f"MongoDB connection error: {e}")
+        logger.error(f"MongoDB initialisation failed: {e}")
         return False
-DATABASE_NAME = os.getenv("DATABASE_NAME", "astrobalendar")
+    ok = True
+    try:
+        await apply_validators(database)
+    except Exception as e:
+        logger.error(f"MongoDB validators could not be applied: {e}")
+        ok = False
+    try:
+        await ensure_indexes(database)
+    except Exception as e:
+        logger.error(f"MongoDB indexes could not be created: {e}")
+        ok = False
+    return ok
 
-client = AsyncIOMotorClient(MONGO_URI)
-db = client[DATABASE_NAME]
+def close_db():
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
 
 async def check_db_connection():
     try:
         # The ping command is cheap and does not require auth.
-        await client.admin.command('ping')
+        await get_client().admin.command('ping')
         return True
     except Exception as e:
         print(f"MongoDB connection error: {e}")
@@ -0,0 +1,111 @@
+"""
+Process-wide resources shared by every router.
+
+One `Resources` is created per application by `app_factory.create_app()` and
+kept on `app.state`; the lifespan starts and closes it. Endpoints receive
+what they need through the dependencies below instead of building their own
+clients, so each worker process holds a single Firestore client, Mongo pool,
+SMTP pool and Stripe executor whatever the number of routers.
+"""
+from dataclasses import dataclass
+from typing import Any
+from fastapi import Depends, Request
+from app.email import EmailService
+from app.prediction_history import PredictionHistory
+from apps.backend.services.analytics_export import AnalyticsExporter
+from apps.backend.services.payment_gateway import PaymentGateway
+from apps.backend.services.payment_store import PaymentStore
+from apps.backend.services.pdf_export import shutdown_process_pool
+from db.mongo import close_db, get_client, init_db
+from utils.firebase_utils import get_async_firestore_client
+from utils.firestore_batch import FirestoreBatchWriter
+from utils.health import CachedProbe
+from utils.tracing import tracer
+
+
+class LazyFirestore:
+    """
+    Stand-in for the async Firestore client. Firebase Admin is initialised on
+    first use (see utils.firebase_utils), not when the app is built.
+    """
+
+    def __getattr__(self, name):
+        return getattr(get_async_firestore_client(), name)
+
+
+@dataclass
+class Resources:
+    firestore: Any
+    # Prediction logs are write-only and high volume; coalesce them into batch commits.
+    prediction_writer: FirestoreBatchWriter
+    # Read-only probes, cached so that frequent health checks cost at most one round trip per interval.
+    firestore_probe: CachedProbe
+    mongo_probe: CachedProbe
+    email_service: EmailService
+    payment_gateway: PaymentGateway
+    payment_store: PaymentStore
+    analytics_exporter: AnalyticsExporter
+    prediction_history: PredictionHistory
+
+    @classmethod
+    def create(cls) -> "Resources":
+        firestore = LazyFirestore()
+        payment_store = PaymentStore()
+        return cls(
+            firestore=firestore,
+            prediction_writer=FirestoreBatchWriter(firestore),
+            firestore_probe=CachedProbe(lambda: firestore.collection('health').document('check').get()),
+            mongo_probe=CachedProbe(lambda: get_client().admin.command('ping')),
+            email_service=EmailService(),
+            payment_gateway=PaymentGateway(),
+            payment_store=payment_store,
+            analytics_exporter=AnalyticsExporter(payments=payment_store),
+            prediction_history=PredictionHistory(),
+        )
+
+    async def start(self):
+        await init_db()
+        await self.email_service.start()
+        self.analytics_exporter.start()
+
+    async def close(self):
+        await self.analytics_exporter.stop()
+        await self.prediction_writer.close()
+        await self.email_service.stop()
+        self.payment_gateway.shutdown()
+        shutdown_process_pool()
+        close_db()
+        # Export spans still buffered in the batch processor
+        tracer.shutdown()
+
+
+def get_resources(request: Request) -> Resources:
+    return request.app.state.resources
+
+
+def get_firestore(resources: Resources = Depends(get_resources)):
+    return resources.firestore
+
+
+def get_prediction_writer(resources: Resources = Depends(get_resources)) -> FirestoreBatchWriter:
+    return resources.prediction_writer
+
+
+def get_email_service(resources: Resources = Depends(get_resources)) -> EmailService:
+    return resources.email_service
+
+
+def get_prediction_history(resources: Resources = Depends(get_resources)) -> PredictionHistory:
+    return resources.prediction_history
+
+
+def get_payment_gateway(resources: Resources = Depends(get_resources)) -> PaymentGateway:
+    return resources.payment_gateway
+
+
+def get_payment_store(resources: Resources = Depends(get_resources)) -> PaymentStore:
+    return resources.payment_store
+
+
+def get_analytics_exporter(resources: Resources = Depends(get_resources)) -> AnalyticsExporter:
+    return resources.analytics_exporter
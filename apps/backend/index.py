@@ -1,36 +1,12 @@
-import firebase_admin
-from firebase_admin import credentials, firestore
-import os
-from flask import Flask, request, jsonify
-
-# Initialize Firebase Admin
-current_dir = os.path.dirname(os.path.abspath(__file__))
-cred = credentials.Certificate(os.path.join(current_dir, 'serviceAccountKey.json'))
-firebase_admin.initialize_app(cred)
-db = firestore.client()
-
-app = Flask(__name__)
-
-@app.route('/predict', methods=['POST'])
-def predict():
-    try:
-        # Get request data
-        request_json = request.get_json()
-        
-        # Process prediction
-        # TODO: Implement prediction logic
-        response = {
-            'status': 'success',
-            'message': 'Prediction processed successfully'
-        }
-        
-        return jsonify(response)
-    except Exception as e:
-        print(f'Error in predict function: {str(e)}')
-        return jsonify({
-            'status': 'error',
-            'message': 'An error occurred while processing your request'
-        }), 500
-
-if __name__ == '__main__':
-    app.run(debug=True)
+"""
+Serverless entrypoint. Exposes the unified ASGI application; POST /predict is
+served by api/records.py and takes its PredictionRequest body (birthDate,
+birthTime, birthPlace, predictionType), not the free-form JSON the old Flask
+stub accepted.
+"""
+from dotenv import load_dotenv
+load_dotenv()
+
+from app_factory import create_app
+
+app = create_app()
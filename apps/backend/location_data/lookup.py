@@ -2,6 +2,7 @@ import json
 import os
 import requests
 from typing import Optional, Dict
+from utils.tracing import traced
 
 INDIAN_LOCATIONS_PATH = os.path.join(os.path.dirname(__file__), 'indian_locations.json')
 GOOGLE_GEOCODE_API = 'https://maps.googleapis.com/maps/api/geocode/json'
@@ -35,6 +36,7 @@ def find_location_in_static(city: str, state: str = None, district: str = None)
     return None
 
 
+@traced("location.geocode_google")
 def geocode_with_google(city: str, state: str = None, district: str = None, country: str = 'India') -> Optional[Dict]:
     if not GOOGLE_API_KEY:
         return None
@@ -65,6 +67,7 @@ def geocode_with_google(city: str, state: str = None, district: str = None, coun
     return None
 
 
+@traced("location.lookup")
 def get_location_info(city: str, state: str = None, district: str = None, country: str = 'India') -> Optional[Dict]:
     # Try static dataset with city+district+state
     static_result = find_location_in_static(city, state, district)
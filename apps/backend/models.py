@@ -1,7 +1,11 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+import os
+from pydantic import BaseModel, EmailStr, Field
+from typing import Dict, Optional, List
 from datetime import datetime
 
+# Most predictions one batch PDF export may ask for.
+PDF_EXPORT_MAX_ITEMS = int(os.getenv("PDF_EXPORT_MAX_ITEMS", "100"))
+
 class Prediction(BaseModel):
     id: Optional[str]
     name: str
@@ -20,12 +24,16 @@ class PlanetPosition(BaseModel):
     house: int
 
 class KPPredictionResult(BaseModel):
+    id: Optional[str] = None
     name: str
     birth_date: datetime
     planetary_positions: List[PlanetPosition]
     houses: List[int]
     prediction_summary: str
 
+class PredictionBatchExportRequest(BaseModel):
+    prediction_ids: List[str] = Field(..., max_length=PDF_EXPORT_MAX_ITEMS)
+
 class PredictionSummary(BaseModel):
     id: str
     name: str
@@ -77,7 +85,8 @@ class AdminStatsSummary(BaseModel):
     total_users: int
     total_clients: int
     total_predictions: int
-    total_revenue: float
+    # Keyed by currency; amounts in different currencies are not added together.
+    total_revenue: Dict[str, float]
 
 class AdminPredictionOut(BaseModel):
     id: str
@@ -1,34 +1,272 @@
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
+# ReportLab is imported inside the rendering functions: it is only needed once
+# a report is drawn, and keeping it out of module import shortens cold starts.
 from io import BytesIO
+from collections import OrderedDict
+from functools import lru_cache
+import hashlib
+import json
+import os
+import threading
+from utils.metrics import REGISTRY, cache_requests, timed
+
+PDF_RENDER_CACHE_MAX_BYTES = int(os.getenv("PDF_RENDER_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+PDF_LOGO_PATH = os.getenv("PDF_LOGO_PATH")
+# Bump whenever a change to the layout, templates or fonts changes the PDF for the same content,
+# so report ETags and cached renders from the old renderer stop matching.
+PDF_RENDERER_VERSION = "1"
+
+pdf_render_seconds = REGISTRY.histogram("pdf_render_seconds", "Time to lay out and render a prediction PDF", ("chart_style",))
+
+_render_cache = OrderedDict()
+_render_cache_bytes = 0
+_render_cache_lock = threading.Lock()
+
+# reportlab.lib.pagesizes.letter, in points
+PAGE_WIDTH, PAGE_HEIGHT = 612.0, 792.0
+MARGIN = 54
+HEADER_HEIGHT = 64
+FOOTER_HEIGHT = 36
+CONTENT_TOP = PAGE_HEIGHT - HEADER_HEIGHT - 24
+CONTENT_BOTTOM = FOOTER_HEIGHT + 24
+LINE_HEIGHT = 16
+CHART_SIZE = 216
+BRAND_COLOR = "#4B2C83"
+MUTED_COLOR = "#8A8A8A"
+
+SIGNS = ["Aries", "Taurus", "Gemini", "Cancer", "Leo", "Virgo",
+         "Libra", "Scorpio", "Sagittarius", "Capricorn", "Aquarius", "Pisces"]
+PLANET_ABBREVIATIONS = {"Sun": "Su", "Moon": "Mo", "Mars": "Ma", "Mercury": "Me", "Jupiter": "Ju",
+                        "Venus": "Ve", "Saturn": "Sa", "Rahu": "Ra", "Ketu": "Ke"}
+# South Indian charts fix the signs: (row, column) of each sign's cell in a 4x4 grid, row 0 on top.
+SOUTH_SIGN_CELLS = [(0, 1), (0, 2), (0, 3), (1, 3), (2, 3), (3, 3),
+                    (3, 2), (3, 1), (3, 0), (2, 0), (1, 0), (0, 0)]
+# North Indian charts fix the houses: label position of each house as a fraction of the chart size.
+NORTH_HOUSE_CENTERS = [(0.5, 0.75), (0.25, 0.9), (0.1, 0.75), (0.25, 0.5), (0.1, 0.25), (0.25, 0.1),
+                       (0.5, 0.25), (0.75, 0.1), (0.9, 0.25), (0.75, 0.5), (0.9, 0.75), (0.75, 0.9)]
+
+@lru_cache(maxsize=1)
+def _logo():
+    """Decoded logo, loaded once per process and reused by every report."""
+    if PDF_LOGO_PATH and os.path.exists(PDF_LOGO_PATH):
+        from reportlab.lib.utils import ImageReader
+        return ImageReader(PDF_LOGO_PATH)
+    return None
+
+@lru_cache(maxsize=None)
+def _south_cell_origins(size: float):
+    cell = size / 4
+    return [(column * cell, size - (row + 1) * cell) for row, column in SOUTH_SIGN_CELLS]
+
+@lru_cache(maxsize=None)
+def _north_house_centers(size: float):
+    return [(x * size, y * size) for x, y in NORTH_HOUSE_CENTERS]
+
+def _define_templates(c):
+    """
+    Record the parts of the report that never change as form XObjects. Each is
+    stored once in the PDF and referenced from every page that shows it, so
+    per-page work is limited to the variable text.
+    """
+    c.beginForm("chrome")
+    c.setFillColor(BRAND_COLOR)
+    c.rect(0, PAGE_HEIGHT - HEADER_HEIGHT, PAGE_WIDTH, HEADER_HEIGHT, stroke=0, fill=1)
+    logo = _logo()
+    text_x = MARGIN
+    if logo is not None:
+        c.drawImage(logo, MARGIN, PAGE_HEIGHT - HEADER_HEIGHT + 12, width=40, height=40, mask="auto")
+        text_x += 52
+    c.setFillColorRGB(1, 1, 1)
+    c.setFont("Helvetica-Bold", 16)
+    c.drawString(text_x, PAGE_HEIGHT - HEADER_HEIGHT + 26, "AstroBalendar KP Prediction Report")
+    c.setStrokeColor(MUTED_COLOR)
+    c.setLineWidth(0.5)
+    c.line(MARGIN, FOOTER_HEIGHT, PAGE_WIDTH - MARGIN, FOOTER_HEIGHT)
+    c.setFillColor(MUTED_COLOR)
+    c.setFont("Helvetica", 8)
+    c.drawString(MARGIN, FOOTER_HEIGHT - 12, "astrobalendar.com")
+    c.endForm()
+
+    c.beginForm("south_chart")
+    c.setLineWidth(1)
+    c.setStrokeColor(BRAND_COLOR)
+    cell = CHART_SIZE / 4
+    for x, y in _south_cell_origins(CHART_SIZE):
+        c.rect(x, y, cell, cell)
+    c.setFillColor(MUTED_COLOR)
+    c.setFont("Helvetica", 6)
+    for sign, (x, y) in zip(SIGNS, _south_cell_origins(CHART_SIZE)):
+        c.drawString(x + 3, y + cell - 8, sign)
+    c.endForm()
+
+    c.beginForm("north_chart")
+    c.setLineWidth(1)
+    c.setStrokeColor(BRAND_COLOR)
+    size, half = CHART_SIZE, CHART_SIZE / 2
+    c.rect(0, 0, size, size)
+    c.line(0, 0, size, size)
+    c.line(0, size, size, 0)
+    path = c.beginPath()
+    path.moveTo(half, 0)
+    path.lineTo(size, half)
+    path.lineTo(half, size)
+    path.lineTo(0, half)
+    path.close()
+    c.drawPath(path)
+    c.endForm()
+
+class _ReportLayout:
+    """Flows report sections down the page, starting a new page when one fills up."""
+
+    def __init__(self, c):
+        self.c = c
+        self.page = 0
+        self.y = 0
+        self._new_page()
+
+    def _new_page(self):
+        if self.page:
+            self.c.showPage()
+        self.page += 1
+        self.c.doForm("chrome")
+        self.c.setFillColor(MUTED_COLOR)
+        self.c.setFont("Helvetica", 8)
+        self.c.drawRightString(PAGE_WIDTH - MARGIN, FOOTER_HEIGHT - 12, f"Page {self.page}")
+        self.c.setFillColorRGB(0, 0, 0)
+        self.y = CONTENT_TOP
+
+    def ensure_space(self, height: float):
+        if self.y - height < CONTENT_BOTTOM:
+            self._new_page()
+
+    def heading(self, text: str):
+        # Keep a heading together with at least its first line.
+        self.ensure_space(LINE_HEIGHT * 3)
+        self.y -= 6
+        self.c.setFont("Helvetica-Bold", 13)
+        self.c.setFillColor(BRAND_COLOR)
+        self.c.drawString(MARGIN, self.y, text)
+        self.c.setFillColorRGB(0, 0, 0)
+        self.y -= LINE_HEIGHT + 4
+
+    def line(self, text: str, indent: float = 0, font: str = "Helvetica", size: int = 11):
+        self.ensure_space(LINE_HEIGHT)
+        self.c.setFont(font, size)
+        self.c.drawString(MARGIN + indent, self.y, text)
+        self.y -= LINE_HEIGHT
+
+    def paragraph(self, text: str, indent: float = 0):
+        from reportlab.lib.utils import simpleSplit
+        width = PAGE_WIDTH - 2 * MARGIN - indent
+        for raw_line in text.split("\n"):
+            for wrapped in simpleSplit(raw_line, "Helvetica", 11, width) or [""]:
+                self.line(wrapped, indent)
+
+    def chart(self, style: str, planets: list):
+        self.ensure_space(CHART_SIZE + LINE_HEIGHT)
+        x = (PAGE_WIDTH - CHART_SIZE) / 2
+        y = self.y - CHART_SIZE
+        c = self.c
+        c.saveState()
+        c.translate(x, y)
+        c.doForm(f"{style}_chart")
+        c.setFont("Helvetica-Bold", 8)
+        c.setFillColorRGB(0, 0, 0)
+        if style == "north":
+            slots = _north_house_centers(CHART_SIZE)
+            for index, labels in _group_planets(planets, lambda p: int(p.get("house", 1)) - 1).items():
+                cx, cy = slots[index]
+                for row, label in enumerate(labels):
+                    c.drawCentredString(cx, cy - row * 9, label)
+        else:
+            cell = CHART_SIZE / 4
+            slots = _south_cell_origins(CHART_SIZE)
+            for index, labels in _group_planets(planets, lambda p: int(float(p.get("longitude", 0)) // 30)).items():
+                cx, cy = slots[index]
+                for row, label in enumerate(labels):
+                    c.drawString(cx + 4, cy + cell - 20 - row * 9, label)
+        c.restoreState()
+        self.y = y - LINE_HEIGHT
+
+def _group_planets(planets: list, slot_of) -> dict:
+    grouped = {}
+    for planet in planets:
+        name = planet.get("planet", "")
+        grouped.setdefault(slot_of(planet) % 12, []).append(PLANET_ABBREVIATIONS.get(name, name[:2]))
+    return grouped
 
 def generate_prediction_pdf(prediction_data: dict) -> bytes:
     """
     Generate a styled PDF report from KP prediction data and return as bytes.
     """
+    with timed(pdf_render_seconds, chart_style="north" if prediction_data.get('chart_style') == "north" else "south"):
+        return _generate_prediction_pdf(prediction_data)
+
+def _generate_prediction_pdf(prediction_data: dict) -> bytes:
+    from reportlab.pdfgen import canvas
     buffer = BytesIO()
-    c = canvas.Canvas(buffer, pagesize=letter)
-    c.setFont("Helvetica-Bold", 16)
-    c.drawString(100, 750, "AstroBalendar KP Prediction Report")
-    c.setFont("Helvetica", 12)
-    c.drawString(100, 730, f"Name: {prediction_data.get('name', '')}")
-    c.drawString(100, 710, f"Birth Date: {prediction_data.get('birth_date', '')}")
-
-    y = 690
-    c.drawString(100, y, "Planetary Positions:")
-    y -= 20
-    for planet in prediction_data.get('planetary_positions', []):
-        c.drawString(120, y, f"{planet['planet']}: Longitude {planet['longitude']}, House {planet['house']}")
-        y -= 20
-
-    c.drawString(100, y, "Prediction Summary:")
-    y -= 20
-    summary = prediction_data.get('prediction_summary', '')
-    for line in summary.split('\n'):
-        c.drawString(120, y, line)
-        y -= 20
+    c = canvas.Canvas(buffer, pagesize=(PAGE_WIDTH, PAGE_HEIGHT))
+    _define_templates(c)
+    layout = _ReportLayout(c)
+
+    layout.line(f"Name: {prediction_data.get('name', '')}", font="Helvetica-Bold", size=12)
+    layout.line(f"Birth Date: {prediction_data.get('birth_date', '')}")
+
+    planets = prediction_data.get('planetary_positions', [])
+    style = "north" if prediction_data.get('chart_style') == "north" else "south"
+    layout.heading("Birth Chart")
+    layout.chart(style, planets)
+
+    layout.heading("Planetary Positions")
+    for planet in planets:
+        sign = SIGNS[int(float(planet['longitude']) // 30) % 12]
+        layout.line(f"{planet['planet']}: Longitude {planet['longitude']} ({sign}), House {planet['house']}", indent=20)
+
+    houses = prediction_data.get('houses')
+    if houses:
+        layout.heading("House Cusps")
+        layout.paragraph(", ".join(str(house) for house in houses), indent=20)
+
+    layout.heading("Prediction Summary")
+    layout.paragraph(prediction_data.get('prediction_summary', ''), indent=20)
 
     c.save()
     pdf = buffer.getvalue()
     buffer.close()
     return pdf
+
+def prediction_content_hash(prediction_data: dict) -> str:
+    """
+    Hash of the prediction content, stable across key order and storage round trips.
+    """
+    canonical = json.dumps(prediction_data, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def report_version(prediction_data: dict) -> str:
+    """
+    Identifies the rendered report: the renderer version and the content hash.
+    Used as the report's ETag and render cache key.
+    """
+    return f"{PDF_RENDERER_VERSION}-{prediction_content_hash(prediction_data)}"
+
+def render_prediction_pdf(prediction_data: dict) -> bytes:
+    """
+    Render a prediction report, reusing the cached PDF when the same content was rendered before.
+    """
+    global _render_cache_bytes
+    key = report_version(prediction_data)
+    with _render_cache_lock:
+        pdf = _render_cache.get(key)
+        if pdf is not None:
+            _render_cache.move_to_end(key)
+            cache_requests.inc(cache="pdf_render", result="hit")
+            return pdf
+    cache_requests.inc(cache="pdf_render", result="miss")
+    pdf = generate_prediction_pdf(prediction_data)
+    with _render_cache_lock:
+        if key not in _render_cache and len(pdf) <= PDF_RENDER_CACHE_MAX_BYTES:
+            _render_cache[key] = pdf
+            _render_cache_bytes += len(pdf)
+            while _render_cache_bytes > PDF_RENDER_CACHE_MAX_BYTES:
+                _, evicted = _render_cache.popitem(last=False)
+                _render_cache_bytes -= len(evicted)
+    return pdf
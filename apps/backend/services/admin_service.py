@@ -1,20 +1,18 @@
 from typing import List
 from apps.backend.models import AdminStatsSummary, AdminPredictionOut, AdminPaymentOut
-from apps.backend.storage import load_predictions, load_payments, load_users, load_clients
+from apps.backend.storage import load_predictions, load_users, load_clients
+from apps.backend.services.payment_store import PaymentStore
 
-def get_admin_stats_summary() -> AdminStatsSummary:
+async def get_admin_stats_summary(store: PaymentStore) -> AdminStatsSummary:
     users = load_users()
     clients = load_clients()
     predictions = load_predictions()
-    payments = load_payments()
-
-    total_revenue = sum(payment.get("amount", 0) for payment in payments)
 
     return AdminStatsSummary(
         total_users=len(users),
         total_clients=len(clients),
         total_predictions=len(predictions),
-        total_revenue=total_revenue,
+        total_revenue=await store.revenue(),
     )
 
 def get_admin_predictions(page: int = 1, page_size: int = 20) -> List[AdminPredictionOut]:
@@ -24,11 +22,8 @@ def get_admin_predictions(page: int = 1, page_size: int = 20) -> List[AdminPredi
     paged = predictions[start:end]
     return [AdminPredictionOut(**pred) for pred in paged]
 
-def get_admin_payments(page: int = 1, page_size: int = 20) -> List[AdminPaymentOut]:
-    payments = load_payments()
-    start = (page - 1) * page_size
-    end = start + page_size
-    paged = payments[start:end]
+async def get_admin_payments(store: PaymentStore, page: int = 1, page_size: int = 20) -> List[AdminPaymentOut]:
+    paged = await store.list_payments(skip=(page - 1) * page_size, limit=page_size)
     return [AdminPaymentOut(**payment) for payment in paged]
 
 def get_admin_users(page: int = 1, page_size: int = 20):
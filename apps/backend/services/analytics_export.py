@@ -0,0 +1,310 @@
+"""
+Columnar analytics copies of predictions, clients and payments.
+
+`AnalyticsExporter.export()` appends rows added since the previous export to
+Parquet datasets under ANALYTICS_DIR, one directory per dataset, partitioned
+by month (`predictions/month=2024-05/part-...parquet`). Predictions and
+payments are append-only in the operational store, so each export only reads
+and writes the new rows past a watermark: a position in the predictions file,
+a (recorded_at, _id) keyset cursor over payments. Clients can be edited and
+deleted, so they are rewritten as a single snapshot file.
+
+Every worker runs the exporter, but an export only proceeds in the process
+holding the `analytics_export` lock document in MongoDB, which expires after
+ANALYTICS_EXPORT_LOCK_SECONDS in case its holder dies. Watermarks are kept in
+`analytics_exports` and claimed with a compare-and-set before any file is
+written, together with the claimed range; part files are named after that
+range, so a run that dies half way is redone by the next one over the same
+files rather than next to them. ANALYTICS_DIR must be shared by the workers.
+
+`query()` aggregates over those files with pyarrow and never touches the
+operational store, so dashboards cost nothing on the request path. PyArrow is
+imported on first use.
+"""
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+from pymongo.errors import DuplicateKeyError
+from apps.backend.services.payment_store import PaymentStore
+from apps.backend.storage import load_clients, load_predictions
+from db.mongo import db
+
+logger = logging.getLogger(__name__)
+
+ANALYTICS_DIR = os.getenv("ANALYTICS_DIR", "analytics")
+# 0 disables the background export; POST /api/admin/analytics/export still runs one.
+ANALYTICS_EXPORT_INTERVAL_SECONDS = float(os.getenv("ANALYTICS_EXPORT_INTERVAL_SECONDS", "300"))
+ANALYTICS_EXPORT_LOCK_SECONDS = float(os.getenv("ANALYTICS_EXPORT_LOCK_SECONDS", "600"))
+# Payments recorded more recently than this are left for the next export, so one
+# whose write commits a little after a later-stamped payment is not skipped.
+ANALYTICS_PAYMENT_SETTLE_SECONDS = float(os.getenv("ANALYTICS_PAYMENT_SETTLE_SECONDS", "60"))
+
+EXPORT_LOCK_ID = "analytics_export"
+state_collection = db["analytics_exports"]
+locks_collection = db["locks"]
+
+AGGREGATIONS = ("count", "count_distinct", "sum", "mean", "min", "max")
+
+
+def _timestamp(value) -> Optional[datetime]:
+    """Stored timestamps are ISO strings, naive ones in UTC."""
+    if not value:
+        return None
+    try:
+        parsed = value if isinstance(value, datetime) else datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _prediction_row(prediction: dict) -> dict:
+    return {
+        "id": prediction.get("id"),
+        "name": prediction.get("name"),
+        # Predictions made through a user account carry who made them.
+        "astrologer_id": prediction.get("astrologer_id") or prediction.get("user_id"),
+        "client_id": prediction.get("client_id"),
+        "birth_date": _timestamp(prediction.get("birth_date")),
+        "created_at": _timestamp(prediction.get("created_at")),
+    }
+
+
+def _payment_row(payment: dict) -> dict:
+    return {
+        "payment_id": payment["payment_id"],
+        "status": payment.get("status"),
+        "amount": float(payment.get("amount") or 0),
+        "currency": payment.get("currency"),
+        "client_id": payment.get("client_id"),
+        "created_at": _timestamp(payment.get("created_at")),
+    }
+
+
+def _client_row(client: dict) -> dict:
+    return {
+        "id": client.get("id"),
+        "name": client.get("name"),
+        "birth_date": _timestamp(client.get("birth_date")),
+        "birth_time": client.get("birth_time"),
+        "birth_location": client.get("birth_location"),
+    }
+
+
+def _schemas():
+    import pyarrow as pa
+    timestamp = pa.timestamp("us", tz="UTC")
+    return {
+        "predictions": pa.schema([
+            ("id", pa.string()), ("name", pa.string()), ("astrologer_id", pa.string()),
+            ("client_id", pa.string()), ("birth_date", timestamp), ("created_at", timestamp),
+        ]),
+        "payments": pa.schema([
+            ("payment_id", pa.string()), ("status", pa.string()), ("amount", pa.float64()),
+            ("currency", pa.string()), ("client_id", pa.string()), ("created_at", timestamp),
+        ]),
+        "clients": pa.schema([
+            ("id", pa.string()), ("name", pa.string()), ("birth_date", timestamp),
+            ("birth_time", pa.string()), ("birth_location", pa.string()),
+        ]),
+    }
+
+
+DATASETS = ("predictions", "payments", "clients")
+
+
+class AnalyticsExporter:
+    def __init__(
+        self,
+        directory: str = ANALYTICS_DIR,
+        interval: float = ANALYTICS_EXPORT_INTERVAL_SECONDS,
+        state=state_collection,
+        locks=locks_collection,
+        lock_seconds: float = ANALYTICS_EXPORT_LOCK_SECONDS,
+        payment_settle_seconds: float = ANALYTICS_PAYMENT_SETTLE_SECONDS,
+        payments: Optional[PaymentStore] = None,
+    ):
+        self.directory = directory
+        self.interval = interval
+        self.state = state
+        self.locks = locks
+        self.lock_seconds = lock_seconds
+        self.payment_settle_seconds = payment_settle_seconds
+        self.payments = payments if payments is not None else PaymentStore()
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._task: Optional[asyncio.Task] = None
+
+    async def _acquire(self) -> bool:
+        now = datetime.utcnow()
+        try:
+            # Matches a free (expired) lock or our own; otherwise the upsert collides on _id.
+            await self.locks.find_one_and_update(
+                {"_id": EXPORT_LOCK_ID, "$or": [{"expires_at": {"$lte": now}}, {"owner": self.owner}]},
+                {"$set": {"owner": self.owner, "expires_at": now + timedelta(seconds=self.lock_seconds)}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            return False
+        return True
+
+    async def _release(self):
+        await self.locks.delete_one({"_id": EXPORT_LOCK_ID, "owner": self.owner})
+
+    def _write_table(self, rows: List[dict], schema, path: str):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        pq.write_table(pa.Table.from_pylist(rows, schema=schema), tmp)
+        os.replace(tmp, path)
+
+    def _append(self, dataset: str, rows: List[dict], start: int, schema):
+        """
+        Write rows [start, start + len(rows)) of a dataset, one file per month.
+        File names carry the row range, so redoing a claimed range overwrites
+        instead of duplicating.
+        """
+        by_month: Dict[str, List[dict]] = defaultdict(list)
+        for row in rows:
+            created = row["created_at"]
+            by_month[created.strftime("%Y-%m") if created else "unknown"].append(row)
+        name = f"part-{start:09d}-{start + len(rows):09d}.parquet"
+        for month, month_rows in by_month.items():
+            self._write_table(month_rows, schema, os.path.join(self.directory, dataset, f"month={month}", name))
+
+    async def _load_predictions(self, after: Optional[int], through: Optional[int]):
+        # The predictions file is append-only, so a position is a stable cursor.
+        predictions = await asyncio.to_thread(load_predictions)
+        end = len(predictions) if through is None else through
+        return predictions[after or 0:end], end
+
+    async def _load_payments(self, after: Optional[dict], through: Optional[dict]):
+        settled = None
+        if through is None:
+            settled = datetime.utcnow() - timedelta(seconds=self.payment_settle_seconds)
+        return await self.payments.list_recorded(after, through, settled)
+
+    async def _export_dataset(self, dataset: str, load, to_row, schema) -> int:
+        state = await self.state.find_one({"_id": dataset}) or {}
+        exported = state.get("exported", 0)
+        pending = state.get("pending")
+        if pending:
+            # Claimed by a run that stopped before writing all of its files.
+            rows, _ = await load(pending["after"], state["cursor"])
+            await asyncio.to_thread(self._append, dataset, [to_row(row) for row in rows], pending["start"], schema)
+            await self.state.update_one({"_id": dataset, "exported": exported}, {"$unset": {"pending": ""}})
+
+        rows, cursor = await load(state.get("cursor"), None)
+        if not rows:
+            return 0
+        claim = {"exported": exported + len(rows), "cursor": cursor, "pending": {"start": exported, "after": state.get("cursor")}}
+        try:
+            result = await self.state.update_one({"_id": dataset, "exported": exported}, {"$set": claim}, upsert=True)
+        except DuplicateKeyError:
+            result = None
+        if result is None or (not result.modified_count and result.upserted_id is None):
+            logger.warning(f"Analytics export of {dataset} skipped: the watermark moved under this run")
+            return 0
+        await asyncio.to_thread(self._append, dataset, [to_row(row) for row in rows], exported, schema)
+        await self.state.update_one({"_id": dataset, "exported": exported + len(rows)}, {"$unset": {"pending": ""}})
+        return len(rows)
+
+    async def export(self) -> Optional[Dict[str, int]]:
+        """
+        Export what changed since the last run. Returns rows written per dataset,
+        or None when another process is exporting.
+        """
+        if not await self._acquire():
+            return None
+        try:
+            schemas = _schemas()
+            await asyncio.to_thread(os.makedirs, self.directory, exist_ok=True)
+            written = {
+                "predictions": await self._export_dataset("predictions", self._load_predictions, _prediction_row, schemas["predictions"]),
+                "payments": await self._export_dataset("payments", self._load_payments, _payment_row, schemas["payments"]),
+            }
+            clients = [_client_row(client) for client in await asyncio.to_thread(load_clients)]
+            path = os.path.join(self.directory, "clients", "snapshot.parquet")
+            await asyncio.to_thread(self._write_table, clients, schemas["clients"], path)
+            written["clients"] = len(clients)
+            return written
+        finally:
+            await self._release()
+
+    def query(
+        self,
+        dataset: str,
+        group_by: Sequence[str] = (),
+        metrics: Sequence[Tuple[str, str]] = (("count", "*"),),
+        from_month: Optional[str] = None,
+        to_month: Optional[str] = None,
+    ) -> List[dict]:
+        """
+        Aggregate one dataset, e.g. predictions per astrologer per month:
+        `query("predictions", ["astrologer_id", "month"])`, or revenue by currency:
+        `query("payments", ["currency"], [("sum", "amount")])`. `metrics` are
+        (aggregation, column) pairs; ("count", "*") counts rows. Month bounds
+        are inclusive "YYYY-MM" strings and prune partitions before reading.
+        Raises ValueError for unknown datasets, columns or aggregations.
+        """
+        import pyarrow.dataset as ds
+
+        if dataset not in DATASETS:
+            raise ValueError(f"Unknown dataset {dataset!r}")
+        partitioned = dataset != "clients"
+        columns = set(_schemas()[dataset].names) | ({"month"} if partitioned else set())
+        for aggregation, column in metrics:
+            if aggregation not in AGGREGATIONS:
+                raise ValueError(f"Unknown aggregation {aggregation!r}")
+            if column != "*" and column not in columns:
+                raise ValueError(f"Unknown column {column!r}")
+            if column == "*" and aggregation != "count":
+                raise ValueError(f"{aggregation} needs a column")
+        unknown = [column for column in group_by if column not in columns]
+        if unknown:
+            raise ValueError(f"Unknown columns {unknown}")
+        if (from_month or to_month) and not partitioned:
+            raise ValueError(f"{dataset} is not partitioned by month")
+
+        path = os.path.join(self.directory, dataset)
+        if not os.path.isdir(path):
+            return []
+        source = ds.dataset(path, format="parquet", partitioning=ds.partitioning(flavor="hive") if partitioned else None,
+                            exclude_invalid_files=True)
+        condition = None
+        if from_month:
+            condition = ds.field("month") >= from_month
+        if to_month:
+            upper = ds.field("month") <= to_month
+            condition = upper if condition is None else condition & upper
+        needed = sorted(set(group_by) | {column for _, column in metrics if column != "*"})
+        table = source.to_table(columns=needed or None, filter=condition)
+        aggregates = [([], "count_all") if column == "*" else (column, aggregation) for aggregation, column in metrics]
+        result = table.group_by(list(group_by)).aggregate(aggregates)
+        if group_by:
+            result = result.sort_by([(column, "ascending") for column in group_by])
+        return result.to_pylist()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                written = await self.export()
+                logger.debug(f"Analytics export: {written if written is not None else 'running in another process'}")
+            except Exception as e:
+                logger.error(f"Analytics export failed: {e}")
+
+    def start(self):
+        """Export every `interval` seconds in the background; a no-op when the interval is 0."""
+        if self.interval > 0 and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
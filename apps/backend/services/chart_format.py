@@ -0,0 +1,178 @@
+"""
+Versioned fixed-layout binary record for KP charts.
+
+A chart's numbers (birth moment, planet longitudes and houses, house cusps)
+are packed into one NumPy structured record of `record_size()` bytes. A chart
+file is a 16-byte `file_header()` followed by records back to back, so
+appending a chart is a single write and `load_chart_array()` maps a whole file into a NumPy array
+without copying or parsing. Names, summaries and other free text stay in the
+JSON prediction store.
+
+Layout, version 1 (little endian, unaligned):
+
+    id              32 bytes   ASCII prediction id, NUL padded
+    birth_us        int64      microseconds since the Unix epoch, UTC wall time
+    birth_offset    int16      UTC offset of the birth date in minutes, NAIVE_OFFSET if it had none
+    longitudes      9 float64  in PLANETS order, NaN when the planet is absent
+    planet_houses   9 uint8    house of each planet, 0 when absent
+    cusps           12 int16   the chart's houses
+
+Bump CHART_FORMAT_VERSION and keep a decoder for the old layout when adding
+fields (lords, dasa boundaries) rather than changing version 1 in place.
+"""
+import struct
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    import numpy as np
+
+CHART_FORMAT_VERSION = 1
+CHART_MEDIA_TYPE = f"application/vnd.astrobalendar.kp-chart; version={CHART_FORMAT_VERSION}"
+PLANETS = ("Sun", "Moon", "Mars", "Mercury", "Jupiter", "Venus", "Saturn", "Rahu", "Ketu")
+POSITION_FIELDS = {"planet", "longitude", "house"}
+HOUSE_COUNT = 12
+ID_SIZE = 32
+
+# magic, format version, record size; padded to 16 bytes
+_HEADER = struct.Struct("<8sHH4x")
+HEADER_SIZE = _HEADER.size
+MAGIC = b"KPCHART\0"
+EPOCH = datetime(1970, 1, 1)
+# birth_offset of a birth date without a timezone
+NAIVE_OFFSET = -32768
+
+
+@lru_cache(maxsize=1)
+def chart_dtype() -> "np.dtype":
+    # NumPy is imported on first use, keeping it out of the app's cold start.
+    import numpy as np
+    return np.dtype([
+        ("id", f"S{ID_SIZE}"),
+        ("birth_us", "<i8"),
+        ("birth_offset", "<i2"),
+        ("longitudes", "<f8", (len(PLANETS),)),
+        ("planet_houses", "u1", (len(PLANETS),)),
+        ("cusps", "<i2", (HOUSE_COUNT,)),
+    ])
+
+
+def record_size() -> int:
+    return chart_dtype().itemsize
+
+
+def file_header() -> bytes:
+    return _HEADER.pack(MAGIC, CHART_FORMAT_VERSION, record_size())
+
+
+def _check_header(header: bytes):
+    magic, version, size = _HEADER.unpack(header[:HEADER_SIZE])
+    if magic != MAGIC:
+        raise ValueError("Not a KP chart file")
+    if version != CHART_FORMAT_VERSION or size != record_size():
+        raise ValueError(f"Unsupported chart format version {version}")
+
+
+def _birth_date(birth_us: int, offset: int) -> datetime:
+    birth = EPOCH + timedelta(microseconds=birth_us)
+    if offset == NAIVE_OFFSET:
+        return birth
+    return birth.replace(tzinfo=timezone.utc).astimezone(timezone(timedelta(minutes=offset)))
+
+
+def _birth_moment(value) -> Optional[tuple]:
+    """
+    (birth_us, birth_offset) for a birth date, or None unless decoding gives it
+    back exactly: the same string, or an equal datetime with the same offset.
+    """
+    try:
+        moment = datetime.fromisoformat(value) if isinstance(value, str) else value
+    except ValueError:
+        return None
+    if not isinstance(moment, datetime):
+        return None
+    offset = NAIVE_OFFSET
+    utc = moment
+    if moment.tzinfo is not None:
+        seconds = moment.utcoffset().total_seconds()
+        if seconds % 60:
+            return None
+        offset = int(seconds // 60)
+        utc = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    delta = utc - EPOCH
+    birth_us = (delta.days * 86_400 + delta.seconds) * 1_000_000 + delta.microseconds
+    decoded = _birth_date(birth_us, offset)
+    if isinstance(value, str):
+        exact = decoded.isoformat() == value
+    else:
+        exact = decoded == moment and decoded.utcoffset() == moment.utcoffset()
+    return (birth_us, offset) if exact else None
+
+
+def encode_chart(prediction: dict) -> Optional[bytes]:
+    """
+    Pack a prediction's chart into one record, or None when it does not fit
+    the fixed layout losslessly (unknown or repeated planets, extra position
+    fields, not twelve integer houses, an id longer than ID_SIZE, a birth date
+    that would not decode to the same value, such as a date-only string).
+    """
+    import numpy as np
+
+    prediction_id = str(prediction.get("id") or "")
+    houses = prediction.get("houses")
+    moment = _birth_moment(prediction.get("birth_date"))
+    if not prediction_id or len(prediction_id) > ID_SIZE or not prediction_id.isascii() or moment is None:
+        return None
+    if not isinstance(houses, list) or len(houses) != HOUSE_COUNT or not all(type(house) is int for house in houses):
+        return None
+    record = np.zeros(1, dtype=chart_dtype())[0]
+    record["id"] = prediction_id.encode("ascii")
+    record["birth_us"], record["birth_offset"] = moment
+    record["longitudes"] = np.nan
+    seen = set()
+    try:
+        for position in prediction.get("planetary_positions") or []:
+            position = dict(position)
+            planet = position.get("planet")
+            if planet not in PLANETS or planet in seen or position.keys() - POSITION_FIELDS:
+                return None
+            seen.add(planet)
+            index = PLANETS.index(planet)
+            record["longitudes"][index] = float(position["longitude"])
+            record["planet_houses"][index] = int(position["house"])
+        record["cusps"] = houses
+    except (KeyError, TypeError, ValueError, OverflowError):
+        return None
+    return record.tobytes()
+
+
+def decode_chart(record) -> dict:
+    """The chart fields of one record, shaped as `KPPredictionResult` stores them."""
+    birth = _birth_date(int(record["birth_us"]), int(record["birth_offset"]))
+    longitudes = record["longitudes"].tolist()
+    houses = record["planet_houses"].tolist()
+    return {
+        "id": record["id"].decode("ascii"),
+        "birth_date": birth.isoformat(),
+        "planetary_positions": [
+            {"planet": planet, "longitude": longitude, "house": house}
+            for planet, longitude, house in zip(PLANETS, longitudes, houses)
+            if longitude == longitude  # NaN marks an absent planet
+        ],
+        "houses": record["cusps"].tolist(),
+    }
+
+
+def load_chart_array(buffer) -> "np.ndarray":
+    """
+    View a chart file's records as a structured array. No bytes are copied:
+    the array reads straight from `buffer` (bytes, bytearray, mmap).
+    """
+    import numpy as np
+
+    if len(buffer) < HEADER_SIZE:
+        return np.empty(0, dtype=chart_dtype())
+    _check_header(bytes(buffer[:HEADER_SIZE]))
+    count = (len(buffer) - HEADER_SIZE) // record_size()
+    return np.frombuffer(buffer, dtype=chart_dtype(), count=count, offset=HEADER_SIZE)
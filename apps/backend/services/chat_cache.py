@@ -0,0 +1,159 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+from utils.metrics import cache_requests
+
+CHAT_CACHE_MAX_ENTRIES = int(os.getenv("CHAT_CACHE_MAX_ENTRIES", "10000"))
+CHAT_CACHE_TTL_SECONDS = float(os.getenv("CHAT_CACHE_TTL_SECONDS", str(24 * 3600)))
+CHAT_SEMANTIC_CACHE_ENABLED = os.getenv("CHAT_SEMANTIC_CACHE_ENABLED", "false").lower() == "true"
+CHAT_SEMANTIC_CACHE_THRESHOLD = float(os.getenv("CHAT_SEMANTIC_CACHE_THRESHOLD", "0.92"))
+CHAT_SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("CHAT_SEMANTIC_CACHE_MAX_ENTRIES", "5000"))
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_question(question: str) -> str:
+    """
+    Case, punctuation and spacing insensitive form of a question, used as the exact cache key.
+    """
+    return _WHITESPACE.sub(" ", _PUNCTUATION.sub(" ", question.lower())).strip()
+
+class VectorIndex:
+    """
+    In-memory cosine similarity index over unit-normalised embeddings (requires numpy).
+    Each vector is tagged with a context so searches only match within one context.
+    Storage grows on demand; once `capacity` is reached the oldest entries are overwritten.
+    """
+
+    def __init__(self, capacity: int = CHAT_SEMANTIC_CACHE_MAX_ENTRIES):
+        import numpy as np
+
+        self._np = np
+        self.capacity = capacity
+        self._vectors = None
+        self._contexts = np.zeros(0, dtype=np.int64)
+        self._keys: List[Optional[str]] = []
+        self._next = 0
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def _context_id(self, context: str) -> int:
+        return hash(context) & 0x7FFFFFFFFFFFFFFF
+
+    def _grow(self, dimensions: int):
+        np = self._np
+        rows = 0 if self._vectors is None else self._vectors.shape[0]
+        new_rows = min(self.capacity, max(64, rows * 2))
+        vectors = np.zeros((new_rows, dimensions), dtype=np.float32)
+        contexts = np.zeros(new_rows, dtype=np.int64)
+        if rows:
+            vectors[:rows] = self._vectors
+            contexts[:rows] = self._contexts
+        self._vectors, self._contexts = vectors, contexts
+        self._keys.extend([None] * (new_rows - rows))
+
+    def add(self, key: str, embedding: List[float], context: str = ""):
+        np = self._np
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            return
+        with self._lock:
+            if self._vectors is None or (self._next >= self._vectors.shape[0] and self._vectors.shape[0] < self.capacity):
+                self._grow(vector.shape[0])
+            self._vectors[self._next] = vector / norm
+            self._contexts[self._next] = self._context_id(context)
+            self._keys[self._next] = key
+            self._next = (self._next + 1) % self.capacity
+            self._size = min(self._size + 1, self.capacity)
+
+    def search(self, embedding: List[float], context: str = "") -> Optional[Tuple[str, float]]:
+        np = self._np
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        with self._lock:
+            if self._vectors is None or self._size == 0 or norm == 0:
+                return None
+            scores = self._vectors[:self._size] @ (vector / norm)
+            scores[self._contexts[:self._size] != self._context_id(context)] = -1.0
+            best = int(np.argmax(scores))
+            if scores[best] < -0.5:
+                return None
+            return self._keys[best], float(scores[best])
+
+class ChatResponseCache:
+    """
+    Two-tier answer cache. The exact tier matches normalised question text; the
+    optional semantic tier matches paraphrases whose embedding is within
+    `threshold` cosine similarity of a cached question. Entries are scoped by a
+    context key so answers for one chart are never served for another.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = CHAT_CACHE_MAX_ENTRIES,
+        ttl: float = CHAT_CACHE_TTL_SECONDS,
+        semantic: bool = CHAT_SEMANTIC_CACHE_ENABLED,
+        threshold: float = CHAT_SEMANTIC_CACHE_THRESHOLD,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._index = VectorIndex() if semantic else None
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    @property
+    def semantic(self) -> bool:
+        return self._index is not None
+
+    @staticmethod
+    def key(question: str, context: str = "") -> str:
+        return f"{context}\x00{normalize_question(question)}"
+
+    def get(self, question: str, context: str = "") -> Optional[str]:
+        key = self.key(question, context)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and time.monotonic() - entry[1] < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                cache_requests.inc(cache="chat", result="hit")
+                return entry[0]
+            if entry:
+                del self._entries[key]
+        return None
+
+    def get_similar(self, embedding: List[float], context: str = "") -> Optional[str]:
+        if not self.semantic:
+            return None
+        match = self._index.search(embedding, context)
+        if match is None or match[1] < self.threshold:
+            return None
+        with self._lock:
+            entry = self._entries.get(match[0])
+            if entry and time.monotonic() - entry[1] < self.ttl:
+                self.semantic_hits += 1
+                cache_requests.inc(cache="chat", result="semantic_hit")
+                return entry[0]
+        return None
+
+    def record_miss(self):
+        self.misses += 1
+        cache_requests.inc(cache="chat", result="miss")
+
+    def set(self, question: str, answer: str, context: str = "", embedding: Optional[List[float]] = None):
+        key = self.key(question, context)
+        with self._lock:
+            self._entries[key] = (answer, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        if self.semantic and embedding is not None:
+            self._index.add(key, embedding, context)
@@ -0,0 +1,167 @@
+import hashlib
+import math
+import os
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import List, NamedTuple, Optional, Tuple
+from apps.backend.pdf_generator import SIGNS, prediction_content_hash
+from apps.backend.services.client_service import get_client
+from apps.backend.services.kp_chart_service import calculate_kp_chart
+from apps.backend.storage import get_prediction
+
+CHAT_CONTEXT_TOKEN_BUDGET = int(os.getenv("CHAT_CONTEXT_TOKEN_BUDGET", "300"))
+CHAT_CONTEXT_CACHE_MAX_ENTRIES = int(os.getenv("CHAT_CONTEXT_CACHE_MAX_ENTRIES", "2048"))
+
+SIGN_LORDS = ["Mars", "Venus", "Mercury", "Moon", "Sun", "Mercury",
+              "Venus", "Mars", "Jupiter", "Saturn", "Saturn", "Jupiter"]
+# Vimshottari order and period lengths in years; star lords of the 27 nakshatras cycle through it.
+DASA_SEQUENCE = [("Ketu", 7), ("Venus", 20), ("Sun", 6), ("Moon", 10), ("Mars", 7),
+                 ("Rahu", 18), ("Jupiter", 16), ("Saturn", 19), ("Mercury", 17)]
+DASA_TOTAL_YEARS = 120
+NAKSHATRA_SPAN = 360 / 27
+YEAR_DAYS = 365.25
+
+class ChartContext(NamedTuple):
+    # Changes whenever the summary text would change; used to scope cached answers.
+    version: str
+    text: str
+    tokens: int
+
+_summary_cache: "OrderedDict[Tuple, ChartContext]" = OrderedDict()
+_summary_cache_lock = threading.Lock()
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count for English prompt text (about four characters per token).
+    """
+    return math.ceil(len(text) / 4)
+
+def kp_lords(longitude: float) -> Tuple[str, str, str]:
+    """
+    Sign lord, star lord and KP sub lord of a sidereal longitude.
+    """
+    longitude %= 360
+    nakshatra = int(longitude // NAKSHATRA_SPAN)
+    star_index = nakshatra % 9
+    # The nakshatra is split among the nine lords in proportion to their dasa years, starting from its own lord.
+    offset = (longitude - nakshatra * NAKSHATRA_SPAN) / NAKSHATRA_SPAN * DASA_TOTAL_YEARS
+    sub_lord = DASA_SEQUENCE[star_index][0]
+    for step in range(9):
+        lord, years = DASA_SEQUENCE[(star_index + step) % 9]
+        sub_lord = lord
+        if offset < years:
+            break
+        offset -= years
+    return SIGN_LORDS[int(longitude // 30)], DASA_SEQUENCE[star_index][0], sub_lord
+
+def current_dasa(moon_longitude: float, birth: datetime, on: date) -> Optional[Tuple[str, str, date]]:
+    """
+    Running Vimshottari mahadasa and antardasa on `on`, with the antardasa end date.
+    """
+    moon_longitude %= 360
+    nakshatra = int(moon_longitude // NAKSHATRA_SPAN)
+    index = nakshatra % 9
+    elapsed = (moon_longitude - nakshatra * NAKSHATRA_SPAN) / NAKSHATRA_SPAN
+    # Start of the mahadasa running at birth, which may lie before the birth date.
+    start = birth - timedelta(days=elapsed * DASA_SEQUENCE[index][1] * YEAR_DAYS)
+    target = datetime.combine(on, datetime.min.time())
+    if target < birth:
+        return None
+    while True:
+        lord, years = DASA_SEQUENCE[index]
+        end = start + timedelta(days=years * YEAR_DAYS)
+        if target < end:
+            break
+        start, index = end, (index + 1) % 9
+    sub_start = start
+    for step in range(9):
+        sub_lord, sub_years = DASA_SEQUENCE[(index + step) % 9]
+        sub_end = sub_start + timedelta(days=years * sub_years / DASA_TOTAL_YEARS * YEAR_DAYS)
+        if target < sub_end:
+            return lord, sub_lord, sub_end.date()
+        sub_start = sub_end
+    return lord, sub_lord, end.date()
+
+def _as_datetime(value) -> datetime:
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None)
+    return datetime.fromisoformat(str(value)).replace(tzinfo=None)
+
+def _summary_lines(chart: dict, on: date) -> List[str]:
+    """
+    Summary lines in priority order; the budget trims from the end.
+    """
+    birth = _as_datetime(chart["birth_date"])
+    positions = chart.get("planetary_positions") or []
+    lines = [f"Chart of {chart.get('name', 'client')}, born {birth.isoformat(sep=' ', timespec='minutes')}."]
+    moon = next((p for p in positions if p.get("planet") == "Moon"), None)
+    if moon is not None:
+        dasa = current_dasa(float(moon["longitude"]), birth, on)
+        if dasa:
+            lines.append(f"Current dasa: {dasa[0]} mahadasa, {dasa[1]} antardasa until {dasa[2].isoformat()}.")
+    for position in positions:
+        longitude = float(position["longitude"]) % 360
+        sign_lord, star_lord, sub_lord = kp_lords(longitude)
+        lines.append(
+            f"{position['planet']}: {SIGNS[int(longitude // 30)]} {longitude % 30:.1f}°, house {position.get('house')}, "
+            f"lords {sign_lord}/{star_lord}/{sub_lord}."
+        )
+    if chart.get("houses"):
+        lines.append("House cusps: " + ", ".join(str(cusp) for cusp in chart["houses"]) + ".")
+    if chart.get("prediction_summary"):
+        lines.append(f"Summary: {chart['prediction_summary']}")
+    return lines
+
+def _fit_budget(lines: List[str], budget: int) -> str:
+    text = ""
+    for line in lines:
+        candidate = f"{text}\n{line}" if text else line
+        if estimate_tokens(candidate) > budget:
+            break
+        text = candidate
+    return text
+
+def _summarise(kind: str, chart_id: str, version: str, load, budget: int) -> ChartContext:
+    today = date.today()
+    # The running dasa depends on the date, so summaries are also keyed by day.
+    key = (kind, chart_id, version, budget, today)
+    with _summary_cache_lock:
+        cached = _summary_cache.get(key)
+        if cached is not None:
+            _summary_cache.move_to_end(key)
+            return cached
+    text = _fit_budget(_summary_lines(load(), today), budget)
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+    context = ChartContext(f"{kind}:{chart_id}:{digest}", text, estimate_tokens(text))
+    with _summary_cache_lock:
+        _summary_cache[key] = context
+        while len(_summary_cache) > CHAT_CONTEXT_CACHE_MAX_ENTRIES:
+            _summary_cache.popitem(last=False)
+    return context
+
+def get_chart_context(
+    client_id: Optional[str] = None,
+    prediction_id: Optional[str] = None,
+    budget: int = CHAT_CONTEXT_TOKEN_BUDGET,
+) -> Optional[ChartContext]:
+    """
+    Compact chart summary for a stored prediction or a client, sized to fit `budget`
+    tokens. Returns None if the referenced chart does not exist.
+    """
+    if prediction_id:
+        prediction = get_prediction(prediction_id)
+        if prediction is None:
+            return None
+        return _summarise("prediction", prediction_id, prediction_content_hash(prediction), lambda: prediction, budget)
+    if client_id:
+        client = get_client(client_id)
+        if client is None:
+            return None
+        birth_data = client.dict()
+        # The chart is only recomputed when the client's birth details change.
+        return _summarise(
+            "client", client_id, prediction_content_hash(birth_data),
+            lambda: calculate_kp_chart(client.name, client.birth_date).dict(), budget,
+        )
+    return None
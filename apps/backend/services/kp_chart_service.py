@@ -1,6 +1,11 @@
 from datetime import datetime
 from typing import List
 from apps.backend.models import PlanetPosition, KPPredictionResult
+from utils.metrics import REGISTRY, timed
+from utils.tracing import traced
+
+charts_computed = REGISTRY.counter("kp_charts_computed_total", "KP charts calculated")
+chart_compute_seconds = REGISTRY.histogram("kp_chart_compute_seconds", "Time to calculate a KP chart")
 
 def compute_swiss_ephemeris(birth_date: datetime):
     # Placeholder for Swiss Ephemeris calculation
@@ -20,10 +25,13 @@ def generate_prediction_summary(planetary_positions: List[PlanetPosition]):
     # Placeholder for generating prediction summary text
     return "This is a dummy KP prediction summary based on planetary positions."
 
+@traced("kp_chart.calculate")
 def calculate_kp_chart(name: str, birth_date: datetime) -> KPPredictionResult:
-    planetary_positions = compute_swiss_ephemeris(birth_date)
-    houses = compute_newcomb_houses(birth_date)
-    prediction_summary = generate_prediction_summary(planetary_positions)
+    with timed(chart_compute_seconds):
+        planetary_positions = compute_swiss_ephemeris(birth_date)
+        houses = compute_newcomb_houses(birth_date)
+        prediction_summary = generate_prediction_summary(planetary_positions)
+    charts_computed.inc()
 
     return KPPredictionResult(
         name=name,
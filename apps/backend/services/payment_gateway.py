@@ -0,0 +1,150 @@
+import asyncio
+import logging
+import os
+import random
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+from typing import Callable, Optional
+from apps.backend.models import PaymentRequest
+from utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+STRIPE_MAX_CONCURRENCY = int(os.getenv("STRIPE_MAX_CONCURRENCY", "8"))
+STRIPE_TIMEOUT_SECONDS = float(os.getenv("STRIPE_TIMEOUT_SECONDS", "10"))
+STRIPE_QUEUE_TIMEOUT_SECONDS = float(os.getenv("STRIPE_QUEUE_TIMEOUT_SECONDS", "5"))
+STRIPE_MAX_RETRIES = int(os.getenv("STRIPE_MAX_RETRIES", "2"))
+STRIPE_RETRY_BACKOFF_SECONDS = float(os.getenv("STRIPE_RETRY_BACKOFF_SECONDS", "0.25"))
+
+stripe_request_seconds = REGISTRY.histogram(
+    "stripe_request_duration_seconds",
+    "Latency of Stripe API calls, including time queued for a worker thread",
+    ("operation", "outcome"),
+)
+stripe_retries = REGISTRY.counter("stripe_request_retries_total", "Stripe API calls retried", ("operation",))
+
+@lru_cache(maxsize=1)
+def get_stripe():
+    """
+    The Stripe SDK, imported and given its API key on first use. Importing it
+    takes a few hundred milliseconds, which cold starts should not pay for.
+    """
+    import stripe
+    stripe.api_key = os.getenv("STRIPE_SECRET_KEY", "sk_test_your_test_key_here")
+    return stripe
+
+def _is_retryable(error: Exception) -> bool:
+    # Failures worth another attempt; card errors and bad requests are final.
+    stripe = get_stripe()
+    # A request that hits the HTTP client's timeout raises APIConnectionError.
+    if isinstance(error, (stripe.error.APIConnectionError, stripe.error.RateLimitError)):
+        return True
+    return isinstance(error, stripe.error.APIError) and (error.http_status or 500) >= 500
+
+class PaymentGateway:
+    """
+    Async front for the blocking Stripe SDK. Calls run on a dedicated, bounded
+    thread pool so a burst of checkouts cannot take over the event loop or the
+    default executor. Each attempt is bounded by the Stripe HTTP client's own
+    timeout, so an attempt that times out has also stopped using its thread;
+    waiting for a free thread is bounded separately by `queue_timeout` and
+    raises asyncio.TimeoutError. Transient failures are retried with
+    exponential backoff and jitter. Writes reuse one idempotency key across
+    attempts so a retry can never create a second session.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = STRIPE_MAX_CONCURRENCY,
+        timeout: float = STRIPE_TIMEOUT_SECONDS,
+        queue_timeout: float = STRIPE_QUEUE_TIMEOUT_SECONDS,
+        max_retries: int = STRIPE_MAX_RETRIES,
+        retry_backoff: float = STRIPE_RETRY_BACKOFF_SECONDS,
+    ):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            stripe = get_stripe()
+            # requests keeps connections alive per session; share one across the pool's threads.
+            stripe.default_http_client = stripe.RequestsClient(timeout=self.timeout)
+            # Retries are handled in call(), so backoff waits do not hold a thread.
+            stripe.max_network_retries = 0
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="stripe")
+            # One slot per thread; calls wait here, not in the executor's unbounded queue.
+            self._slots = asyncio.Semaphore(self.max_workers)
+        return self._executor
+
+    def _release(self, future: asyncio.Future):
+        if not future.cancelled():
+            future.exception()  # retrieved, so an abandoned call's error is not logged as unhandled
+        self._slots.release()
+
+    async def call(self, operation: str, fn: Callable, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                stripe_request_seconds.observe(time.perf_counter() - started, operation=operation, outcome="queue_timeout")
+                raise
+            future = loop.run_in_executor(executor, partial(fn, *args, **kwargs))
+            # The slot is freed when the thread is, even if this call is cancelled first.
+            future.add_done_callback(self._release)
+            try:
+                result = await asyncio.shield(future)
+            except Exception as e:
+                retry = _is_retryable(e) and attempt < self.max_retries
+                stripe_request_seconds.observe(time.perf_counter() - started, operation=operation, outcome="retry" if retry else "error")
+                if not retry:
+                    raise
+                attempt += 1
+                stripe_retries.inc(operation=operation)
+                delay = self.retry_backoff * (2 ** (attempt - 1)) * random.uniform(0.5, 1.5)
+                logger.warning(f"Stripe {operation} failed ({e!r}), retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                continue
+            stripe_request_seconds.observe(time.perf_counter() - started, operation=operation, outcome="ok")
+            return result
+
+    async def create_checkout_session(self, payment_request: PaymentRequest, success_url: str, cancel_url: str) -> str:
+        session = await self.call(
+            "checkout.session.create",
+            get_stripe().checkout.Session.create,
+            payment_method_types=['card'],
+            line_items=[{
+                'price_data': {
+                    'currency': payment_request.currency,
+                    'product_data': {
+                        'name': payment_request.description or 'AstroBalendar Prediction',
+                    },
+                    'unit_amount': int(payment_request.amount * 100),
+                },
+                'quantity': 1,
+            }],
+            mode='payment',
+            metadata={'client_id': payment_request.client_id},
+            success_url=success_url,
+            cancel_url=cancel_url,
+            idempotency_key=uuid.uuid4().hex,
+        )
+        return session.id
+
+    async def retrieve_checkout_session(self, session_id: str):
+        return await self.call("checkout.session.retrieve", get_stripe().checkout.Session.retrieve, session_id)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
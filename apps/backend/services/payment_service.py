@@ -1,49 +1,45 @@
-import stripe
-from datetime import datetime
+import json
+import os
 from typing import Optional
 from apps.backend.models import PaymentRequest, PaymentResult
+from apps.backend.services.payment_gateway import PaymentGateway, get_stripe
+from apps.backend.services.payment_store import PaymentStore
 
-stripe.api_key = "sk_test_your_test_key_here"  # Replace with your Stripe test secret key
+STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET", "")
+# Maximum age of a webhook signature, in seconds, to stop replays.
+STRIPE_WEBHOOK_TOLERANCE = int(os.getenv("STRIPE_WEBHOOK_TOLERANCE", "300"))
 
-def create_checkout_session(payment_request: PaymentRequest) -> str:
-    try:
-        session = stripe.checkout.Session.create(
-            payment_method_types=['card'],
-            line_items=[{
-                'price_data': {
-                    'currency': payment_request.currency,
-                    'product_data': {
-                        'name': payment_request.description or 'AstroBalendar Prediction',
-                    },
-                    'unit_amount': int(payment_request.amount * 100),
-                },
-                'quantity': 1,
-            }],
-            mode='payment',
-            success_url='https://yourdomain.com/payment-success?session_id={CHECKOUT_SESSION_ID}',
-            cancel_url='https://yourdomain.com/payment-cancel',
-        )
-        return session.id
-    except Exception as e:
-        raise e
+async def create_checkout_session(gateway: PaymentGateway, payment_request: PaymentRequest) -> str:
+    return await gateway.create_checkout_session(
+        payment_request,
+        success_url='https://yourdomain.com/payment-success?session_id={CHECKOUT_SESSION_ID}',
+        cancel_url='https://yourdomain.com/payment-cancel',
+    )
 
-def verify_payment(session_id: str) -> Optional[PaymentResult]:
+async def verify_payment(store: PaymentStore, session_id: str) -> Optional[PaymentResult]:
+    """
+    Look up a paid session in the payment store, which is fed by the Stripe
+    webhook. Returns None until the payment has been recorded.
+    """
+    payment = await store.get_payment(session_id)
+    return PaymentResult(**payment) if payment else None
+
+async def handle_webhook(store: PaymentStore, payload: bytes, sig_header: Optional[str]) -> bool:
+    """
+    Verify a Stripe webhook signature and record the event. Raises ValueError if
+    the signature is missing or invalid; returns False for an event that was
+    already processed.
+    """
+    if not STRIPE_WEBHOOK_SECRET:
+        raise ValueError("Webhook secret is not configured")
+    stripe = get_stripe()
     try:
-        session = stripe.checkout.Session.retrieve(session_id)
-        if session.payment_status == 'paid':
-            payment = PaymentResult(
-                payment_id=session.id,
-                status=session.payment_status,
-                amount=session.amount_total / 100,
-                currency=session.currency,
-                client_id=session.metadata.get('client_id', ''),
-                created_at=datetime.fromtimestamp(session.created),
-            )
-            # TODO: Update prediction/client records with payment info
-            return payment
-        return None
-    except Exception as e:
-        raise e
+        stripe.WebhookSignature.verify_header(
+            payload.decode("utf-8"), sig_header, STRIPE_WEBHOOK_SECRET, STRIPE_WEBHOOK_TOLERANCE
+        )
+    except stripe.error.SignatureVerificationError as e:
+        raise ValueError(str(e))
+    return await store.record_event(json.loads(payload))
 
 def initiate_upi_payment():
     # Placeholder for UPI payment initiation logic
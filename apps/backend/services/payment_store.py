@@ -0,0 +1,158 @@
+"""
+Payments recorded from Stripe webhook events, persisted in MongoDB.
+
+Every processed event is inserted into `payment_events` with the Stripe event
+id as `_id`, so the collection doubles as the idempotency table: the unique
+`_id` index rejects a redelivered event whichever worker or host receives it.
+Paid Checkout Sessions are upserted into `payments` keyed by session id
+before the event is marked processed, so a crash in between leaves the event
+to be redelivered and recorded again rather than lost.
+
+Revenue is kept as one running total per currency in `payment_totals`, so admin
+stats read a handful of documents instead of aggregating every payment. A new
+payment is inserted with `revenue_counted: False`; whichever event flips that
+flag adds the payment to its currency's total with `$inc`, which makes the
+increment as idempotent as the event itself: a redelivered event or a second
+paid event for the same session finds the flag already set. Without a
+transaction a crash between the flip and the `$inc` drops that payment from the
+total; `rebuild_revenue()` recomputes the totals from `payments`.
+"""
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from pymongo import ASCENDING
+from pymongo.errors import DuplicateKeyError
+from db.mongo import db
+from utils.tracing import span
+
+# Stripe events that mean a checkout session has been paid for.
+PAID_EVENT_TYPES = {"checkout.session.completed", "checkout.session.async_payment_succeeded"}
+
+events_collection = db["payment_events"]
+payments_collection = db["payments"]
+totals_collection = db["payment_totals"]
+
+# Stored alongside each payment, not part of the payment record.
+_INTERNAL_FIELDS = {"_id": 0, "recorded_at": 0, "revenue_counted": 0}
+
+def payment_from_session(session: dict) -> Optional[dict]:
+    """
+    Payment record for a paid Checkout Session payload, None if it is not paid yet.
+    """
+    if session.get("payment_status") != "paid":
+        return None
+    return {
+        "payment_id": session["id"],
+        "status": session["payment_status"],
+        "amount": (session.get("amount_total") or 0) / 100,
+        "currency": session.get("currency") or "usd",
+        "client_id": (session.get("metadata") or {}).get("client_id", ""),
+        "created_at": datetime.fromtimestamp(session.get("created", 0), tz=timezone.utc).isoformat(),
+    }
+
+class PaymentStore:
+    def __init__(self, events=events_collection, payments=payments_collection, totals=totals_collection):
+        self.events = events
+        self.payments = payments
+        self.totals = totals
+
+    async def record_event(self, event: dict) -> bool:
+        """
+        Apply a verified Stripe event. Returns False for an event id that was
+        already processed, by this worker or any other.
+        """
+        payment = None
+        if event.get("type") in PAID_EVENT_TYPES:
+            payment = payment_from_session(event["data"]["object"])
+        if payment is not None:
+            # A session paid through two events (completed, then async_payment_succeeded) counts once.
+            with span("mongo.update_one", collection="payments"):
+                await self.payments.update_one(
+                    {"_id": payment["payment_id"]},
+                    {"$setOnInsert": {**payment, "recorded_at": datetime.utcnow(), "revenue_counted": False}},
+                    upsert=True,
+                )
+            with span("mongo.update_one", collection="payments"):
+                claimed = await self.payments.update_one(
+                    {"_id": payment["payment_id"], "revenue_counted": False},
+                    {"$set": {"revenue_counted": True}},
+                )
+            if claimed.modified_count:
+                with span("mongo.update_one", collection="payment_totals"):
+                    await self.totals.update_one(
+                        {"_id": payment["currency"]},
+                        {"$inc": {"amount": payment["amount"], "payments": 1}},
+                        upsert=True,
+                    )
+        try:
+            with span("mongo.insert_one", collection="payment_events"):
+                await self.events.insert_one({"_id": event["id"], "type": event.get("type")})
+        except DuplicateKeyError:
+            return False
+        return True
+
+    async def get_payment(self, payment_id: str) -> Optional[dict]:
+        with span("mongo.find_one", collection="payments"):
+            return await self.payments.find_one({"_id": payment_id}, _INTERNAL_FIELDS)
+
+    async def list_payments(self, skip: int = 0, limit: int = 0) -> List[dict]:
+        """Payments in the order they were recorded; `limit` 0 means all of them."""
+        cursor = self.payments.find({}, _INTERNAL_FIELDS).sort([("recorded_at", ASCENDING), ("_id", ASCENDING)]).skip(skip)
+        if limit:
+            cursor = cursor.limit(limit)
+        with span("mongo.find", collection="payments", skip=skip, limit=limit):
+            return await cursor.to_list(length=None)
+
+    async def list_recorded(
+        self,
+        after: Optional[dict] = None,
+        through: Optional[dict] = None,
+        recorded_before: Optional[datetime] = None,
+    ) -> Tuple[List[dict], Optional[dict]]:
+        """
+        Payments in recording order past the keyset cursor `after`, up to and
+        including cursor `through`, and recorded before `recorded_before` (naive
+        UTC), with the cursor of the last one (`after` when there are none).
+        A cursor is {"recorded_at": ..., "_id": payment id}.
+        """
+        conditions = []
+        if after is not None:
+            conditions.append({"$or": [
+                {"recorded_at": {"$gt": after["recorded_at"]}},
+                {"recorded_at": after["recorded_at"], "_id": {"$gt": after["_id"]}},
+            ]})
+        if through is not None:
+            conditions.append({"$or": [
+                {"recorded_at": {"$lt": through["recorded_at"]}},
+                {"recorded_at": through["recorded_at"], "_id": {"$lte": through["_id"]}},
+            ]})
+        if recorded_before is not None:
+            conditions.append({"recorded_at": {"$lt": recorded_before}})
+        query = {"$and": conditions} if conditions else {}
+        with span("mongo.find", collection="payments"):
+            documents = await self.payments.find(query).sort([("recorded_at", ASCENDING), ("_id", ASCENDING)]).to_list(length=None)
+        if not documents:
+            return [], after
+        last = documents[-1]
+        payments = [{key: value for key, value in document.items() if key not in _INTERNAL_FIELDS} for document in documents]
+        return payments, {"recorded_at": last["recorded_at"], "_id": last["_id"]}
+
+    async def revenue(self) -> Dict[str, float]:
+        """Revenue totals per currency. Amounts in different currencies are never summed."""
+        with span("mongo.find", collection="payment_totals"):
+            totals = await self.totals.find({}).to_list(length=None)
+        return {total["_id"]: round(total["amount"], 2) for total in totals}
+
+    async def rebuild_revenue(self) -> Dict[str, float]:
+        """
+        Recompute the per-currency totals from the recorded payments. Meant for
+        repairs while no webhooks are being processed.
+        """
+        pipeline = [{"$group": {"_id": "$currency", "amount": {"$sum": "$amount"}, "payments": {"$sum": 1}}}]
+        with span("mongo.aggregate", collection="payments"):
+            totals = await self.payments.aggregate(pipeline).to_list(length=None)
+        with span("mongo.update_many", collection="payments"):
+            await self.payments.update_many({"revenue_counted": False}, {"$set": {"revenue_counted": True}})
+        with span("mongo.replace_one", collection="payment_totals"):
+            for total in totals:
+                await self.totals.replace_one({"_id": total["_id"]}, total, upsert=True)
+        return await self.revenue()
@@ -0,0 +1,96 @@
+import asyncio
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import AsyncIterator, List, Optional
+from apps.backend.pdf_generator import generate_prediction_pdf
+
+PDF_EXPORT_WORKERS = int(os.getenv("PDF_EXPORT_WORKERS", os.cpu_count() or 1))
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """
+    Process pool for CPU-bound report rendering, created on first use.
+    """
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=PDF_EXPORT_WORKERS)
+    return _process_pool
+
+def shutdown_process_pool():
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+
+class _ZipSink:
+    """
+    Write-only, non-seekable target for ZipFile. ZipFile falls back to data
+    descriptors for such streams, so each member can be handed to the client as
+    soon as it is written.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+async def stream_predictions_zip(
+    predictions: List[dict],
+    pool: Optional[ProcessPoolExecutor] = None,
+    max_in_flight: Optional[int] = None,
+) -> AsyncIterator[bytes]:
+    """
+    Render predictions in parallel on a process pool and yield a ZIP archive
+    incrementally, adding each PDF as soon as its render finishes. At most
+    `max_in_flight` rendered PDFs are held in memory at once.
+    """
+    loop = asyncio.get_running_loop()
+    pool = pool or get_process_pool()
+    max_in_flight = max_in_flight or 2 * PDF_EXPORT_WORKERS
+    sink = _ZipSink()
+    pending = set()
+    remaining = iter(predictions)
+
+    def submit_next() -> bool:
+        prediction = next(remaining, None)
+        if prediction is None:
+            return False
+
+        async def render(prediction=prediction):
+            pdf = await loop.run_in_executor(pool, generate_prediction_pdf, prediction)
+            return prediction, pdf
+
+        pending.add(asyncio.ensure_future(render()))
+        return True
+
+    try:
+        while len(pending) < max_in_flight and submit_next():
+            pass
+        with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED) as archive:
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    pending.discard(task)
+                    prediction, pdf = task.result()
+                    info = zipfile.ZipInfo(f"prediction_{prediction.get('id', 'unknown')}.pdf", datetime.utcnow().timetuple()[:6])
+                    # PDF content streams are already compressed; storing avoids burning CPU for nothing.
+                    archive.writestr(info, pdf)
+                    submit_next()
+                    yield sink.drain()
+        yield sink.drain()
+    finally:
+        for task in pending:
+            task.cancel()
@@ -1,20 +1,137 @@
 import json
+import mmap
 import os
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from uuid import uuid4
+from apps.backend.services import chart_format
+from utils.fast_json import EncodedJSON, dumps
+from utils.tracing import traced
 
 STORAGE_FILE = "predictions.json"
+USERS_FILE = "users.json"
+CLIENTS_FILE = "clients.json"
+# Kept in the binary chart file (services/chart_format.py) rather than the JSON store.
+CHART_FIELDS = ("birth_date", "planetary_positions", "houses")
 
+# id -> prediction, rebuilt only when the storage files change on disk.
+_prediction_index: Dict[str, dict] = {}
+_prediction_index_key = None
+_prediction_index_lock = threading.Lock()
+# id -> (prediction, its JSON encoding); cleared with the index.
+_encoded_predictions: Dict[str, Tuple[dict, EncodedJSON]] = {}
+
+def _file_key(path: str):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return (path, None)
+    return (path, stat.st_mtime_ns, stat.st_size)
+
+def _predictions_by_id() -> Dict[str, dict]:
+    global _prediction_index, _prediction_index_key
+    key = (_file_key(STORAGE_FILE), _file_key(charts_file()))
+    with _prediction_index_lock:
+        if key != _prediction_index_key:
+            _prediction_index = {p["id"]: p for p in load_predictions() if p.get("id")}
+            _prediction_index_key = key
+            _encoded_predictions.clear()
+        return _prediction_index
+
+def _load_json_list(path: str) -> List[dict]:
+    if not os.path.exists(path):
+        return []
+    with open(path, "r") as f:
+        try:
+            return json.load(f)
+        except json.JSONDecodeError:
+            return []
+
+def charts_file() -> str:
+    return os.path.splitext(STORAGE_FILE)[0] + ".charts.bin"
+
+def load_chart_array():
+    """
+    Every saved chart as a NumPy structured array (see chart_format.chart_dtype),
+    memory-mapped from the chart file rather than read and parsed.
+    """
+    path = charts_file()
+    if not os.path.exists(path) or os.path.getsize(path) <= chart_format.HEADER_SIZE:
+        return chart_format.load_chart_array(b"")
+    with open(path, "rb") as f:
+        # The array keeps the mapping alive; the file itself can be closed.
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return chart_format.load_chart_array(mapped)
+
+def load_predictions() -> List[dict]:
+    """
+    Load all saved predictions from the local JSON file, with their charts
+    merged back in from the chart file.
+    """
+    predictions = _load_json_list(STORAGE_FILE)
+    if not any(prediction.get("chart_format") for prediction in predictions):
+        return predictions
+    charts = load_chart_array()
+    rows = {chart_id: row for row, chart_id in enumerate(charts["id"].tolist())}
+    merged = []
+    for prediction in predictions:
+        row = rows.get(str(prediction.get("id")).encode("ascii", "replace")) if prediction.get("chart_format") else None
+        if row is not None:
+            prediction = {key: value for key, value in prediction.items() if key != "chart_format"}
+            prediction.update(chart_format.decode_chart(charts[row]))
+        merged.append(prediction)
+    return merged
+
+def load_users() -> List[dict]:
+    return _load_json_list(USERS_FILE)
+
+def load_clients() -> List[dict]:
+    return _load_json_list(CLIENTS_FILE)
+
+@traced("storage.get_prediction")
+def get_prediction(prediction_id: str) -> Optional[dict]:
+    """
+    Fetch a single saved prediction by its id through the in-memory id index.
+    """
+    return _predictions_by_id().get(prediction_id)
+
+def get_prediction_json(prediction_id: str) -> Optional[EncodedJSON]:
+    """
+    A saved prediction encoded as JSON. The encoding is kept until the storage
+    file changes, so repeat reads of a chart are served without re-encoding.
+    """
+    prediction = get_prediction(prediction_id)
+    if prediction is None:
+        return None
+    cached = _encoded_predictions.get(prediction_id)
+    # Compared by identity: an entry encoded from an older index is stale.
+    if cached is not None and cached[0] is prediction:
+        return cached[1]
+    encoded = EncodedJSON(dumps(prediction))
+    _encoded_predictions[prediction_id] = (prediction, encoded)
+    return encoded
+
+@traced("storage.save_prediction")
 def save_prediction(prediction):
     """
-    Save prediction to a local JSON file as a placeholder for DB storage.
+    Save prediction to a local JSON file as a placeholder for DB storage. The
+    chart itself is appended to the binary chart file when it fits the fixed
+    layout. Returns the id assigned to the saved prediction.
     """
-    data = []
-    if os.path.exists(STORAGE_FILE):
-        with open(STORAGE_FILE, "r") as f:
-            try:
-                data = json.load(f)
-            except json.JSONDecodeError:
-                data = []
-    data.append(prediction)
+    prediction.setdefault("id", uuid4().hex)
+    prediction.setdefault("created_at", datetime.utcnow().isoformat())
+    entry = prediction
+    record = chart_format.encode_chart(prediction)
+    if record is not None:
+        with open(charts_file(), "ab") as f:
+            if f.tell() == 0:
+                f.write(chart_format.file_header())
+            f.write(record)
+        entry = {key: value for key, value in prediction.items() if key not in CHART_FIELDS}
+        entry["chart_format"] = chart_format.CHART_FORMAT_VERSION
+    data = _load_json_list(STORAGE_FILE)
+    data.append(entry)
     with open(STORAGE_FILE, "w") as f:
-        json.dump(data, f, indent=2)
-    return True
+        json.dump(data, f, default=str)
+    return prediction["id"]
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Routers and services import each other as `apps.backend.*`; deployments put the
+# repository root on PYTHONPATH for that (see render.yaml), so mirror it here.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..")))
@@ -0,0 +1,137 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from mongomock_motor import AsyncMongoMockClient
+from apps.backend import storage
+from apps.backend.api import admin
+from apps.backend.services.analytics_export import AnalyticsExporter
+from apps.backend.services.payment_store import PaymentStore
+from auth.dependencies import get_current_admin
+from dependencies import get_analytics_exporter
+
+pytest.importorskip("pyarrow")
+
+
+def paid_event(event_id, amount, currency):
+    return {"id": event_id, "type": "checkout.session.completed", "data": {"object": {
+        "id": f"cs_{event_id}", "payment_status": "paid", "amount_total": amount, "currency": currency,
+        "created": 1714521600, "metadata": {"client_id": "c1"},
+    }}}
+
+
+@pytest.fixture
+def database():
+    return AsyncMongoMockClient()["test"]
+
+
+def worker(directory, database, **kwargs):
+    payments = PaymentStore(database.payment_events, database.payments, database.payment_totals)
+    return AnalyticsExporter(
+        str(directory), interval=0, state=database.analytics_exports, locks=database.locks, payments=payments, **kwargs
+    )
+
+
+@pytest.fixture
+def exporter(tmp_path, monkeypatch, database):
+    monkeypatch.setattr(storage, "STORAGE_FILE", str(tmp_path / "predictions.json"))
+    monkeypatch.setattr(storage, "CLIENTS_FILE", str(tmp_path / "clients.json"))
+    return worker(tmp_path / "analytics", database, payment_settle_seconds=0)
+
+
+def part_files(exporter, dataset):
+    return sorted(
+        os.path.join(os.path.basename(root), name)
+        for root, _, names in os.walk(os.path.join(exporter.directory, dataset)) for name in names
+    )
+
+
+def save(user_id, created_at):
+    storage.save_prediction({"name": "Client", "user_id": user_id, "created_at": created_at})
+
+
+@pytest.mark.asyncio
+async def test_exports_are_incremental_and_partitioned_by_month(exporter):
+    for user_id, created_at in [("a1", "2024-01-05T10:00:00"), ("a2", "2024-01-06T10:00:00"), ("a1", "2024-02-01T10:00:00")]:
+        save(user_id, created_at)
+    assert await exporter.export() == {"predictions": 3, "payments": 0, "clients": 0}
+    assert (await exporter.export())["predictions"] == 0
+    save("a1", "2024-02-09T10:00:00")
+    assert (await exporter.export())["predictions"] == 1
+
+    assert sorted(os.listdir(os.path.join(exporter.directory, "predictions"))) == ["month=2024-01", "month=2024-02"]
+    assert exporter.query("predictions", ["astrologer_id", "month"]) == [
+        {"astrologer_id": "a1", "month": "2024-01", "count_all": 1},
+        {"astrologer_id": "a1", "month": "2024-02", "count_all": 2},
+        {"astrologer_id": "a2", "month": "2024-01", "count_all": 1},
+    ]
+    assert exporter.query("predictions", metrics=[("count", "*")], from_month="2024-02") == [{"count_all": 2}]
+    with pytest.raises(ValueError):
+        exporter.query("predictions", ["password"])
+
+
+def test_admin_endpoint_aggregates_the_exported_files(exporter):
+    for event_id, amount, currency in [("e1", 1000, "usd"), ("e2", 2500, "usd"), ("e3", 900, "inr")]:
+        asyncio.run(exporter.payments.record_event(paid_event(event_id, amount, currency)))
+    app = FastAPI()
+    app.include_router(admin.router, prefix="/api/admin")
+    app.dependency_overrides[get_current_admin] = lambda: None
+    app.dependency_overrides[get_analytics_exporter] = lambda: exporter
+    client = TestClient(app)
+
+    assert client.get("/api/admin/analytics/payments", params={"group_by": "currency", "metrics": "sum:amount"}).json() == []
+    assert client.post("/api/admin/analytics/export").json()["exported"]["payments"] == 3
+    response = client.get("/api/admin/analytics/payments", params={"group_by": "currency", "metrics": "sum:amount,count"})
+    assert response.json() == [
+        {"currency": "inr", "amount_sum": 9.0, "count_all": 1},
+        {"currency": "usd", "amount_sum": 35.0, "count_all": 2},
+    ]
+    assert client.get("/api/admin/analytics/payments", params={"metrics": "median:amount"}).status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_only_the_lock_holder_exports(exporter, database):
+    other = worker(exporter.directory, database)
+    assert await exporter._acquire()
+    assert await other.export() is None
+    await exporter._release()
+    assert await other.export() is not None
+    # An expired lock is taken over.
+    assert await exporter._acquire()
+    await database.locks.update_one({}, {"$set": {"expires_at": datetime.utcnow() - timedelta(seconds=1)}})
+    assert await other.export() is not None
+
+
+@pytest.mark.asyncio
+async def test_payments_are_exported_by_keyset_once_settled(exporter, database):
+    store = exporter.payments
+    exporter.payment_settle_seconds = 60
+    for event_id, age in (("e1", 600), ("e2", 30), ("e3", 540)):
+        await store.record_event(paid_event(event_id, 1000, "usd"))
+        await database.payments.update_one({"_id": f"cs_{event_id}"}, {"$set": {"recorded_at": datetime.utcnow() - timedelta(seconds=age)}})
+    # e2 may still have writes committing before it; it waits for the next export.
+    assert (await exporter.export())["payments"] == 2
+    assert (await database.analytics_exports.find_one({"_id": "payments"}))["cursor"]["_id"] == "cs_e3"
+    exporter.payment_settle_seconds = 0
+    assert (await exporter.export())["payments"] == 1
+    assert (await exporter.export())["payments"] == 0
+    assert exporter.query("payments", metrics=[("count", "*"), ("count_distinct", "payment_id")]) == [
+        {"count_all": 3, "payment_id_count_distinct": 3},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_a_claimed_range_is_redone_over_the_same_files(exporter, database):
+    for created_at in ("2024-01-05T10:00:00", "2024-02-01T10:00:00"):
+        save("a1", created_at)
+    await exporter.export()
+    files = part_files(exporter, "predictions")
+    # A run that claimed rows 0-2 and died before removing its claim
+    await database.analytics_exports.update_one({"_id": "predictions"}, {"$set": {"pending": {"start": 0, "after": None}}})
+    save("a1", "2024-02-09T10:00:00")
+    assert (await exporter.export())["predictions"] == 1
+    assert part_files(exporter, "predictions") == sorted(files + ["month=2024-02/part-000000002-000000003.parquet"])
+    assert exporter.query("predictions", metrics=[("count", "*")]) == [{"count_all": 3}]
+    assert "pending" not in await database.analytics_exports.find_one({"_id": "predictions"})
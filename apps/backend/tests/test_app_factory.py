@@ -0,0 +1,136 @@
+import httpx
+import pytest
+from app_factory import create_app
+from utils.startup import COLD_START_BUDGET_SECONDS, _parse_importtime, import_report
+
+
+def test_cold_start_is_within_budget_without_heavy_sdks():
+    report = import_report("app_factory")
+    assert report.eager_lazy_modules == []
+    assert report.total_seconds <= COLD_START_BUDGET_SECONDS, report.packages[:10]
+
+
+def test_parse_importtime_sums_self_time_per_package():
+    stderr = "\n".join([
+        "import time: self [us] | cumulative | imported package",
+        "import time:       200 |        200 |     stripe._error",
+        "import time:      1000 |       1200 |   stripe",
+        "import time:        50 |         50 | json",
+    ])
+    assert _parse_importtime(stderr) == {"stripe": 0.0012, "json": 0.00005}
+
+
+@pytest.mark.asyncio
+async def test_create_app_mounts_routers():
+    from mongomock_motor import AsyncMongoMockClient
+    from app.prediction_history import PredictionHistory
+    from dependencies import get_prediction_history
+
+    app = create_app(origins=["http://localhost:5173"])
+    database = AsyncMongoMockClient()["test"]
+    history = PredictionHistory(database.prediction_history, database.counters)
+    app.dependency_overrides[get_prediction_history] = lambda: history
+    async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+        assert (await client.get("/health")).json() == {"status": "ok"}
+        response = await client.post("/api/predict", json={"user_id": "7", "role": "client", "display_name": "Asha"})
+        assert response.json()["prediction_id"].startswith("CLASH7-")
+        assert (await client.get("/api/kp-chart/pdf/missing")).status_code == 404
+        preflight = await client.options("/api/chat", headers={
+            "Origin": "http://localhost:5173", "Access-Control-Request-Method": "POST",
+        })
+        assert preflight.headers["access-control-allow-origin"] == "http://localhost:5173"
+
+    # Routes declared twice are served by the first router listed.
+    logins = [route for route in app.routes if getattr(route, "path", None) == "/auth/login"]
+    assert [route.endpoint.__module__ for route in logins] == ["auth.advanced_features"]
+
+
+
+def test_each_app_builds_its_own_resources():
+    first, second = create_app(), create_app()
+    for name in ("email_service", "payment_gateway", "payment_store", "analytics_exporter", "prediction_history"):
+        assert getattr(first.state.resources, name) is not getattr(second.state.resources, name)
+    # The exporter reads payments through the app's own store.
+    assert first.state.resources.analytics_exporter.payments is first.state.resources.payment_store
+
+class FakeRef:
+    id = "pred-1"
+
+
+class FakeFirestore:
+    def collection(self, name):
+        return self
+
+    def document(self, *args):
+        return FakeRef()
+
+
+class RecordingWriter:
+    def __init__(self):
+        self.writes = []
+
+    async def set(self, ref, data, wait=False):
+        self.writes.append((ref.id, data))
+
+
+@pytest.mark.asyncio
+async def test_routes_receive_shared_resources_through_dependencies():
+    from dependencies import get_firestore, get_prediction_writer
+
+    app = create_app()
+    writer = RecordingWriter()
+    app.dependency_overrides[get_firestore] = FakeFirestore
+    app.dependency_overrides[get_prediction_writer] = lambda: writer
+    async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post("/predict", json={
+            "birthDate": "2000-01-01", "birthTime": "12:00", "birthPlace": "Chennai", "predictionType": "general",
+        })
+    assert response.status_code == 200
+    assert [(ref, data["birthPlace"]) for ref, data in writer.writes] == [("pred-1", "Chennai")]
+
+
+@pytest.mark.asyncio
+async def test_readiness_reports_each_dependency():
+    app = create_app()
+
+    async def up():
+        return True, None
+
+    async def down():
+        return False, "timed out"
+
+    app.state.resources.firestore_probe = up
+    app.state.resources.mongo_probe = down
+    async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.get("/health/ready")
+        assert (await client.get("/ping")).status_code == 500
+    assert response.status_code == 503
+    assert response.json()["checks"] == {"firestore": "ok", "mongodb": "timed out"}
+
+
+@pytest.mark.asyncio
+async def test_lifespan_starts_and_closes_resources_once():
+    app = create_app()
+    calls = []
+
+    class FakeResources:
+        async def start(self):
+            calls.append("start")
+
+        async def close(self):
+            calls.append("close")
+
+    app.state.resources = FakeResources()
+    async with app.router.lifespan_context(app):
+        assert calls == ["start"]
+    assert calls == ["start", "close"]
+
+
+@pytest.mark.asyncio
+async def test_admin_routes_require_an_admin():
+    app = create_app()
+    async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+        for path in ("/api/admin/users", "/api/admin/payments", "/api/admin/stats/summary",
+                     "/api/admin/profiles", "/api/admin/analytics/payments"):
+            assert (await client.get(path)).status_code == 401, path
+        assert (await client.post("/api/admin/analytics/export")).status_code == 401
@@ -0,0 +1,111 @@
+import json
+import os
+from datetime import datetime, timedelta, timezone
+import msgpack
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from apps.backend import storage
+from apps.backend.api.kp_chart import router
+from apps.backend.services import chart_format
+
+
+def chart(prediction_id="a" * 32, **overrides):
+    return {
+        "id": prediction_id,
+        "birth_date": datetime(1990, 1, 1, 5, 30, tzinfo=timezone.utc),
+        "planetary_positions": [
+            {"planet": "Sun", "longitude": 100.125, "house": 1},
+            {"planet": "Moon", "longitude": 150.0, "house": 2},
+        ],
+        "houses": list(range(1, 13)),
+        **overrides,
+    }
+
+
+def test_records_round_trip_and_bulk_load_without_copying():
+    records = [chart_format.encode_chart(chart(f"{i:032x}")) for i in range(100)]
+    assert {len(record) for record in records} == {chart_format.record_size()}
+    buffer = chart_format.file_header() + b"".join(records)
+
+    charts = chart_format.load_chart_array(buffer)
+    assert len(charts) == 100 and np.shares_memory(charts, np.frombuffer(buffer, dtype=np.uint8))
+    assert charts["longitudes"][:, chart_format.PLANETS.index("Moon")].tolist() == [150.0] * 100
+    assert chart_format.decode_chart(charts[7]) == {
+        **chart(f"{7:032x}"), "birth_date": "1990-01-01T05:30:00+00:00",
+    }
+
+
+@pytest.mark.parametrize("birth_date", [
+    "1990-05-01T10:30:00+05:30",
+    "1990-05-01T10:30:00-03:00",
+    "1990-05-01T10:30:00",
+    datetime(1990, 5, 1, 10, 30, tzinfo=timezone(timedelta(hours=5, minutes=30))),
+])
+def test_birth_dates_round_trip_exactly(birth_date):
+    [record] = chart_format.load_chart_array(chart_format.file_header() + chart_format.encode_chart(chart(birth_date=birth_date)))
+    decoded = chart_format.decode_chart(record)["birth_date"]
+    if isinstance(birth_date, str):
+        assert decoded == birth_date
+    else:
+        assert datetime.fromisoformat(decoded) == birth_date and decoded.endswith("+05:30")
+
+
+@pytest.mark.parametrize("overrides", [
+    {"birth_date": "1990-05-01"},
+    {"birth_date": "1990-05-01T10:30:00Z"},
+    {"houses": [1, 2, 3]},
+    {"planetary_positions": [{"planet": "Pluto", "longitude": 1.0, "house": 1}]},
+    {"planetary_positions": [{"planet": "Sun", "longitude": 1.0, "house": 1, "sign": "Leo"}]},
+    {"birth_date": "not a date"},
+])
+def test_charts_that_do_not_fit_the_layout_are_not_encoded(overrides):
+    assert chart_format.encode_chart(chart(**overrides)) is None
+
+
+def test_other_versions_are_rejected():
+    header = bytearray(chart_format.file_header())
+    header[8] = chart_format.CHART_FORMAT_VERSION + 1
+    with pytest.raises(ValueError):
+        chart_format.load_chart_array(bytes(header))
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "STORAGE_FILE", str(tmp_path / "predictions.json"))
+    app = FastAPI()
+    app.include_router(router, prefix="/kp-chart")
+    return TestClient(app)
+
+
+def test_saved_charts_live_in_the_chart_file(client):
+    created = client.post("/kp-chart/", json={"name": "Test", "birth_date": "1990-01-01T00:00:00"})
+    prediction_id = created.json()["id"]
+
+    with open(storage.STORAGE_FILE) as f:
+        [entry] = json.load(f)
+    assert "planetary_positions" not in entry and entry["name"] == "Test"
+    assert os.path.getsize(storage.charts_file()) == chart_format.HEADER_SIZE + chart_format.record_size()
+    assert storage.load_chart_array()["id"].tolist() == [prediction_id.encode()]
+
+    saved = client.get(f"/kp-chart/{prediction_id}").json()
+    assert {key: saved[key] for key in ("name", "birth_date", "houses")} == {
+        key: created.json()[key] for key in ("name", "birth_date", "houses")
+    }
+    assert saved["planetary_positions"] == created.json()["planetary_positions"]
+
+
+def test_chart_responses_are_negotiated(client):
+    packed = client.post("/kp-chart/", json={"name": "Test", "birth_date": "1990-01-01T00:00:00"},
+                         headers={"Accept": "application/msgpack"})
+    assert packed.headers["content-type"] == "application/msgpack"
+    prediction_id = msgpack.unpackb(packed.content)["id"]
+
+    fetched = client.get(f"/kp-chart/{prediction_id}", headers={"Accept": "application/x-msgpack, application/json;q=0.5"})
+    assert msgpack.unpackb(fetched.content)["houses"] == list(range(1, 13))
+
+    binary = client.get(f"/kp-chart/{prediction_id}", headers={"Accept": "application/vnd.astrobalendar.kp-chart"})
+    [record] = chart_format.load_chart_array(binary.content)
+    assert chart_format.decode_chart(record)["id"] == prediction_id
+    assert client.get(f"/kp-chart/{prediction_id}").headers["content-type"] == "application/json"
@@ -0,0 +1,136 @@
+import json
+import httpx
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from fastapi import FastAPI
+from apps.backend.api import chat
+from apps.backend.services.chat_cache import ChatResponseCache
+
+TOKENS = ["Your ", "current ", "dasa ", "is ", "Jupiter."]
+
+
+@pytest_asyncio.fixture
+async def completion_server():
+    calls = {"completions": 0, "embeddings": 0, "messages": []}
+
+    async def completions(request):
+        calls["completions"] += 1
+        body = await request.json()
+        calls["messages"].append(body["messages"])
+        if not body.get("stream"):
+            return web.json_response({
+                "id": "chatcmpl-1", "object": "chat.completion", "created": 0, "model": body["model"],
+                "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "".join(TOKENS)}}],
+            })
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        for token in TOKENS:
+            chunk = {
+                "id": "chatcmpl-1", "object": "chat.completion.chunk", "created": 0, "model": body["model"],
+                "choices": [{"index": 0, "finish_reason": None, "delta": {"content": token}}],
+            }
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        await response.write(b"data: [DONE]\n\n")
+        return response
+
+    async def embeddings(request):
+        calls["embeddings"] += 1
+        body = await request.json()
+        # Questions mentioning "dasa" land on the same vector, anything else elsewhere.
+        vector = [1.0, 0.1, 0.0] if "dasa" in body["input"].lower() else [0.0, 0.0, 1.0]
+        return web.json_response({
+            "object": "list", "model": body["model"], "usage": {"prompt_tokens": 1, "total_tokens": 1},
+            "data": [{"object": "embedding", "index": 0, "embedding": vector}],
+        })
+
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", completions)
+    app.router.add_post("/v1/embeddings", embeddings)
+    server = TestServer(app, host="127.0.0.1")
+    await server.start_server()
+    yield server, calls
+    await server.close()
+
+
+@pytest_asyncio.fixture
+async def client(completion_server, monkeypatch):
+    server, _ = completion_server
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setenv("OPENAI_BASE_URL", str(server.make_url("/v1")))
+    monkeypatch.setattr(chat, "_client", None)
+    monkeypatch.setattr(chat, "response_cache", ChatResponseCache(semantic=False))
+    app = FastAPI()
+    app.include_router(chat.router)
+    async with httpx.AsyncClient(app=app, base_url="http://test") as http:
+        yield http
+
+
+def _sse_tokens(text):
+    events = [line[len("data: "):] for line in text.splitlines() if line.startswith("data: ")]
+    assert events[-1] == "[DONE]"
+    return [json.loads(event)["token"] for event in events[:-1]]
+
+
+@pytest.mark.asyncio
+async def test_repeated_question_is_answered_from_cache(client, completion_server):
+    _, calls = completion_server
+    first = await client.post("/chat", json={"question": "What is my dasa?"})
+    second = await client.post("/chat", json={"question": "  what is my DASA "})
+    assert first.json() == second.json() == {"answer": "".join(TOKENS)}
+    assert calls["completions"] == 1
+
+
+@pytest.mark.asyncio
+async def test_streaming_sends_tokens_and_caches_answer(client, completion_server):
+    _, calls = completion_server
+    response = await client.post("/chat", json={"question": "What is my dasa?", "stream": True})
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert _sse_tokens(response.text) == TOKENS
+
+    cached = await client.post("/chat", json={"question": "what is my dasa", "stream": True})
+    assert "".join(_sse_tokens(cached.text)) == "".join(TOKENS)
+    assert calls["completions"] == 1
+
+
+@pytest.mark.asyncio
+async def test_paraphrase_is_served_by_semantic_tier(client, completion_server, monkeypatch):
+    pytest.importorskip("numpy")
+    _, calls = completion_server
+    monkeypatch.setattr(chat, "response_cache", ChatResponseCache(semantic=True, threshold=0.9))
+
+    await client.post("/chat", json={"question": "What is my dasa?"})
+    paraphrase = await client.post("/chat", json={"question": "Which dasa am I running now?"})
+    assert paraphrase.json() == {"answer": "".join(TOKENS)}
+    assert calls["completions"] == 1
+
+    await client.post("/chat", json={"question": "Will I travel abroad?"})
+    assert calls["completions"] == 2
+
+
+@pytest.mark.asyncio
+async def test_prediction_chart_is_injected_and_scopes_cache(client, completion_server, tmp_path, monkeypatch):
+    from apps.backend import storage
+    _, calls = completion_server
+    monkeypatch.setattr(storage, "STORAGE_FILE", str(tmp_path / "predictions.json"))
+    ids = [storage.save_prediction({
+        "name": name,
+        "birth_date": "1990-01-01T06:30:00",
+        "planetary_positions": [{"planet": "Moon", "longitude": longitude, "house": 4}],
+        "houses": list(range(1, 13)),
+        "prediction_summary": "Summary",
+    }) for name, longitude in (("Asha", 45.0), ("Ravi", 200.0))]
+
+    for prediction_id in ids:
+        response = await client.post("/chat", json={"question": "What is my dasa?", "prediction_id": prediction_id})
+        assert response.status_code == 200
+    assert calls["completions"] == 2
+    system = calls["messages"][0][0]
+    assert system["role"] == "system" and "Current dasa:" in system["content"] and "Asha" in system["content"]
+
+    await client.post("/chat", json={"question": "what is my dasa", "prediction_id": ids[0]})
+    assert calls["completions"] == 2
+
+    missing = await client.post("/chat", json={"question": "What is my dasa?", "prediction_id": "missing"})
+    assert missing.status_code == 404
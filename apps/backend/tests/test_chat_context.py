@@ -0,0 +1,43 @@
+from datetime import date, datetime
+from apps.backend.models import ClientOut
+from apps.backend.services import chat_context
+from apps.backend.services.chat_context import current_dasa, estimate_tokens, get_chart_context, kp_lords
+
+
+def test_kp_lords():
+    # 0° Aries opens Ashwini (Ketu star, Ketu sub); 45° Taurus falls in Rohini's Moon star.
+    assert kp_lords(0.5) == ("Mars", "Ketu", "Ketu")
+    assert kp_lords(45.0)[:2] == ("Venus", "Moon")
+    # Ashwini's Ketu sub spans 7/120 of 13°20'; just past it the Venus sub begins.
+    assert kp_lords(0.8)[2] == "Venus"
+
+
+def test_current_dasa_walks_the_vimshottari_sequence():
+    birth = datetime(1990, 1, 1)
+    # Moon at the very start of Ashwini: the full Ketu mahadasa starts at birth.
+    assert current_dasa(0.0, birth, date(1990, 2, 1))[:2] == ("Ketu", "Ketu")
+    assert current_dasa(0.0, birth, date(2000, 1, 1))[0] == "Venus"
+    assert current_dasa(0.0, birth, date(1980, 1, 1)) is None
+
+
+def test_client_summary_fits_budget_and_is_cached(tmp_path, monkeypatch):
+    client = ClientOut(id="7", name="Asha", birth_date=datetime(1990, 1, 1), birth_time=None, birth_location=None)
+    monkeypatch.setattr(chat_context, "get_client", lambda client_id: client if client_id == "7" else None)
+    monkeypatch.setattr(chat_context, "_summary_cache", type(chat_context._summary_cache)())
+    computed = []
+    real = chat_context.calculate_kp_chart
+    monkeypatch.setattr(chat_context, "calculate_kp_chart", lambda *args: computed.append(args) or real(*args))
+
+    full = get_chart_context(client_id="7", budget=1000)
+    assert "Current dasa:" in full.text and full.tokens == estimate_tokens(full.text)
+    assert get_chart_context(client_id="7", budget=1000) is full
+    assert len(computed) == 1
+
+    small = get_chart_context(client_id="7", budget=30)
+    assert small.tokens <= 30 and full.text.startswith(small.text)
+    assert small.version != full.version
+
+    client.birth_time = "06:30"
+    get_chart_context(client_id="7", budget=1000)
+    assert len(computed) == 3
+    assert get_chart_context(client_id="8") is None
@@ -0,0 +1,41 @@
+import pytest
+from bson.objectid import ObjectId
+from db import db_ops, mongo
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+
+@pytest.fixture
+def mock_db(monkeypatch):
+    monkeypatch.setattr(mongo, "_client", mongomock_motor.AsyncMongoMockClient())
+    yield mongo.get_database()
+    monkeypatch.setattr(mongo, "_client", None)
+
+
+@pytest.mark.asyncio
+async def test_bulk_insert_is_chunked_and_unordered(mock_db):
+    await mock_db.horoscopes.create_index("slug", unique=True)
+    documents = [{"slug": f"h{i}"} for i in range(25)] + [{"slug": "h3"}, {"slug": "h30"}]
+
+    result = await db_ops.bulk_insert(mock_db.horoscopes, iter(documents), chunk_size=10)
+    assert len(result.inserted_ids) == 26
+    assert len(result.errors) == 1
+    assert await mock_db.horoscopes.count_documents({}) == 26
+
+
+@pytest.mark.asyncio
+async def test_events_are_streamed_in_date_order_with_projection(mock_db):
+    user_id = ObjectId()
+    await db_ops.create_events({"user_id": user_id, "eventDate": day, "title": f"e{day}", "notes": "x"} for day in (3, 1, 2))
+    await db_ops.create_event({"user_id": ObjectId(), "eventDate": 0, "title": "other"})
+
+    events = [event async for event in db_ops.iter_events_by_user(str(user_id), {"_id": 0, "title": 1}, batch_size=1)]
+    assert events == [{"title": "e1"}, {"title": "e2"}, {"title": "e3"}]
+    assert len(await db_ops.get_events_by_user(str(user_id), limit=2)) == 2
+
+
+@pytest.mark.asyncio
+async def test_user_lookup(mock_db):
+    user_id = await db_ops.create_user({"email": "a@example.com", "hashed_password": "secret"})
+    user = await db_ops.get_user_by_email("a@example.com", {"hashed_password": 0})
+    assert user == {"_id": user_id, "email": "a@example.com"}
@@ -0,0 +1,92 @@
+import asyncio
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from app.email import EmailService
+
+PDF = b"%PDF-1.4\n" + bytes(range(256)) * 4096
+
+
+@pytest_asyncio.fixture
+async def attachment_server():
+    requests = []
+
+    async def handler(request):
+        requests.append(request)
+        if request.headers.get("If-None-Match") == '"v1"':
+            return web.Response(status=304)
+        await asyncio.sleep(0.05)
+        return web.Response(body=PDF, headers={"ETag": '"v1"', "Content-Type": "application/pdf"})
+
+    app = web.Application()
+    app.router.add_get("/report.pdf", handler)
+    server = TestServer(app, host="127.0.0.1")
+    await server.start_server()
+    yield server, requests
+    await server.close()
+
+
+@pytest_asyncio.fixture
+async def email_service():
+    service = EmailService()
+    yield service
+    await service.stop()
+
+
+@pytest.mark.asyncio
+async def test_same_attachment_is_downloaded_once(attachment_server, email_service):
+    server, requests = attachment_server
+    url = str(server.make_url("/report.pdf"))
+    email_service.allowed_domains.append(f"127.0.0.1:{server.port}")
+
+    contents = await asyncio.gather(*(email_service._download_file(url) for _ in range(20)))
+    assert all(content == PDF for content in contents)
+    assert await email_service._download_file(url) == PDF
+    assert len(requests) == 1
+
+
+@pytest.mark.asyncio
+async def test_stale_attachment_is_revalidated_with_etag(attachment_server, email_service):
+    server, requests = attachment_server
+    url = str(server.make_url("/report.pdf"))
+    email_service.allowed_domains.append(f"127.0.0.1:{server.port}")
+    email_service.attachment_fresh_seconds = 0
+
+    assert await email_service._download_file(url) == PDF
+    assert await email_service._download_file(url) == PDF
+    assert len(requests) == 2
+    assert requests[1].headers["If-None-Match"] == '"v1"'
+
+
+@pytest.mark.asyncio
+async def test_prediction_email_renders_report_in_process(tmp_path, monkeypatch, email_service):
+    from apps.backend import storage
+    from app import email
+    from app.email_queue import OutboundEmail
+
+    # One storage module, so the path patched here is the one the service reads.
+    assert email.get_prediction is storage.get_prediction
+    monkeypatch.setattr(storage, "STORAGE_FILE", str(tmp_path / "predictions.json"))
+    prediction_id = storage.save_prediction({
+        "name": "Test Client",
+        "birth_date": "1990-01-01T00:00:00",
+        "planetary_positions": [{"planet": "Sun", "longitude": 100.0, "house": 1}],
+        "prediction_summary": "Summary",
+    })
+    sent = []
+
+    async def capture(email):
+        sent.append(email)
+        return email.message_id
+
+    monkeypatch.setattr(email_service.queue, "enqueue", capture)
+    await email_service.queue_prediction_email("client@example.com", "Prediction", "body", prediction_id)
+
+    email = sent[0]
+    await email_service._prepare_attachment(email)
+    assert email.attachment.startswith(b"%PDF")
+    # A second email for the same prediction reuses the cached render.
+    again = OutboundEmail("other@example.com", "Prediction", "body", prediction=dict(email.prediction))
+    await email_service._prepare_attachment(again)
+    assert again.attachment is email.attachment
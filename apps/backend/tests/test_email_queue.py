@@ -0,0 +1,157 @@
+import asyncio
+import socket
+import pytest
+from email.mime.text import MIMEText
+from aiosmtpd.controller import Controller
+from app.email_queue import EmailQueue, OutboundEmail, SMTPConnectionPool
+
+
+class RecordingHandler:
+    """Local SMTP sink that records deliveries and can reject the first N attempts."""
+
+    def __init__(self, reject_first: int = 0, reject_code: str = "451 Try again later"):
+        self.messages = []
+        self.sessions = set()
+        self.reject_first = reject_first
+        self.reject_code = reject_code
+
+    async def handle_DATA(self, server, session, envelope):
+        self.sessions.add(id(session))
+        if self.reject_first:
+            self.reject_first -= 1
+            return self.reject_code
+        self.messages.append(envelope)
+        return "250 OK"
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_sink():
+    def start(handler):
+        controller = Controller(handler, hostname="127.0.0.1", port=free_port())
+        controller.start()
+        controllers.append(controller)
+        return controller
+
+    controllers = []
+    yield start
+    for controller in controllers:
+        controller.stop()
+
+
+def build_message(email: OutboundEmail):
+    msg = MIMEText(email.body)
+    msg["From"] = "noreply@astrobalendar.com"
+    msg["To"] = email.to_email
+    msg["Subject"] = email.subject
+    return msg
+
+
+def make_queue(controller, **kwargs):
+    pool = SMTPConnectionPool("127.0.0.1", controller.port, size=1, use_tls=False)
+    return EmailQueue(pool, build_message=build_message, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_batched_messages_reuse_one_connection(smtp_sink):
+    handler = RecordingHandler()
+    email_queue = make_queue(smtp_sink(handler), batch_size=5)
+    await email_queue.start()
+    for i in range(12):
+        await email_queue.enqueue(OutboundEmail(f"user{i}@example.com", "Monthly prediction", "body"))
+    await email_queue.stop()
+
+    assert sorted(env.rcpt_tos[0] for env in handler.messages) == sorted(f"user{i}@example.com" for i in range(12))
+    assert len(handler.sessions) == 1
+
+
+@pytest.mark.asyncio
+async def test_transient_failures_are_retried(smtp_sink):
+    handler = RecordingHandler(reject_first=2)
+    email_queue = make_queue(smtp_sink(handler), retry_backoff=0.01)
+    await email_queue.start()
+    email = OutboundEmail("client@example.com", "Prediction", "body", delivered=asyncio.get_running_loop().create_future())
+    await email_queue.enqueue(email)
+    assert await asyncio.wait_for(email.delivered, 5)
+    await email_queue.stop()
+
+    assert email.attempts == 3
+    assert len(handler.messages) == 1
+
+
+@pytest.mark.asyncio
+async def test_permanent_failures_are_not_retried(smtp_sink):
+    handler = RecordingHandler(reject_first=1, reject_code="550 Mailbox unavailable")
+    email_queue = make_queue(smtp_sink(handler), retry_backoff=0.01)
+    await email_queue.start()
+    email = OutboundEmail("nobody@example.com", "Prediction", "body", delivered=asyncio.get_running_loop().create_future())
+    await email_queue.enqueue(email)
+    with pytest.raises(Exception):
+        await asyncio.wait_for(email.delivered, 5)
+    await email_queue.stop()
+
+    assert email.attempts == 1
+    assert handler.messages == []
+
+
+@pytest.mark.asyncio
+async def test_stop_waits_for_pending_retries(smtp_sink):
+    handler = RecordingHandler(reject_first=1)
+    email_queue = make_queue(smtp_sink(handler), retry_backoff=0.2)
+    await email_queue.start()
+    email = OutboundEmail("client@example.com", "Prediction", "body", delivered=asyncio.get_running_loop().create_future())
+    await email_queue.enqueue(email)
+    await email_queue.stop(timeout=5)
+
+    assert email.delivered.result() is True
+    assert len(handler.messages) == 1
+
+
+@pytest.mark.asyncio
+async def test_stop_fails_retries_left_after_the_deadline(smtp_sink, caplog):
+    handler = RecordingHandler(reject_first=1)
+    email_queue = make_queue(smtp_sink(handler), retry_backoff=60)
+    await email_queue.start()
+    email = OutboundEmail("client@example.com", "Prediction", "body", delivered=asyncio.get_running_loop().create_future())
+    await email_queue.enqueue(email)
+    await email_queue.stop(timeout=0.5)
+
+    with pytest.raises(RuntimeError, match="stopped before the email was sent"):
+        email.delivered.result()
+    assert f"Giving up on email {email.message_id}" in caplog.text
+    assert handler.messages == []
+
+
+class SlowHandler(RecordingHandler):
+    async def handle_DATA(self, server, session, envelope):
+        await asyncio.sleep(0.5)
+        return await super().handle_DATA(server, session, envelope)
+
+
+@pytest.mark.asyncio
+async def test_stop_does_not_block_the_loop_on_in_flight_sends(smtp_sink):
+    handler = SlowHandler()
+    email_queue = make_queue(smtp_sink(handler))
+    await email_queue.start()
+    await email_queue.enqueue(OutboundEmail("client@example.com", "Prediction", "body"))
+    await asyncio.sleep(0.1)
+
+    ticks = 0
+
+    async def tick():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    ticker = asyncio.create_task(tick())
+    await email_queue.stop(drain=False)
+    ticker.cancel()
+    # The send was already on the SMTP thread, so stop waited for it without stalling other tasks.
+    assert len(handler.messages) == 1
+    assert ticks >= 10
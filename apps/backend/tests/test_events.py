@@ -0,0 +1,160 @@
+import json
+import operator
+from datetime import datetime
+import httpx
+import pytest
+import pytest_asyncio
+from app_factory import create_app
+from dependencies import get_firestore
+
+OPERATORS = {"==": operator.eq, ">=": operator.ge, "<": operator.lt}
+
+
+class FakeSnapshot:
+    def __init__(self, id, data):
+        self.id = id
+        self._data = data
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+
+class FakeDocument:
+    def __init__(self, docs, id):
+        self._docs = docs
+        self.id = id
+
+    async def get(self):
+        return FakeSnapshot(self.id, self._docs.get(self.id))
+
+
+class FakeQuery:
+    """The subset of the async Firestore query API the events endpoint uses."""
+
+    def __init__(self, docs, filters=(), order=None, fields=None, after=None, count=None):
+        self._docs = docs
+        self._filters = filters
+        self._order = order
+        self._fields = fields
+        self._after = after
+        self._count = count
+
+    def _with(self, **changes):
+        state = dict(filters=self._filters, order=self._order, fields=self._fields, after=self._after, count=self._count)
+        return FakeQuery(self._docs, **{**state, **changes})
+
+    def where(self, field, op, value):
+        return self._with(filters=(*self._filters, (field, OPERATORS[op], value)))
+
+    def order_by(self, field):
+        return self._with(order=field)
+
+    def select(self, fields):
+        return self._with(fields=list(fields))
+
+    def start_after(self, snapshot):
+        return self._with(after=snapshot)
+
+    def limit(self, count):
+        return self._with(count=count)
+
+    def document(self, id):
+        return FakeDocument(self._docs, id)
+
+    async def stream(self):
+        matches = [
+            (id, data) for id, data in self._docs.items()
+            if all(field in data and op(data[field], value) for field, op, value in self._filters)
+        ]
+        matches.sort(key=lambda item: (item[1][self._order], item[0]))
+        if self._after is not None:
+            last = (self._after.to_dict()[self._order], self._after.id)
+            matches = [item for item in matches if (item[1][self._order], item[0]) > last]
+        for id, data in matches[:self._count]:
+            if self._fields is not None:
+                data = {field: data[field] for field in self._fields if field in data}
+            yield FakeSnapshot(id, data)
+
+
+class FakeFirestore:
+    def __init__(self):
+        self.collections = {}
+
+    def collection(self, name):
+        return FakeQuery(self.collections.setdefault(name, {}))
+
+
+@pytest.fixture
+def firestore():
+    firestore = FakeFirestore()
+    events = firestore.collections.setdefault("events", {})
+    for day in range(1, 6):
+        events[f"alice-{day}"] = {
+            "title": f"Transit {day}", "user_id": "alice", "event_date": datetime(2024, 5, day, 9),
+            "created_at": datetime(2024, 4, 1),
+        }
+    events["bob-1"] = {"title": "Transit", "user_id": "bob", "event_date": datetime(2024, 5, 2), "created_at": datetime(2024, 4, 1)}
+    return firestore
+
+
+@pytest_asyncio.fixture
+async def client(firestore):
+    app = create_app()
+    app.dependency_overrides[get_firestore] = lambda: firestore
+    async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+        yield client
+
+
+def ids(response):
+    return [event["id"] for event in response.json()]
+
+
+@pytest.mark.asyncio
+async def test_pages_follow_the_next_cursor(client):
+    pages, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"start_after": cursor} if cursor else {})}
+        response = await client.get("/events/alice", params=params)
+        assert response.status_code == 200
+        pages.append(ids(response))
+        cursor = response.headers.get("x-next-cursor")
+        if cursor is None:
+            break
+    assert pages == [["alice-1", "alice-2"], ["alice-3", "alice-4"], ["alice-5"]]
+    # Another user's event, or a missing one, is not a valid cursor.
+    assert (await client.get("/events/alice", params={"start_after": "bob-1"})).status_code == 400
+    assert (await client.get("/events/alice", params={"start_after": "missing"})).status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_date_bounds_include_from_and_exclude_to(client):
+    response = await client.get("/events/alice", params={"from_date": "2024-05-02T09:00:00", "to_date": "2024-05-04T09:00:00"})
+    assert ids(response) == ["alice-2", "alice-3"]
+    assert response.json()[0]["event_date"] == "2024-05-02T09:00:00"
+
+
+@pytest.mark.asyncio
+async def test_fields_select_a_projection(client):
+    response = await client.get("/events/alice", params={"fields": "title, event_date", "limit": 2})
+    assert response.json() == [
+        {"id": "alice-1", "title": "Transit 1", "event_date": "2024-05-01T09:00:00"},
+        {"id": "alice-2", "title": "Transit 2", "event_date": "2024-05-02T09:00:00"},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_ndjson_streams_one_object_per_line(client):
+    response = await client.get("/events/alice", params={"format": "ndjson", "limit": 2, "from_date": "2024-05-02T00:00:00"})
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert response.text.endswith("\n")
+    lines = response.text.splitlines()
+    # Exports are not paged.
+    assert [json.loads(line)["id"] for line in lines] == ["alice-2", "alice-3", "alice-4", "alice-5"]
+    assert json.loads(lines[0]) == {
+        "id": "alice-2", "title": "Transit 2", "user_id": "alice",
+        "event_date": "2024-05-02T09:00:00", "created_at": "2024-04-01T00:00:00",
+    }
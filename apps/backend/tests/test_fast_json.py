@@ -0,0 +1,43 @@
+from datetime import datetime, timezone
+import numpy as np
+import orjson
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from apps.backend import storage
+from apps.backend.api.kp_chart import router
+from apps.backend.models import KPPredictionResult, PlanetPosition
+from utils.fast_json import EncodedJSON, ORJSONResponse, dumps
+
+
+def test_dumps_handles_models_datetimes_and_arrays():
+    chart = KPPredictionResult(
+        name="Test", birth_date=datetime(1990, 1, 1, tzinfo=timezone.utc),
+        planetary_positions=[PlanetPosition(planet="Sun", longitude=100.5, house=1)],
+        houses=[1, 2], prediction_summary="Summary",
+    )
+    decoded = orjson.loads(dumps({"chart": chart, "longitudes": np.array([1.5, 2.25])}))
+    assert decoded["chart"] == orjson.loads(chart.model_dump_json())
+    assert decoded["chart"]["birth_date"] == "1990-01-01T00:00:00Z"
+    assert decoded["longitudes"] == [1.5, 2.25]
+    assert ORJSONResponse(EncodedJSON(b'{"a":1}')).body == b'{"a":1}'
+
+
+def test_saved_chart_encoding_is_reused_until_storage_changes(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "STORAGE_FILE", str(tmp_path / "predictions.json"))
+    app = FastAPI()
+    app.include_router(router, prefix="/kp-chart")
+    client = TestClient(app)
+
+    created = client.post("/kp-chart/", json={"name": "Test", "birth_date": "1990-01-01T00:00:00"})
+    assert created.status_code == 200
+    prediction_id = created.json()["id"]
+
+    first = storage.get_prediction_json(prediction_id)
+    assert storage.get_prediction_json(prediction_id) is first
+    response = client.get(f"/kp-chart/{prediction_id}")
+    assert response.content == first
+    assert response.json()["name"] == "Test"
+
+    storage.save_prediction({"name": "Other"})
+    assert storage.get_prediction_json(prediction_id) is not first
+    assert client.get("/kp-chart/missing").status_code == 404
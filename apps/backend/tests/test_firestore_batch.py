@@ -0,0 +1,96 @@
+import asyncio
+import pytest
+from utils.firestore_batch import FirestoreBatchWriter
+from utils.health import CachedProbe
+
+
+class FakeBatch:
+    def __init__(self, client):
+        self.client = client
+        self.writes = []
+
+    def set(self, ref, data):
+        self.writes.append((ref, data))
+
+    async def commit(self):
+        await asyncio.sleep(0)
+        if self.client.fail:
+            raise RuntimeError("commit failed")
+        self.client.commits.append(self.writes)
+
+
+class FakeClient:
+    def __init__(self):
+        self.commits = []
+        self.fail = False
+        self.unavailable = False
+
+    def batch(self):
+        if self.unavailable:
+            raise ValueError("Firebase is not configured")
+        return FakeBatch(self)
+
+
+@pytest.mark.asyncio
+async def test_writes_are_coalesced_into_batches():
+    client = FakeClient()
+    writer = FirestoreBatchWriter(client, flush_interval=0.01)
+    await asyncio.gather(*(writer.set(f"doc{i}", {"i": i}) for i in range(1200)))
+    await writer.set("last", {"i": -1}, wait=True)
+    assert sum(len(commit) for commit in client.commits) == 1201
+    assert all(len(commit) <= 500 for commit in client.commits)
+    assert len(client.commits) <= 4
+    await writer.close()
+
+
+@pytest.mark.asyncio
+async def test_close_flushes_and_waiters_see_failures():
+    client = FakeClient()
+    writer = FirestoreBatchWriter(client, flush_interval=10)
+    await writer.set("a", {})
+    await writer.close()
+    assert client.commits == [[("a", {})]]
+
+    client.fail = True
+    writer.flush_interval = 0.01
+    with pytest.raises(RuntimeError):
+        await asyncio.wait_for(writer.set("b", {}, wait=True), 1)
+    await writer.close()
+
+
+@pytest.mark.asyncio
+async def test_client_failures_fail_the_writes_and_later_writes_go_through():
+    client = FakeClient()
+    writer = FirestoreBatchWriter(client, flush_interval=0.01)
+    client.unavailable = True
+    with pytest.raises(ValueError):
+        await asyncio.wait_for(writer.set("a", {}, wait=True), 1)
+    assert writer._pending == []
+
+    client.unavailable = False
+    await asyncio.wait_for(writer.set("b", {}, wait=True), 1)
+    assert client.commits == [[("b", {})]]
+    # A flush task that died is started again by the next write.
+    writer._task.cancel()
+    await asyncio.gather(writer._task, return_exceptions=True)
+    await asyncio.wait_for(writer.set("c", {}, wait=True), 1)
+    assert client.commits[-1] == [("c", {})]
+    await writer.close()
+
+
+@pytest.mark.asyncio
+async def test_probe_is_shared_and_cached():
+    calls = []
+
+    async def check():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        if len(calls) > 1:
+            raise RuntimeError("unavailable")
+
+    probe = CachedProbe(check, ttl=60)
+    results = await asyncio.gather(*(probe() for _ in range(10)))
+    assert results == [(True, None)] * 10 and len(calls) == 1
+
+    probe.ttl = 0
+    assert await probe() == (False, "unavailable")
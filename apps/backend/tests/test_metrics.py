@@ -0,0 +1,46 @@
+import httpx
+import pytest
+from fastapi import FastAPI
+from utils.http_metrics import PrometheusMiddleware, http_requests, http_requests_in_progress, metrics_endpoint
+from utils.metrics import Registry, generate_latest
+
+
+def test_exposition_format():
+    registry = Registry()
+    registry.counter("jobs_total", "Jobs", ("kind",)).inc(kind='say "hi"\n')
+    histogram = registry.histogram("job_seconds", "Job time", buckets=(0.1, 1.0))
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    registry.gauge("queue_depth", "Queue depth").set(3)
+
+    text = generate_latest(registry)
+    assert '# TYPE jobs_total counter\njobs_total{kind="say \\"hi\\"\\n"} 1\n' in text
+    assert 'job_seconds_bucket{le="0.1"} 1\njob_seconds_bucket{le="1"} 2\njob_seconds_bucket{le="+Inf"} 2\n' in text
+    assert "job_seconds_sum 0.55\njob_seconds_count 2\n" in text
+    assert "# TYPE queue_depth gauge\nqueue_depth 3\n" in text
+
+
+@pytest.mark.asyncio
+async def test_middleware_labels_requests_by_route_template():
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: str):
+        return {"id": item_id}
+
+    app.add_middleware(PrometheusMiddleware)
+    app.add_api_route("/metrics", metrics_endpoint, methods=["GET"])
+    before = http_requests.value(method="GET", route="/items/{item_id}", status="200")
+    unmatched = http_requests.value(method="GET", route="<unmatched>", status="404")
+
+    async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+        for item_id in ("a", "b", "c"):
+            await client.get(f"/items/{item_id}")
+        await client.get("/nowhere")
+        response = await client.get("/metrics")
+
+    assert http_requests.value(method="GET", route="/items/{item_id}", status="200") == before + 3
+    assert http_requests.value(method="GET", route="<unmatched>", status="404") == unmatched + 1
+    assert http_requests_in_progress.value(method="GET") == 0
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert 'http_request_duration_seconds_count{method="GET",route="/items/{item_id}"}' in response.text
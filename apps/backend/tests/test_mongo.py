@@ -0,0 +1,49 @@
+import pytest
+from db import mongo
+
+
+@pytest.fixture
+def fresh_client(monkeypatch):
+    monkeypatch.setattr(mongo, "_client", None)
+    yield
+    mongo.close_db()
+
+
+def test_client_is_created_once_on_first_use_with_pool_settings(fresh_client, monkeypatch):
+    monkeypatch.setenv("MONGODB_URI", "mongodb://localhost:27017")
+    monkeypatch.setattr(mongo, "MONGODB_MAX_POOL_SIZE", 25)
+    users = mongo.db.users
+    assert mongo._client is None
+
+    assert users.name == "users"
+    client = mongo.get_client()
+    assert client is mongo.get_client()
+    assert client.options.pool_options.max_pool_size == 25
+    assert "zlib" in client.options.pool_options._compression_settings.compressors
+
+
+@pytest.mark.asyncio
+async def test_startup_creates_indexes(fresh_client, monkeypatch):
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    monkeypatch.setattr(mongo, "_client", mongomock_motor.AsyncMongoMockClient())
+
+    await mongo.ensure_indexes(mongo.get_database())
+    users = await mongo.db.users.index_information()
+    assert users["email_unique"]["unique"] is True
+    events = await mongo.db.calendar_events.index_information()
+    assert events["user_id_eventDate"]["key"] == [("user_id", 1), ("eventDate", 1)]
+
+
+@pytest.mark.asyncio
+async def test_indexes_are_created_when_validators_fail(fresh_client, monkeypatch, caplog):
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    monkeypatch.setattr(mongo, "_client", mongomock_motor.AsyncMongoMockClient())
+
+    async def not_authorized(database):
+        raise PermissionError("not authorized to run collMod")
+
+    monkeypatch.setattr(mongo, "apply_validators", not_authorized)
+    assert await mongo.init_db() is False
+    assert "email_unique" in await mongo.db.users.index_information()
+    assert "validators could not be applied: not authorized" in caplog.text
+    assert "indexes could not be created" not in caplog.text
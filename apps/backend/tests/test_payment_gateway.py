@@ -0,0 +1,137 @@
+import asyncio
+import threading
+import time
+import pytest
+import stripe
+from types import SimpleNamespace
+from apps.backend.models import PaymentRequest
+from apps.backend.services.payment_gateway import PaymentGateway, stripe_request_seconds, stripe_retries
+
+
+@pytest.fixture
+def gateway():
+    gateway = PaymentGateway(max_workers=2, timeout=0.5, max_retries=2, retry_backoff=0.01)
+    yield gateway
+    gateway.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_transient_errors_are_retried_with_one_idempotency_key(gateway, monkeypatch):
+    calls = []
+
+    def create(**params):
+        calls.append(params)
+        if len(calls) < 3:
+            raise stripe.error.APIConnectionError("connection reset")
+        return SimpleNamespace(id="cs_test")
+
+    monkeypatch.setattr(stripe.checkout.Session, "create", create)
+    retries = stripe_retries.value(operation="checkout.session.create")
+    request = PaymentRequest(client_id="c1", amount=12.5)
+
+    assert await gateway.create_checkout_session(request, "https://ok", "https://cancel") == "cs_test"
+    assert len({params["idempotency_key"] for params in calls}) == 1
+    assert calls[0]["line_items"][0]["price_data"]["unit_amount"] == 1250
+    assert stripe_retries.value(operation="checkout.session.create") == retries + 2
+    assert stripe_request_seconds.count(operation="checkout.session.create", outcome="ok") >= 1
+
+
+@pytest.mark.asyncio
+async def test_permanent_errors_are_not_retried(gateway):
+    calls = []
+
+    def invalid():
+        calls.append(1)
+        raise stripe.error.InvalidRequestError("bad param", "amount")
+
+    with pytest.raises(stripe.error.InvalidRequestError):
+        await gateway.call("test.invalid", invalid)
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_requests_time_out_in_the_http_client_and_queueing_is_bounded():
+    gateway = PaymentGateway(max_workers=1, timeout=0.5, queue_timeout=0.05, max_retries=2, retry_backoff=0.01)
+    calls = []
+
+    def busy():
+        calls.append("busy")
+        time.sleep(0.3)
+
+    try:
+        gateway._get_executor()
+        assert stripe.default_http_client._timeout == 0.5
+        assert stripe.max_network_retries == 0
+
+        running = asyncio.create_task(gateway.call("test.busy", busy))
+        await asyncio.sleep(0.01)
+        with pytest.raises(asyncio.TimeoutError):
+            await gateway.call("test.queued", calls.append, "queued")
+        await running
+        await gateway.call("test.queued", calls.append, "after")
+        # The queued call neither ran nor was retried.
+        assert calls == ["busy", "after"]
+
+        # A cancelled caller's thread keeps its slot until it finishes.
+        abandoned = asyncio.create_task(gateway.call("test.busy", busy))
+        await asyncio.sleep(0.01)
+        abandoned.cancel()
+        with pytest.raises(asyncio.TimeoutError):
+            await gateway.call("test.queued", calls.append, "queued")
+        await asyncio.sleep(0.35)
+        await gateway.call("test.queued", calls.append, "freed")
+        assert calls[-1] == "freed"
+    finally:
+        gateway.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_calls_are_bounded_by_the_pool_and_leave_the_loop_free(gateway):
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def slow():
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.005)
+
+    ticking = asyncio.create_task(ticker())
+    await asyncio.gather(*(gateway.call("test.slow", slow) for _ in range(6)))
+    ticking.cancel()
+    assert peak[0] == 2
+    assert ticks > 10
+
+
+@pytest.mark.asyncio
+async def test_create_session_maps_upstream_timeouts_to_504(gateway, monkeypatch):
+    import httpx
+    from fastapi import FastAPI
+    from apps.backend.api import payments
+    from dependencies import get_payment_gateway
+
+    def create(**params):
+        raise stripe.error.APIConnectionError("Request timed out")
+
+    def invalid(**params):
+        raise stripe.error.InvalidRequestError("bad param", "amount")
+
+    monkeypatch.setattr(stripe.checkout.Session, "create", create)
+    app = FastAPI()
+    app.include_router(payments.router, prefix="/payments")
+    app.dependency_overrides[get_payment_gateway] = lambda: gateway
+    async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+        body = {"client_id": "c1", "amount": 12.5}
+        assert (await client.post("/payments/create-session", json=body)).status_code == 504
+        monkeypatch.setattr(stripe.checkout.Session, "create", invalid)
+        assert (await client.post("/payments/create-session", json=body)).status_code == 400
@@ -0,0 +1,122 @@
+import hashlib
+import hmac
+import json
+import time
+import httpx
+import pytest
+import pytest_asyncio
+from fastapi import FastAPI
+from mongomock_motor import AsyncMongoMockClient
+from apps.backend.api import payments
+from apps.backend.services import admin_service, payment_service
+from apps.backend.services.payment_store import PaymentStore
+from dependencies import get_payment_store
+
+SECRET = "whsec_test"
+
+
+def signed(event):
+    payload = json.dumps(event)
+    timestamp = int(time.time())
+    signature = hmac.new(SECRET.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256).hexdigest()
+    return payload, {"Stripe-Signature": f"t={timestamp},v1={signature}", "Content-Type": "application/json"}
+
+
+def session_event(event_id, session_id, amount=1500, status="paid", currency="usd"):
+    return {
+        "id": event_id,
+        "type": "checkout.session.completed",
+        "data": {"object": {
+            "id": session_id, "payment_status": status, "amount_total": amount, "currency": currency,
+            "metadata": {"client_id": "client-1"}, "created": 1700000000,
+        }},
+    }
+
+
+@pytest.fixture
+def database():
+    return AsyncMongoMockClient()["test"]
+
+
+def worker(database):
+    return PaymentStore(database.payment_events, database.payments, database.payment_totals)
+
+
+@pytest_asyncio.fixture
+async def client(database, monkeypatch):
+    store = worker(database)
+    monkeypatch.setattr(payment_service, "STRIPE_WEBHOOK_SECRET", SECRET)
+
+    def no_stripe(*args, **kwargs):
+        raise AssertionError("verification must not call Stripe")
+
+    monkeypatch.setattr(payment_service.get_stripe().checkout.Session, "retrieve", no_stripe)
+    app = FastAPI()
+    app.include_router(payments.router, prefix="/payments")
+    app.dependency_overrides[get_payment_store] = lambda: store
+    async with httpx.AsyncClient(app=app, base_url="http://test") as http:
+        yield http, store
+
+
+@pytest.mark.asyncio
+async def test_webhook_records_payment_once_and_feeds_verification(client):
+    http, store = client
+    assert (await http.get("/payments/verify/cs_1")).status_code == 404
+
+    payload, headers = signed(session_event("evt_1", "cs_1"))
+    first = await http.post("/payments/webhook", content=payload, headers=headers)
+    again = await http.post("/payments/webhook", content=payload, headers=headers)
+    assert first.json() == {"received": True, "duplicate": False}
+    assert again.json() == {"received": True, "duplicate": True}
+
+    payload, headers = signed(session_event("evt_2", "cs_2", amount=500))
+    await http.post("/payments/webhook", content=payload, headers=headers)
+    payload, headers = signed(session_event("evt_3", "cs_3", status="unpaid"))
+    await http.post("/payments/webhook", content=payload, headers=headers)
+
+    verified = await http.get("/payments/verify/cs_1")
+    assert verified.status_code == 200
+    assert verified.json()["amount"] == 15.0 and verified.json()["client_id"] == "client-1"
+    assert (await http.get("/payments/verify/cs_3")).status_code == 404
+    assert await store.revenue() == {"usd": 20.0}
+    assert (await admin_service.get_admin_stats_summary(store)).total_revenue == {"usd": 20.0}
+
+
+@pytest.mark.asyncio
+async def test_workers_share_the_idempotency_table(database):
+    first, second = worker(database), worker(database)
+    assert await first.record_event(session_event("evt_1", "cs_1")) is True
+    assert await second.record_event(session_event("evt_1", "cs_1")) is False
+    assert await second.get_payment("cs_1") == await first.get_payment("cs_1")
+    # The same session paid through a second event type counts once.
+    succeeded = {**session_event("evt_2", "cs_1"), "type": "checkout.session.async_payment_succeeded"}
+    assert await second.record_event(succeeded) is True
+    assert await first.revenue() == {"usd": 15.0}
+    assert [payment["payment_id"] for payment in await second.list_payments()] == ["cs_1"]
+
+
+@pytest.mark.asyncio
+async def test_webhook_rejects_bad_signature(client):
+    http, store = client
+    payload, headers = signed(session_event("evt_1", "cs_1"))
+    headers["Stripe-Signature"] = headers["Stripe-Signature"][:-4] + "0000"
+    response = await http.post("/payments/webhook", content=payload, headers=headers)
+    assert response.status_code == 400
+    assert await store.list_payments() == []
+
+
+@pytest.mark.asyncio
+async def test_revenue_is_kept_per_currency_without_scanning_payments(database, monkeypatch):
+    store = worker(database)
+    await store.record_event(session_event("evt_1", "cs_1", amount=1500))
+    await store.record_event(session_event("evt_2", "cs_2", amount=700, currency="eur"))
+
+    def no_scan(*args, **kwargs):
+        raise AssertionError("revenue must come from the running totals")
+
+    monkeypatch.setattr(store.payments, "aggregate", no_scan)
+    assert await store.revenue() == {"usd": 15.0, "eur": 7.0}
+    # Totals that lost an increment are restored by a rebuild.
+    monkeypatch.undo()
+    await database.payment_totals.delete_many({})
+    assert await store.rebuild_revenue() == {"usd": 15.0, "eur": 7.0}
@@ -0,0 +1,45 @@
+import io
+import zipfile
+import pytest
+from concurrent.futures import ProcessPoolExecutor
+from apps.backend.services.pdf_export import stream_predictions_zip
+
+
+def make_prediction(index: int):
+    return {
+        "id": f"p{index}",
+        "name": f"Client {index}",
+        "birth_date": "1990-01-01",
+        "planetary_positions": [{"planet": "Sun", "longitude": 100.0 + index, "house": 1}],
+        "prediction_summary": f"Summary {index}",
+    }
+
+
+@pytest.mark.asyncio
+async def test_batch_export_streams_one_pdf_per_prediction():
+    predictions = [make_prediction(i) for i in range(6)]
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        chunks = [chunk async for chunk in stream_predictions_zip(predictions, pool=pool, max_in_flight=2)]
+
+    # The archive is emitted incrementally, not as one buffer at the end.
+    assert len([chunk for chunk in chunks if chunk]) > len(predictions)
+    archive = zipfile.ZipFile(io.BytesIO(b"".join(chunks)))
+    assert archive.testzip() is None
+    assert sorted(archive.namelist()) == sorted(f"prediction_p{i}.pdf" for i in range(6))
+    assert all(archive.read(name).startswith(b"%PDF") for name in archive.namelist())
+
+
+@pytest.mark.asyncio
+async def test_batch_export_route_requires_a_user_and_caps_the_batch():
+    import httpx
+    from app_factory import create_app
+    from apps.backend.models import PDF_EXPORT_MAX_ITEMS
+    from auth.dependencies import get_current_user
+
+    app = create_app()
+    async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+        body = {"prediction_ids": ["p1"]}
+        assert (await client.post("/api/kp-chart/pdf/batch", json=body)).status_code == 401
+        app.dependency_overrides[get_current_user] = lambda: None
+        too_many = {"prediction_ids": [f"p{i}" for i in range(PDF_EXPORT_MAX_ITEMS + 1)]}
+        assert (await client.post("/api/kp-chart/pdf/batch", json=too_many)).status_code == 422
@@ -0,0 +1,40 @@
+from pdf_generator import generate_prediction_pdf, render_prediction_pdf
+
+PLANETS = [
+    {"planet": name, "longitude": index * 37.5, "house": index % 12 + 1}
+    for index, name in enumerate(["Sun", "Moon", "Mars", "Mercury", "Jupiter", "Venus", "Saturn", "Rahu", "Ketu"])
+]
+
+
+def make_prediction(summary: str, **extra):
+    return {
+        "name": "Test Client",
+        "birth_date": "1990-01-01",
+        "planetary_positions": PLANETS,
+        "houses": list(range(1, 13)),
+        "prediction_summary": summary,
+        **extra,
+    }
+
+
+def page_count(pdf: bytes) -> int:
+    return pdf.count(b"/Type /Page\n")
+
+
+def test_long_summary_flows_onto_new_pages():
+    short = generate_prediction_pdf(make_prediction("Short summary."))
+    long = generate_prediction_pdf(make_prediction("A long reading of the chart. " * 2000))
+    assert page_count(short) == 1
+    assert page_count(long) > 1
+
+
+def test_static_layers_are_stored_once_per_document():
+    pdf = generate_prediction_pdf(make_prediction("A long reading of the chart. " * 2000, chart_style="north"))
+    assert page_count(pdf) > 1
+    # Header/footer chrome and both chart templates, regardless of the number of pages.
+    assert pdf.count(b"/Subtype /Form") == 3
+
+
+def test_render_cache_returns_same_bytes_for_same_content():
+    first = render_prediction_pdf(make_prediction("Cached summary."))
+    assert render_prediction_pdf(make_prediction("Cached summary.")) is first
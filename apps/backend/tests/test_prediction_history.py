@@ -0,0 +1,107 @@
+import httpx
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+from app.prediction_history import PredictionHistory
+from app.routes import PREDICTION_ID_ATTEMPTS
+from app_factory import create_app
+from db.mongo import ensure_indexes
+from dependencies import get_prediction_history
+
+
+@pytest.fixture
+def database():
+    return AsyncMongoMockClient()["test"]
+
+
+def worker(database, **kwargs):
+    return PredictionHistory(database.prediction_history, database.counters, **kwargs)
+
+
+def entry(user_id, n):
+    return {"prediction_id": f"CLASH{user_id}-{n}", "user_id": user_id, "role": "client"}
+
+
+@pytest.mark.asyncio
+async def test_running_numbers_are_shared_by_workers(database):
+    first, second = worker(database), worker(database)
+    numbers = [await first.next_sequence("7", "client"), await second.next_sequence("7", "client"),
+               await first.next_sequence("7", "client"), await first.next_sequence("7", "astrologer")]
+    assert numbers == [1, 2, 3, 1]
+
+
+@pytest.mark.asyncio
+async def test_pages_come_from_the_buffer_then_the_database(database):
+    history = worker(database, recent_per_user=5)
+    for n in range(1, 13):
+        await history.append(entry("7", n))
+
+    pages, cursor = [], None
+    while True:
+        page, cursor = await history.page("7", 4, cursor)
+        pages.append([item["prediction_id"] for item in page])
+        if cursor is None:
+            break
+    assert pages == [[f"CLASH7-{n}" for n in range(first, first - 4, -1)] for first in (12, 8, 4)]
+    assert len(history._recent["7"].entries) == 5
+
+    await history.append(entry("7", 13))
+    page, _ = await history.page("7", 2)
+    assert [item["prediction_id"] for item in page] == ["CLASH7-13", "CLASH7-12"]
+    with pytest.raises(ValueError):
+        await history.page("7", 2, "not-a-cursor")
+
+
+@pytest.mark.asyncio
+async def test_cached_users_are_bounded(database):
+    history = worker(database, recent_per_user=2, cached_users=3)
+    for user_id in "abcde":
+        await history.append(entry(user_id, 1))
+        await history.page(user_id, 10)
+    assert list(history._recent) == ["c", "d", "e"]
+    page, cursor = await history.page("a", 10)
+    assert [item["prediction_id"] for item in page] == ["CLASHa-1"] and cursor is None
+
+
+@pytest.mark.asyncio
+async def test_history_endpoint_pages_with_cursor_header(database):
+    app = create_app()
+    history = worker(database)
+    app.dependency_overrides[get_prediction_history] = lambda: history
+    async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+        for _ in range(3):
+            await client.post("/api/predict", json={"user_id": "7", "role": "client", "display_name": "Asha"})
+        first = await client.get("/api/predictions/7", params={"limit": 2})
+        second = await client.get("/api/predictions/7", params={"limit": 2, "before": first.headers["x-next-cursor"]})
+        assert (await client.get("/api/predictions/7", params={"before": "bad"})).status_code == 400
+    assert [item["prediction_id"] for item in first.json()] == ["CLASH7-3", "CLASH7-2"]
+    assert [item["prediction_id"] for item in second.json()] == ["CLASH7-1"]
+    assert "x-next-cursor" not in second.headers
+
+
+@pytest.mark.asyncio
+async def test_prediction_ids_are_unique_per_user(database):
+    await ensure_indexes(database)
+    app = create_app()
+    history = worker(database)
+    app.dependency_overrides[get_prediction_history] = lambda: history
+
+    async def predict(user_id, role="client"):
+        response = await client.post("/api/predict", json={"user_id": user_id, "role": role, "display_name": "Asha"})
+        return response.status_code, response.json().get("prediction_id") or response.json().get("detail")
+
+    async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+        for _ in range(10):
+            await predict("1")
+        # User "1" #11 and user "11" #1 used to both be CLASH111.
+        assert await predict("1") == (200, "CLASH1-11")
+        assert await predict("11") == (200, "CLASH11-1")
+        # Roles mapped to the same prefix share its sequence.
+        assert await predict("5", "admin") == (200, "OTASH5-1")
+        assert await predict("5", "guest") == (200, "OTASH5-2")
+
+        # An id taken outside the route is skipped rather than failing the insert.
+        await history.append({"prediction_id": "CLASH9-1", "user_id": "9", "role": "client"})
+        assert await predict("9") == (200, "CLASH9-2")
+        for n in range(3, 3 + PREDICTION_ID_ATTEMPTS):
+            await history.append({"prediction_id": f"CLASH9-{n}", "user_id": "9", "role": "client"})
+        assert await predict("9") == (409, "Could not allocate a unique prediction id")
@@ -0,0 +1,65 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from apps.backend import pdf_generator, storage
+from apps.backend.api.kp_chart import router
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "STORAGE_FILE", str(tmp_path / "predictions.json"))
+    app = FastAPI()
+    app.include_router(router, prefix="/kp-chart")
+    return TestClient(app)
+
+
+@pytest.fixture
+def prediction_id(client):
+    return storage.save_prediction({
+        "name": "Test Client",
+        "birth_date": "1990-01-01T00:00:00",
+        "planetary_positions": [{"planet": "Sun", "longitude": 100.0, "house": 1}],
+        "prediction_summary": "Summary",
+    })
+
+
+def test_unknown_prediction_is_404(client):
+    assert client.get("/kp-chart/pdf/missing").status_code == 404
+
+
+def test_pdf_is_validated_by_etag(client, prediction_id):
+    response = client.get(f"/kp-chart/pdf/{prediction_id}")
+    assert response.status_code == 200
+    assert response.content.startswith(b"%PDF")
+    assert response.headers["content-length"] == str(len(response.content))
+    assert response.headers["last-modified"]
+    etag = response.headers["etag"]
+
+    cached = client.get(f"/kp-chart/pdf/{prediction_id}", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert client.get(f"/kp-chart/pdf/{prediction_id}", headers={"If-None-Match": '"stale"'}).status_code == 200
+
+
+def test_new_renderer_version_invalidates_etags(client, prediction_id, monkeypatch):
+    etag = client.get(f"/kp-chart/pdf/{prediction_id}").headers["etag"]
+    monkeypatch.setattr(pdf_generator, "PDF_RENDERER_VERSION", "2")
+    response = client.get(f"/kp-chart/pdf/{prediction_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"].startswith('"2-')
+
+
+def test_pdf_supports_range_requests(client, prediction_id):
+    full = client.get(f"/kp-chart/pdf/{prediction_id}").content
+
+    partial = client.get(f"/kp-chart/pdf/{prediction_id}", headers={"Range": "bytes=10-99"})
+    assert partial.status_code == 206
+    assert partial.content == full[10:100]
+    assert partial.headers["content-range"] == f"bytes 10-99/{len(full)}"
+
+    suffix = client.get(f"/kp-chart/pdf/{prediction_id}", headers={"Range": "bytes=-20"})
+    assert suffix.content == full[-20:]
+
+    unsatisfiable = client.get(f"/kp-chart/pdf/{prediction_id}", headers={"Range": f"bytes={len(full)}-"})
+    assert unsatisfiable.status_code == 416
+    assert unsatisfiable.headers["content-range"] == f"bytes */{len(full)}"
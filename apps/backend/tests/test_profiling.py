@@ -0,0 +1,54 @@
+import time
+import httpx
+import pytest
+from fastapi import FastAPI
+from utils.profiling import ProfileStore, ProfilingMiddleware, SamplingProfiler, render_flamegraph_svg
+
+
+def busy_chart_math(seconds):
+    deadline = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < deadline:
+        total += sum(range(200))
+    return total
+
+
+def make_app(store, **options):
+    app = FastAPI()
+
+    @app.get("/charts/{chart_id}")
+    async def chart(chart_id: str):
+        return {"total": busy_chart_math(0.15)}
+
+    app.add_middleware(ProfilingMiddleware, profiler=SamplingProfiler(store, interval=0.002), **options)
+    return app
+
+
+@pytest.mark.asyncio
+async def test_header_token_profiles_request_under_route_template():
+    store = ProfileStore()
+    app = make_app(store, sample_rate=0.0, token="secret")
+    async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+        await client.get("/charts/1")
+        assert store.routes() == []
+        await client.get("/charts/2", headers={"X-Profile": "wrong"})
+        assert store.routes() == []
+        await client.get("/charts/3", headers={"X-Profile": "secret"})
+
+    [route] = store.routes()
+    assert route["route"] == "/charts/{chart_id}" and route["requests"] == 1
+    folded = store.folded("/charts/{chart_id}")
+    hot = sum(count for stack, count in folded.items() if "busy_chart_math" in stack)
+    assert hot >= 0.5 * sum(folded.values())
+    svg = render_flamegraph_svg(folded, "/charts/{chart_id}")
+    assert svg.startswith("<svg") and "busy_chart_math" in svg
+
+
+@pytest.mark.asyncio
+async def test_sample_rate_selects_requests():
+    store = ProfileStore()
+    app = make_app(store, sample_rate=1.0)
+    async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+        await client.get("/charts/1")
+        await client.get("/charts/2")
+    assert store.routes()[0]["requests"] == 2
@@ -0,0 +1,116 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from auth.utils import create_access_token
+from utils.rate_limit import RATE_LIMIT_DECISIONS, MemoryRateLimitBackend, RateLimitMiddleware, RateLimitRule
+
+
+class BrokenBackend:
+    async def hit(self, key, limit, window):
+        raise ConnectionError("shared store unavailable")
+
+
+def make_client(rules, backend=None, trust_proxy=0):
+    app = FastAPI()
+
+    @app.post("/auth/login")
+    async def login():
+        return {"ok": True}
+
+    @app.post("/api/predict")
+    async def predict():
+        return {"ok": True}
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    app.add_middleware(RateLimitMiddleware, rules=rules, backend=backend or MemoryRateLimitBackend(), enabled=True,
+                       trust_proxy=trust_proxy)
+    return TestClient(app)
+
+
+def test_ip_limit_rejects_excess_requests_with_retry_after():
+    client = make_client([RateLimitRule("auth", ("/auth/login",), limit=3)])
+    before = RATE_LIMIT_DECISIONS.value(rule="auth", scope="ip", decision="limited")
+    assert [client.post("/auth/login").status_code for _ in range(3)] == [200, 200, 200]
+    response = client.post("/auth/login")
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    assert RATE_LIMIT_DECISIONS.value(rule="auth", scope="ip", decision="limited") == before + 1
+    # Unmatched routes are never counted.
+    assert client.get("/health").status_code == 200
+
+
+def test_user_limit_is_tracked_per_token_subject():
+    client = make_client([RateLimitRule("predict", ("/api/predict",), limit=2, scope="user")])
+    alice = {"Authorization": f"Bearer {create_access_token({'sub': 'alice'})}"}
+    bob = {"Authorization": f"Bearer {create_access_token({'sub': 'bob'})}"}
+    assert client.post("/api/predict", headers=alice).status_code == 200
+    assert client.post("/api/predict", headers=alice).status_code == 200
+    assert client.post("/api/predict", headers=alice).status_code == 429
+    assert client.post("/api/predict", headers=bob).status_code == 200
+    # Anonymous requests are not subject to user-scoped rules.
+    assert client.post("/api/predict").status_code == 200
+
+
+def test_shared_backend_failure_falls_back_to_local_counters():
+    client = make_client([RateLimitRule("auth", ("/auth/login",), limit=1)], backend=BrokenBackend())
+    assert client.post("/auth/login").status_code == 200
+    assert client.post("/auth/login").status_code == 429
+
+
+def test_default_rules_cover_the_costly_routes_of_the_app():
+    from app_factory import create_app
+    from utils.rate_limit import RATE_LIMIT_PREDICT_PER_MINUTE
+
+    costly = ["/predict", "/api/predict", "/api/kp-chart/", "/api/kp-chart/pdf/batch", "/api/chat"]
+    served = {route.path for route in create_app().routes if "POST" in getattr(route, "methods", ())}
+    assert set(costly) <= served
+    for path in costly:
+        client = TestClient(create_app())
+        statuses = [client.post(path, json={}).status_code for _ in range(RATE_LIMIT_PREDICT_PER_MINUTE + 1)]
+        assert 429 not in statuses[:-1] and statuses[-1] == 429, path
+
+
+def test_unsigned_tokens_are_keyed_by_ip():
+    from jose import jwt
+
+    client = make_client([RateLimitRule("predict", ("/api/predict",), limit=2, scope="user")])
+    alice = {"Authorization": f"Bearer {create_access_token({'sub': 'alice'})}"}
+    forged = [{"Authorization": f"Bearer {jwt.encode({'sub': subject}, 'not-the-secret')}"} for subject in ("alice", "x", "y")]
+    # Forged tokens neither spend alice's quota nor escape the limit by rotating subjects.
+    assert [client.post("/api/predict", headers=headers).status_code for headers in forged] == [200, 200, 429]
+    assert client.post("/api/predict", headers=alice).status_code == 200
+
+
+def test_spoofed_forwarded_entries_share_the_proxy_reported_bucket():
+    rule = RateLimitRule("auth", ("/auth/login",), limit=2)
+    client = make_client([rule])
+    one_proxy = make_client([rule], trust_proxy=1)
+    codes = [
+        one_proxy.post("/auth/login", headers={"X-Forwarded-For": f"10.9.9.{n}, 203.0.113.7"}).status_code
+        for n in range(3)
+    ]
+    assert codes == [200, 200, 429]
+    assert one_proxy.post("/auth/login", headers={"X-Forwarded-For": "203.0.113.8"}).status_code == 200
+
+    two_proxies = make_client([rule], trust_proxy=2)
+    codes = [
+        two_proxies.post("/auth/login", headers={"X-Forwarded-For": f"10.9.9.{n}, 203.0.113.7, 10.0.0.2"}).status_code
+        for n in range(3)
+    ]
+    assert codes == [200, 200, 429]
+    # Without a trusted proxy the header is ignored altogether.
+    assert [client.post("/auth/login", headers={"X-Forwarded-For": f"10.9.9.{n}"}).status_code for n in range(3)] == [200, 200, 429]
+
+
+@pytest.mark.asyncio
+async def test_full_memory_backend_evicts_least_recently_hit_windows():
+    backend = MemoryRateLimitBackend(max_keys=3)
+    for key in ("a", "b", "c", "a"):
+        await backend.hit(key, 2, 60)
+    await backend.hit("d", 2, 60)
+    assert list(backend._windows) == ["c", "a", "d"]
+    # a kept its count instead of being reset with everything else.
+    assert not (await backend.hit("a", 2, 60)).allowed
@@ -0,0 +1,115 @@
+import pytest
+from datetime import datetime, timedelta
+from auth.revocation import BloomFilter, TokenRevocationStore, token_key
+from auth.utils import create_access_token
+
+
+class FakeCollection:
+    """Minimal async stand-in for the Motor collection used by the store."""
+
+    def __init__(self):
+        self.docs = {}
+        self.find_one_calls = 0
+
+    async def create_index(self, *args, **kwargs):
+        return "exp_1"
+
+    async def update_one(self, query, update, upsert=False):
+        self.docs.setdefault(query["_id"], {"_id": query["_id"]}).update(update["$set"])
+
+    async def find_one(self, query, projection=None):
+        self.find_one_calls += 1
+        return self.docs.get(query["_id"])
+
+    def _live(self, query):
+        cutoff = query["exp"]["$gt"]
+        return [doc for doc in self.docs.values() if doc["exp"] > cutoff]
+
+    async def count_documents(self, query):
+        return len(self._live(query))
+
+    async def _iterate(self, docs):
+        for doc in docs:
+            yield doc
+
+    def find(self, query, projection=None):
+        return self._iterate(self._live(query))
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(1000, 0.001)
+    keys = [token_key(f"token-{i}") for i in range(1000)]
+    for key in keys:
+        bloom.add(key)
+    assert all(key in bloom for key in keys)
+    false_positives = sum(token_key(f"other-{i}") in bloom for i in range(10000))
+    assert false_positives < 50
+
+
+@pytest.mark.asyncio
+async def test_revoked_token_is_rejected_and_valid_tokens_skip_the_db():
+    collection = FakeCollection()
+    store = TokenRevocationStore(collection, sync_interval=3600)
+    revoked = create_access_token({"sub": "revoked-user"})
+    valid = create_access_token({"sub": "valid-user"})
+
+    await store.revoke(revoked)
+    assert await store.is_revoked(revoked)
+
+    calls_before = collection.find_one_calls
+    for _ in range(100):
+        assert not await store.is_revoked(valid)
+    assert collection.find_one_calls == calls_before
+
+
+@pytest.mark.asyncio
+async def test_sync_picks_up_revocations_from_other_workers():
+    collection = FakeCollection()
+    worker_a = TokenRevocationStore(collection, sync_interval=0)
+    worker_b = TokenRevocationStore(collection, sync_interval=0)
+    token = create_access_token({"sub": "user"}, expires_delta=timedelta(minutes=5))
+
+    assert not await worker_b.is_revoked(token)
+    exp = await worker_a.revoke(token)
+    assert exp > datetime.utcnow()
+
+    await worker_b.sync()
+    assert await worker_b.is_revoked(token)
+
+
+class UnavailableCollection(FakeCollection):
+    async def count_documents(self, query):
+        self.count_calls = getattr(self, "count_calls", 0) + 1
+        raise ConnectionError("mongo is down")
+
+
+@pytest.mark.asyncio
+async def test_failed_sync_fails_open_and_backs_off():
+    collection = UnavailableCollection()
+    store = TokenRevocationStore(collection, sync_interval=0, retry_interval=3600)
+    token = create_access_token({"sub": "user"})
+
+    for _ in range(10):
+        assert not await store.is_revoked(token)
+    assert collection.count_calls == 1
+
+
+@pytest.mark.asyncio
+async def test_get_current_admin_reads_the_role_from_the_stored_user(monkeypatch):
+    from fastapi import HTTPException
+    from mongomock_motor import AsyncMongoMockClient
+    from auth import dependencies
+
+    database = AsyncMongoMockClient()["test"]
+    monkeypatch.setattr(dependencies, "db", database)
+    monkeypatch.setattr(dependencies, "revocation_store", TokenRevocationStore(FakeCollection()))
+    user_id = (await database.users.insert_one({"email": "a@example.com", "name": "A", "role": "user"})).inserted_id
+    # The token still claims the admin role the user has been demoted from.
+    token = create_access_token({"sub": str(user_id), "role": "admin"})
+
+    with pytest.raises(HTTPException) as raised:
+        await dependencies.get_current_admin(await dependencies.get_current_user_document(token))
+    assert raised.value.status_code == 403
+    await database.users.update_one({"_id": user_id}, {"$set": {"role": "admin"}})
+    admin = await dependencies.get_current_admin(await dependencies.get_current_user_document(token))
+    assert admin.email == "a@example.com"
@@ -0,0 +1,117 @@
+import asyncio
+import json
+from datetime import datetime
+import httpx
+import pytest
+from fastapi import FastAPI
+import storage
+from services.kp_chart_service import calculate_kp_chart
+from utils import tracing
+from utils.tracing import BatchSpanProcessor, FileSpanExporter, OTLPSpanExporter, SimpleSpanProcessor, TracingMiddleware, span
+
+
+def read_spans(path):
+    with open(path) as f:
+        return {s["name"]: s for s in map(json.loads, f)}
+
+
+@pytest.fixture
+def trace_file(tmp_path, monkeypatch):
+    path = tmp_path / "traces.jsonl"
+    monkeypatch.setattr(tracing.tracer, "enabled", True)
+    monkeypatch.setattr(tracing.tracer, "sample_rate", 1.0)
+    monkeypatch.setattr(tracing.tracer, "processor", SimpleSpanProcessor(FileSpanExporter(str(path))))
+    monkeypatch.setattr(storage, "STORAGE_FILE", str(tmp_path / "predictions.json"))
+    return path
+
+
+def make_app():
+    app = FastAPI()
+
+    @app.post("/charts/{name}")
+    async def chart(name: str):
+        result = await asyncio.to_thread(calculate_kp_chart, name, datetime(1990, 1, 1))
+        with span("render", planets=len(result.planetary_positions)):
+            prediction_id = storage.save_prediction(result.model_dump())
+        return {"id": prediction_id}
+
+    app.add_middleware(TracingMiddleware)
+    return app
+
+
+@pytest.mark.asyncio
+async def test_request_spans_nest_under_route_root(trace_file):
+    async with httpx.AsyncClient(app=make_app(), base_url="http://test") as client:
+        response = await client.post("/charts/asha")
+    assert response.status_code == 200
+
+    spans = read_spans(trace_file)
+    root = spans["POST /charts/{name}"]
+    chart, render, save = spans["kp_chart.calculate"], spans["render"], spans["storage.save_prediction"]
+    assert root["parent_id"] is None and root["attributes"]["http.status_code"] == 200
+    # The chart runs on a worker thread and still joins the request's trace.
+    assert chart["parent_id"] == root["span_id"]
+    assert render["parent_id"] == root["span_id"] and save["parent_id"] == render["span_id"]
+    assert {s["trace_id"] for s in spans.values()} == {root["trace_id"]}
+    assert root["duration_ms"] >= chart["duration_ms"]
+    assert response.headers["traceparent"] == f"00-{root['trace_id']}-{root['span_id']}-01"
+
+
+@pytest.mark.asyncio
+async def test_incoming_traceparent_is_continued(trace_file):
+    trace_id, parent_id = "4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7"
+    async with httpx.AsyncClient(app=make_app(), base_url="http://test") as client:
+        await client.post("/charts/asha", headers={"traceparent": f"00-{trace_id}-{parent_id}-01"})
+        # Unsampled callers are not recorded.
+        await client.post("/charts/ravi", headers={"traceparent": f"00-{'1' * 32}-{parent_id}-00"})
+
+    spans = read_spans(trace_file)
+    assert spans["POST /charts/{name}"]["trace_id"] == trace_id
+    assert spans["POST /charts/{name}"]["parent_id"] == parent_id
+    assert {s["trace_id"] for s in spans.values()} == {trace_id}
+
+
+def test_errors_are_recorded_and_reraised(trace_file):
+    with pytest.raises(ValueError):
+        with span("lookup", city="Chennai"):
+            raise ValueError("no such city")
+    [recorded] = read_spans(trace_file).values()
+    assert recorded["status"] == "error" and recorded["error"] == "ValueError: no such city"
+    assert recorded["attributes"] == {"city": "Chennai"}
+
+
+def test_disabled_tracer_records_nothing(trace_file, monkeypatch):
+    monkeypatch.setattr(tracing.tracer, "enabled", False)
+    calculate_kp_chart("asha", datetime(1990, 1, 1))
+    with span("noop") as s:
+        s.set_attribute("ignored", True)
+    assert not trace_file.exists()
+
+
+def test_batch_processor_exports_in_background_and_drops_when_full(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    processor = BatchSpanProcessor(FileSpanExporter(str(path)), max_queue_size=4, interval=60)
+    tracer = tracing.Tracer(processor, enabled=True)
+    for i in range(6):
+        with tracer.span(f"op{i}"):
+            pass
+    processor.force_flush()
+    assert sorted(read_spans(path)) == ["op0", "op1", "op2", "op3"]
+    assert processor.dropped == 2
+    processor.shutdown()
+
+
+def test_otlp_payload_encoding():
+    tracer = tracing.Tracer(enabled=True)
+    with tracer.span("outer") as outer:
+        with tracer.span("inner", rows=3, cached=False) as inner:
+            pass
+    payload = json.loads(OTLPSpanExporter(service_name="svc")._encode([inner, outer]))
+    [resource] = payload["resourceSpans"]
+    assert resource["resource"]["attributes"] == [{"key": "service.name", "value": {"stringValue": "svc"}}]
+    encoded_inner, encoded_outer = resource["scopeSpans"][0]["spans"]
+    assert encoded_inner["parentSpanId"] == encoded_outer["spanId"] and "parentSpanId" not in encoded_outer
+    assert encoded_inner["attributes"] == [
+        {"key": "rows", "value": {"intValue": "3"}},
+        {"key": "cached", "value": {"boolValue": False}},
+    ]
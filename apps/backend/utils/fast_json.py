@@ -0,0 +1,47 @@
+"""
+orjson-backed JSON encoding for the API.
+
+`ORJSONResponse` is the app's default response class. It encodes datetimes,
+UUIDs, dataclasses and NumPy arrays natively, and Pydantic models through
+`model_dump()`, several times faster than the stdlib encoder.
+
+Routes that return objects the backend built itself (not echoed user input)
+can return `ORJSONResponse(obj)` directly: FastAPI then skips response_model
+validation and jsonable_encoder, while the response_model declared on the
+route still documents the schema. Payloads that are served repeatedly can be
+encoded once with `dumps()`, kept as `EncodedJSON` and sent without
+re-encoding.
+"""
+from decimal import Decimal
+from typing import Any, Callable
+import orjson
+from pydantic import BaseModel
+from starlette.responses import JSONResponse
+
+# Aware UTC datetimes as "...Z", matching Pydantic's JSON output
+OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z
+
+
+def _default(obj: Any):
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj: Any, default: Callable[[Any], Any] = _default) -> bytes:
+    return orjson.dumps(obj, default=default, option=OPTIONS)
+
+
+class EncodedJSON(bytes):
+    """A JSON document already encoded by `dumps()`; responses send it as is."""
+
+
+class ORJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, EncodedJSON):
+            return bytes(content)
+        return dumps(content)
@@ -1,38 +1,61 @@
 import os
-import firebase_admin
-from firebase_admin import credentials, firestore, auth
 import json
-from pathlib import Path
+from functools import lru_cache
 
 # Path to service account key file
 SERVICE_ACCOUNT_PATH = os.getenv("FIREBASE_SERVICE_ACCOUNT_FILE", "serviceAccountKey.json")
 
-# Initialize Firebase Admin SDK
-if not firebase_admin._apps:
-    # Check if using environment variable for Render deployment
+# firebase_admin and the Firestore client libraries are imported inside the
+# accessors below: they take several hundred milliseconds to import, and the
+# app is initialised on first use instead of when this module is imported.
+
+@lru_cache(maxsize=1)
+def get_firebase_app():
+    """
+    Initialise the Firebase Admin SDK once per process.
+
+    Credentials come from FIREBASE_SERVICE_ACCOUNT_JSON (Render), the service
+    account file for local development, or Application Default Credentials on
+    Google Cloud.
+    """
+    import firebase_admin
+    from firebase_admin import credentials
+
+    try:
+        return firebase_admin.get_app()
+    except ValueError:
+        pass
     key_json = os.getenv("FIREBASE_SERVICE_ACCOUNT_JSON")
-    
     if key_json:
-        # For production (Render)
-        import tempfile
-        with tempfile.NamedTemporaryFile(mode='w+', suffix='.json') as temp:
-            temp.write(key_json)
-            temp.flush()
-            cred = credentials.Certificate(temp.name)
-            firebase_admin.initialize_app(cred)
+        cred = credentials.Certificate(json.loads(key_json))
+    elif os.path.exists(SERVICE_ACCOUNT_PATH):
+        cred = credentials.Certificate(SERVICE_ACCOUNT_PATH)
     else:
-        # For local development
-        if os.path.exists(SERVICE_ACCOUNT_PATH):
-            cred = credentials.Certificate(SERVICE_ACCOUNT_PATH)
-            firebase_admin.initialize_app(cred)
-        else:
-            raise FileNotFoundError(
-                f"Firebase service account file not found at {SERVICE_ACCOUNT_PATH}. "
-                "Please set FIREBASE_SERVICE_ACCOUNT_JSON environment variable or place the service account file."
-            )
+        cred = credentials.ApplicationDefault()
+    return firebase_admin.initialize_app(cred)
 
-# Firestore client
-db = firestore.client()
+@lru_cache(maxsize=1)
+def get_firestore_client():
+    """Shared synchronous Firestore client."""
+    from firebase_admin import firestore
+    return firestore.client(get_firebase_app())
+
+@lru_cache(maxsize=1)
+def get_async_firestore_client():
+    """Shared asyncio Firestore client, for use from request handlers."""
+    from firebase_admin import firestore_async
+    return firestore_async.client(get_firebase_app())
+
+def server_timestamp():
+    """Firestore sentinel replaced by the commit time on the server."""
+    from firebase_admin import firestore
+    return firestore.SERVER_TIMESTAMP
+
+def __getattr__(name):
+    # `from utils.firebase_utils import db` keeps working, resolving the client on first access.
+    if name == "db":
+        return get_firestore_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def verify_token(token: str):
     """
@@ -44,16 +67,13 @@ def verify_token(token: str):
     Returns:
         dict: Decoded token claims if valid, None otherwise
     """
+    from firebase_admin import auth
     try:
-        return auth.verify_id_token(token)
+        return auth.verify_id_token(token, app=get_firebase_app())
     except Exception as e:
         print(f"Error verifying token: {e}")
         return None
 
-# Get Firestore client
-def get_firestore_client():
-    return db
-
 # Example CRUD operations
 async def get_document(collection: str, doc_id: str):
     db = get_firestore_client()
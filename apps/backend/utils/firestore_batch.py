@@ -0,0 +1,106 @@
+import asyncio
+import logging
+import os
+from typing import Any, List, Optional, Tuple
+from utils.tracing import span
+
+logger = logging.getLogger(__name__)
+
+FIRESTORE_BATCH_FLUSH_SECONDS = float(os.getenv("FIRESTORE_BATCH_FLUSH_SECONDS", "0.05"))
+# Firestore rejects batches with more than 500 writes.
+FIRESTORE_MAX_BATCH_SIZE = 500
+
+
+class FirestoreBatchWriter:
+    """
+    Coalesces document writes into WriteBatch commits.
+
+    Writes are buffered and committed together every `flush_interval` seconds, or
+    straight away once a full batch is waiting. Document ids are assigned on the
+    client, so callers that do not need durability can return without waiting for
+    the commit; failures of such writes are logged.
+    """
+
+    def __init__(
+        self,
+        client,
+        flush_interval: float = FIRESTORE_BATCH_FLUSH_SECONDS,
+        max_batch_size: int = FIRESTORE_MAX_BATCH_SIZE,
+    ):
+        self.client = client
+        self.flush_interval = flush_interval
+        self.max_batch_size = min(max_batch_size, FIRESTORE_MAX_BATCH_SIZE)
+        self._pending: List[Tuple[Any, dict, Optional[asyncio.Future]]] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._full: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+
+    async def set(self, ref, data: dict, wait: bool = False):
+        """
+        Queue `ref.set(data)`. With `wait=True`, returns once the write is committed
+        and raises if the commit failed.
+        """
+        if self._task is None or self._task.done():
+            self._wakeup, self._full = asyncio.Event(), asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+        future = asyncio.get_running_loop().create_future() if wait else None
+        self._pending.append((ref, data, future))
+        self._wakeup.set()
+        if len(self._pending) >= self.max_batch_size:
+            self._full.set()
+        if future is not None:
+            await future
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            try:
+                await asyncio.wait_for(self._full.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            self._full.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                # flush() settles every write it takes; keep the task alive for the next ones.
+                logger.error(f"Firestore batch flush failed: {e}", exc_info=True)
+            if self._closing:
+                return
+
+    async def flush(self):
+        while self._pending:
+            writes = self._pending[:self.max_batch_size]
+            del self._pending[:self.max_batch_size]
+            try:
+                # The client is built on first use, so batch() can fail too (e.g. Firebase not configured).
+                batch = self.client.batch()
+                for ref, data, _ in writes:
+                    batch.set(ref, data)
+                # The flush task outlives the request that started it, so commits are traced as their own roots.
+                with span("firestore.batch_commit", root=True, writes=len(writes)):
+                    await batch.commit()
+            except Exception as e:
+                logger.error(f"Firestore batch of {len(writes)} writes failed: {e}")
+                for _, _, future in writes:
+                    if future is not None and not future.done():
+                        future.set_exception(e)
+                continue
+            for _, _, future in writes:
+                if future is not None and not future.done():
+                    future.set_result(None)
+
+    async def close(self):
+        """
+        Commit everything still buffered and stop the flush task.
+        """
+        if self._task is not None:
+            # Let the task finish any commit in flight rather than cancelling it mid-batch.
+            self._closing = True
+            self._wakeup.set()
+            self._full.set()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+            self._closing = False
+        await self.flush()
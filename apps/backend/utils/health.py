@@ -0,0 +1,49 @@
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, Optional, Tuple
+
+HEALTH_CHECK_CACHE_SECONDS = float(os.getenv("HEALTH_CHECK_CACHE_SECONDS", "10"))
+HEALTH_CHECK_TIMEOUT_SECONDS = float(os.getenv("HEALTH_CHECK_TIMEOUT_SECONDS", "2"))
+
+
+class CachedProbe:
+    """
+    Runs a dependency check at most once per `ttl` seconds. Concurrent callers
+    share the in-flight check, so a burst of health probes costs one round trip.
+    """
+
+    def __init__(
+        self,
+        check: Callable[[], Awaitable],
+        ttl: float = HEALTH_CHECK_CACHE_SECONDS,
+        timeout: float = HEALTH_CHECK_TIMEOUT_SECONDS,
+    ):
+        self.check = check
+        self.ttl = ttl
+        self.timeout = timeout
+        self._result: Optional[Tuple[bool, Optional[str]]] = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def _fresh(self) -> bool:
+        return self._result is not None and time.monotonic() - self._checked_at < self.ttl
+
+    async def __call__(self) -> Tuple[bool, Optional[str]]:
+        """
+        Returns (healthy, error message).
+        """
+        if self._fresh():
+            return self._result
+        async with self._lock:
+            if self._fresh():
+                return self._result
+            try:
+                await asyncio.wait_for(self.check(), self.timeout)
+                self._result = (True, None)
+            except asyncio.TimeoutError:
+                self._result = (False, f"check timed out after {self.timeout}s")
+            except Exception as e:
+                self._result = (False, str(e))
+            self._checked_at = time.monotonic()
+            return self._result
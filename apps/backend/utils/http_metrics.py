@@ -0,0 +1,95 @@
+import time
+from typing import Dict, Optional
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from utils.metrics import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
+
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+http_requests = REGISTRY.counter(
+    "http_requests_total", "HTTP requests by route template and status", ("method", "route", "status")
+)
+http_request_seconds = REGISTRY.histogram(
+    "http_request_duration_seconds", "Time until the response body was fully sent", ("method", "route")
+)
+http_requests_in_progress = REGISTRY.gauge(
+    "http_requests_in_progress", "HTTP requests currently being served", ("method",)
+)
+http_request_bytes = REGISTRY.histogram(
+    "http_request_size_bytes", "Request body sizes", ("method", "route"), buckets=SIZE_BUCKETS
+)
+http_response_bytes = REGISTRY.histogram(
+    "http_response_size_bytes", "Response body sizes", ("method", "route"), buckets=SIZE_BUCKETS
+)
+
+# Requests that matched no route share one label so scanners cannot blow up cardinality.
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+def route_template(scope: Scope) -> str:
+    """
+    Path template of the route that served the request, e.g. /kp-chart/pdf/{prediction_id}.
+    The router records the matched endpoint in the scope; templates are looked up once per app.
+    """
+    endpoint = scope.get("endpoint")
+    app = scope.get("app")
+    if endpoint is None or app is None:
+        return UNMATCHED_ROUTE
+    templates: Optional[Dict] = getattr(app.state, "_route_templates", None) if hasattr(app, "state") else None
+    if templates is None or endpoint not in templates:
+        templates = {}
+        for route in getattr(app, "routes", []):
+            route_endpoint = getattr(route, "endpoint", None) or getattr(route, "app", None)
+            templates.setdefault(route_endpoint, getattr(route, "path", UNMATCHED_ROUTE))
+        app.state._route_templates = templates
+    return templates.get(endpoint, UNMATCHED_ROUTE)
+
+
+class PrometheusMiddleware:
+    """
+    Pure ASGI middleware recording per-route request counts, latency, in-flight
+    requests and payload sizes. Streaming responses are timed until their last chunk.
+    """
+
+    def __init__(self, app: ASGIApp, skip_paths=("/metrics",)):
+        self.app = app
+        self.skip_paths = set(skip_paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"] in self.skip_paths:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        started = time.perf_counter()
+        sizes = {"request": 0, "response": 0}
+        status = ["500"]
+
+        async def counting_receive() -> Message:
+            message = await receive()
+            if message["type"] == "http.request":
+                sizes["request"] += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message: Message):
+            if message["type"] == "http.response.start":
+                status[0] = str(message["status"])
+            elif message["type"] == "http.response.body":
+                sizes["response"] += len(message.get("body", b""))
+            await send(message)
+
+        http_requests_in_progress.inc(method=method)
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            http_requests_in_progress.dec(method=method)
+            route = route_template(scope)
+            http_requests.inc(method=method, route=route, status=status[0])
+            http_request_seconds.observe(time.perf_counter() - started, method=method, route=route)
+            http_request_bytes.observe(sizes["request"], method=method, route=route)
+            http_response_bytes.observe(sizes["response"], method=method, route=route)
+
+
+async def metrics_endpoint():
+    """Prometheus scrape endpoint."""
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
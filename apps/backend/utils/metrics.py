@@ -0,0 +1,189 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Tuple
+
+CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Counter:
+    """Monotonic counter with optional labels, safe to bump from any thread."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        return self._values.get(key, 0)
+
+    def collect(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [(dict(zip(self.labelnames, key)), value) for key, value in items]
+
+
+class Gauge:
+    """Value that can go up and down, e.g. requests currently in flight."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = value
+
+    def value(self, **labels) -> float:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        return self._values.get(key, 0)
+
+    def collect(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [(dict(zip(self.labelnames, key)), value) for key, value in items]
+
+
+class Histogram:
+    """Cumulative-bucket histogram of observations such as request latencies in seconds."""
+
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> (count per bucket, sum, count)
+        self._values: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def count(self, **labels) -> int:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        entry = self._values.get(key)
+        return entry[2] if entry else 0
+
+    def collect(self):
+        with self._lock:
+            items = [(key, (list(entry[0]), entry[1], entry[2])) for key, entry in self._values.items()]
+        return [(dict(zip(self.labelnames, key)), value) for key, value in items]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = Histogram.DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def collect(self):
+        with self._lock:
+            return list(self._metrics.values())
+
+
+REGISTRY = Registry()
+
+# One counter for every in-process cache, told apart by the `cache` label.
+cache_requests = REGISTRY.counter("cache_requests_total", "Lookups in in-process caches", ("cache", "result"))
+
+
+@contextmanager
+def timed(histogram: Histogram, **labels):
+    """Observe the wall time of the enclosed block, in seconds."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - started, **labels)
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def generate_latest(registry: Registry = REGISTRY) -> str:
+    """Render every registered metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in registry.collect():
+        kind = {Counter: "counter", Gauge: "gauge", Histogram: "histogram"}[type(metric)]
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {kind}")
+        for labels, value in metric.collect():
+            if kind != "histogram":
+                lines.append(f"{metric.name}{_format_labels(labels)} {_format_value(value)}")
+                continue
+            buckets, total, count = value
+            for bound, bucket_count in zip(metric.buckets, buckets):
+                lines.append(f"{metric.name}_bucket{_format_labels({**labels, 'le': _format_value(bound)})} {bucket_count}")
+            lines.append(f"{metric.name}_bucket{_format_labels({**labels, 'le': '+Inf'})} {count}")
+            lines.append(f"{metric.name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{metric.name}_count{_format_labels(labels)} {count}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,78 @@
+"""
+`Accept`-negotiated responses: JSON by default, MessagePack for clients that
+ask for it. MessagePack bodies are smaller than JSON for chart payloads (floats
+are 9 bytes instead of up to 20 characters) and faster to decode.
+"""
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Optional, Sequence
+import msgpack
+from pydantic import BaseModel
+from starlette.requests import Request
+from starlette.responses import Response
+from utils.fast_json import ORJSONResponse
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+# Registered name first; the other two are still common in the wild.
+MSGPACK_MEDIA_TYPES = (MSGPACK_MEDIA_TYPE, "application/x-msgpack", "application/vnd.msgpack")
+
+
+def _default(obj: Any):
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if hasattr(obj, "tolist"):  # NumPy arrays and scalars
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not MessagePack serializable")
+
+
+class MsgPackResponse(Response):
+    media_type = MSGPACK_MEDIA_TYPE
+
+    def render(self, content: Any) -> bytes:
+        return msgpack.packb(content, default=_default, use_bin_type=True)
+
+
+def preferred_media_type(request: Request, offered: Sequence[str]) -> Optional[str]:
+    """
+    The entry of `offered` the client's Accept header ranks highest, ties going
+    to the earlier entry. Media type parameters other than q are ignored. Returns
+    offered[0] when there is no Accept header or it accepts anything, and None
+    when nothing offered is acceptable.
+    """
+    accept = request.headers.get("accept")
+    if not accept:
+        return offered[0]
+    ranked = []
+    for position, item in enumerate(accept.split(",")):
+        media_type, *params = [part.strip() for part in item.split(";")]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            ranked.append((-quality, position, media_type.lower()))
+    for _, _, media_type in sorted(ranked):
+        if media_type in ("*/*", "application/*"):
+            return offered[0]
+        if media_type in offered:
+            return media_type
+    return None
+
+
+def negotiated_response(request: Request, content: Any, **kwargs) -> Response:
+    """JSON or MessagePack, whichever the client prefers."""
+    media_type = preferred_media_type(request, (JSON_MEDIA_TYPE, *MSGPACK_MEDIA_TYPES))
+    if media_type in MSGPACK_MEDIA_TYPES:
+        return MsgPackResponse(content, **kwargs)
+    return ORJSONResponse(content, **kwargs)
@@ -0,0 +1,214 @@
+import hmac
+import html
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter as StackCounter
+from typing import Dict, List, Optional
+from starlette.types import ASGIApp, Receive, Scope, Send
+from utils.http_metrics import route_template
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+# Fraction of requests profiled at random.
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "0.0"))
+PROFILING_INTERVAL_SECONDS = float(os.getenv("PROFILING_INTERVAL_SECONDS", "0.005"))
+# A request carrying `X-Profile: <token>` is always profiled; unset disables the header.
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN", "")
+PROFILING_HEADER = b"x-profile"
+PROFILING_MAX_STACKS_PER_ROUTE = int(os.getenv("PROFILING_MAX_STACKS_PER_ROUTE", "2000"))
+PROFILING_MAX_DEPTH = 64
+
+# Folded-stack frame recorded while the request is suspended, e.g. awaiting I/O.
+WAITING_FRAME = "<waiting>"
+TRUNCATED_FRAME = "<other>"
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class ProfileStore:
+    """Aggregated folded stacks per route, bounded in the number of distinct stacks."""
+
+    def __init__(self, max_stacks_per_route: int = PROFILING_MAX_STACKS_PER_ROUTE):
+        self.max_stacks_per_route = max_stacks_per_route
+        self._stacks: Dict[str, StackCounter] = {}
+        self._requests: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def add_request(self, route: str, samples: Dict[str, int]):
+        with self._lock:
+            self._requests[route] = self._requests.get(route, 0) + 1
+            stacks = self._stacks.setdefault(route, StackCounter())
+            for stack, count in samples.items():
+                if stack not in stacks and len(stacks) >= self.max_stacks_per_route:
+                    stack = TRUNCATED_FRAME
+                stacks[stack] += count
+
+    def routes(self) -> List[dict]:
+        with self._lock:
+            return [
+                {"route": route, "requests": self._requests.get(route, 0), "samples": sum(stacks.values())}
+                for route, stacks in sorted(self._stacks.items())
+            ]
+
+    def folded(self, route: str) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stacks.get(route, {}))
+
+    def clear(self):
+        with self._lock:
+            self._stacks.clear()
+            self._requests.clear()
+
+
+class ProfiledRequest:
+    def __init__(self, thread_id: int, marker):
+        self.thread_id = thread_id
+        self.marker = marker
+        self.samples = StackCounter()
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler for async requests. A single background thread wakes
+    every `interval` seconds while profiled requests are in flight and snapshots
+    the event loop thread's stack. A sample belongs to a request when that
+    request's middleware frame is on the stack; otherwise the request is
+    suspended and the sample is recorded as waiting. Work handed to executor
+    threads is not attributed.
+    """
+
+    def __init__(self, store: ProfileStore, interval: float = PROFILING_INTERVAL_SECONDS):
+        self.store = store
+        self.interval = interval
+        self._active: Dict[int, ProfiledRequest] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def begin(self, marker) -> ProfiledRequest:
+        request = ProfiledRequest(threading.get_ident(), marker)
+        with self._lock:
+            self._active[id(request)] = request
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+        return request
+
+    def end(self, request: ProfiledRequest, route: str):
+        with self._lock:
+            self._active.pop(id(request), None)
+        self.store.add_request(route, request.samples)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._active:
+                    self._wakeup.clear()
+            self._wakeup.wait()
+            frames = sys._current_frames()
+            with self._lock:
+                for request in self._active.values():
+                    request.samples[self._fold(frames.get(request.thread_id), request.marker)] += 1
+            time.sleep(self.interval)
+
+    @staticmethod
+    def _fold(frame, marker) -> str:
+        stack = []
+        while frame is not None and frame is not marker:
+            stack.append(frame)
+            frame = frame.f_back
+        if frame is None or not stack:
+            return WAITING_FRAME
+        # Keep the outermost frames when the stack is deeper than the limit.
+        return ";".join(_frame_label(f) for f in reversed(stack[-PROFILING_MAX_DEPTH:]))
+
+
+class ProfilingMiddleware:
+    """
+    Profiles a sampled fraction of requests, or any request presenting the
+    profiling token in the X-Profile header. Only installed when PROFILING_ENABLED
+    is set, so it adds nothing to the request path otherwise.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        profiler: Optional[SamplingProfiler] = None,
+        sample_rate: float = PROFILING_SAMPLE_RATE,
+        token: str = PROFILING_TOKEN,
+    ):
+        self.app = app
+        self.profiler = profiler or default_profiler
+        self.sample_rate = sample_rate
+        self.token = token.encode()
+
+    def _wants_profile(self, scope: Scope) -> bool:
+        if self.token:
+            for name, value in scope.get("headers", []):
+                if name == PROFILING_HEADER and hmac.compare_digest(value, self.token):
+                    return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not self._wants_profile(scope):
+            await self.app(scope, receive, send)
+            return
+        request = self.profiler.begin(sys._getframe())
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            # Samples are attributed once routing has resolved the route template.
+            self.profiler.end(request, route_template(scope))
+
+
+def render_flamegraph_svg(folded: Dict[str, int], title: str, width: int = 1200, frame_height: int = 16) -> str:
+    """Render folded stacks as a static SVG flame graph, widest (most sampled) frames at the bottom."""
+    root = {"children": {}, "value": 0}
+    for stack, count in folded.items():
+        node = root
+        node["value"] += count
+        for frame in stack.split(";"):
+            node = node["children"].setdefault(frame, {"children": {}, "value": 0})
+            node["value"] += count
+
+    def depth(node) -> int:
+        return 1 + max((depth(child) for child in node["children"].values()), default=0)
+
+    total = root["value"] or 1
+    height = (depth(root) + 1) * frame_height + 24
+    rects = []
+
+    def draw(node, x: float, level: int):
+        for name, child in sorted(node["children"].items()):
+            w = child["value"] / total * width
+            if w >= 0.5:
+                y = height - (level + 1) * frame_height
+                hue = 20 + (hash(name) % 40)
+                share = f"{child['value'] / total:.1%}"
+                # Roughly 7px per monospace character at this font size.
+                visible = html.escape(name[:int(w / 7) - 1])
+                rects.append(
+                    f'<g><title>{html.escape(name)} ({child["value"]} samples, {share})</title>'
+                    f'<rect x="{x:.1f}" y="{y}" width="{w:.1f}" height="{frame_height - 1}" fill="hsl({hue},80%,60%)"/>'
+                    f'<text x="{x + 3:.1f}" y="{y + 12}" font-size="11">{visible}</text></g>'
+                )
+                draw(child, x, level + 1)
+            x += w
+
+    draw(root, 0.0, 0)
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" font-family="monospace">'
+        f'<text x="4" y="16" font-size="13">{html.escape(title)} ({root["value"]} samples)</text>'
+        + "".join(rects)
+        + "</svg>"
+    )
+
+
+profile_store = ProfileStore()
+default_profiler = SamplingProfiler(profile_store)
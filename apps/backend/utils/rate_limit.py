@@ -0,0 +1,252 @@
+import hashlib
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from jose import JWTError, jwt
+from starlette.responses import JSONResponse
+
+from auth.dependencies import JWT_ALGORITHM, JWT_SECRET_KEY
+from utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+
+def _proxy_hops(value: str) -> int:
+    """Number of trusted proxies in front of the app; "true" means one."""
+    value = value.strip().lower()
+    if value in ("", "0", "false", "no"):
+        return 0
+    if value in ("1", "true", "yes"):
+        return 1
+    return int(value)
+
+
+RATE_LIMIT_TRUST_PROXY = _proxy_hops(os.getenv("RATE_LIMIT_TRUST_PROXY", "0"))
+RATE_LIMIT_AUTH_PER_MINUTE = int(os.getenv("RATE_LIMIT_AUTH_PER_MINUTE", "10"))
+RATE_LIMIT_PREDICT_PER_MINUTE = int(os.getenv("RATE_LIMIT_PREDICT_PER_MINUTE", "30"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+RATE_LIMIT_DECISIONS = REGISTRY.counter(
+    "rate_limit_decisions_total",
+    "Requests checked by the rate limiter, by rule, key scope and decision.",
+    ("rule", "scope", "decision"),
+)
+RATE_LIMIT_BACKEND_ERRORS = REGISTRY.counter(
+    "rate_limit_backend_errors_total",
+    "Shared rate limit backend failures that fell back to the local counters.",
+)
+
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: float
+
+
+@dataclass(frozen=True)
+class RateLimitRule:
+    """`limit` requests per `window` seconds for each `scope` key ("ip" or "user") on the matched routes."""
+
+    name: str
+    paths: Tuple[str, ...]
+    limit: int
+    window: float = 60.0
+    scope: str = "ip"
+    methods: Tuple[str, ...] = ("POST",)
+
+    def matches(self, method: str, path: str) -> bool:
+        return method in self.methods and any(
+            path == prefix or path.startswith(prefix.rstrip("/") + "/") for prefix in self.paths
+        )
+
+
+AUTH_PATHS = ("/auth/login", "/auth/register", "/auth/refresh", "/api/login", "/api/signup")
+# Mounted paths (see app_factory.ROUTERS) of the routes that run the chart engine or call OpenAI.
+PREDICT_PATHS = ("/predict", "/api/predict", "/api/kp-chart", "/api/chat")
+
+DEFAULT_RULES: List[RateLimitRule] = [
+    RateLimitRule("auth", AUTH_PATHS, RATE_LIMIT_AUTH_PER_MINUTE, scope="ip"),
+    RateLimitRule("predict", PREDICT_PATHS, RATE_LIMIT_PREDICT_PER_MINUTE, scope="ip"),
+    RateLimitRule("predict", PREDICT_PATHS, RATE_LIMIT_PREDICT_PER_MINUTE, scope="user"),
+]
+
+
+def _sliding_window(current: int, previous: int, elapsed_fraction: float) -> float:
+    # Approximate sliding window: the previous fixed window is weighted by how much
+    # of it still overlaps the trailing `window` seconds.
+    return previous * (1 - elapsed_fraction) + current
+
+
+class MemoryRateLimitBackend:
+    """Per-process sliding-window counters. Also the local stand-in for the shared backend."""
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        # key -> [window_index, current_count, previous_count, window_seconds], least recently hit first
+        self._windows: Dict[str, list] = {}
+
+    async def hit(self, key: str, limit: int, window: float) -> RateLimitResult:
+        now = time.time()
+        index = int(now // window)
+        state = self._windows.pop(key, None)
+        if state is not None:
+            self._windows[key] = state
+        if state is None or state[0] < index - 1:
+            if state is None and len(self._windows) >= self.max_keys:
+                self._prune(now)
+            state = [index, 0, 0, window]
+            self._windows[key] = state
+        elif state[0] == index - 1:
+            state[0], state[1], state[2] = index, 0, state[1]
+        elapsed = (now % window) / window
+        if _sliding_window(state[1], state[2], elapsed) >= limit:
+            return RateLimitResult(False, limit, 0, window - now % window)
+        state[1] += 1
+        remaining = max(0, int(limit - _sliding_window(state[1], state[2], elapsed)))
+        return RateLimitResult(True, limit, remaining, 0.0)
+
+    def _prune(self, now: float):
+        stale = [key for key, (index, _, _, window) in self._windows.items() if index < int(now // window) - 1]
+        for key in stale:
+            del self._windows[key]
+        # Still full of live windows: drop the least recently hit, down to 90%
+        # so that the next new keys do not each pay for another scan.
+        excess = len(self._windows) - int(self.max_keys * 0.9)
+        for key in list(self._windows)[:max(0, excess)]:
+            del self._windows[key]
+
+
+class RedisRateLimitBackend:
+    """Sliding-window counters shared by all workers through Redis (requires the `redis` package)."""
+
+    def __init__(self, url: str = REDIS_URL, prefix: str = "ratelimit"):
+        import redis.asyncio as redis
+
+        self._redis = redis.from_url(url)
+        self.prefix = prefix
+
+    async def hit(self, key: str, limit: int, window: float) -> RateLimitResult:
+        now = time.time()
+        index = int(now // window)
+        current_key = f"{self.prefix}:{key}:{index}"
+        previous_key = f"{self.prefix}:{key}:{index - 1}"
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.incr(current_key)
+            pipe.expire(current_key, int(window * 2) + 1)
+            pipe.get(previous_key)
+            current, _, previous = await pipe.execute()
+        elapsed = (now % window) / window
+        # The increment already happened, so compare against the count before it.
+        estimated = _sliding_window(int(current) - 1, int(previous or 0), elapsed)
+        if estimated >= limit:
+            return RateLimitResult(False, limit, 0, window - now % window)
+        return RateLimitResult(True, limit, max(0, int(limit - estimated - 1)), 0.0)
+
+
+def get_rate_limit_backend(name: str = RATE_LIMIT_BACKEND):
+    if name == "redis":
+        return RedisRateLimitBackend()
+    return MemoryRateLimitBackend()
+
+
+def _client_ip(scope, trusted_hops: int) -> str:
+    """
+    The client address. Behind `trusted_hops` proxies it is the entry that many
+    places from the right of X-Forwarded-For: each proxy appends the address it
+    was reached from, and everything further left is whatever the client sent.
+    """
+    if trusted_hops:
+        forwarded = [
+            address.strip()
+            for header, value in scope.get("headers", [])
+            if header == b"x-forwarded-for"
+            for address in value.decode("latin-1").split(",")
+            if address.strip()
+        ]
+        if forwarded:
+            return forwarded[max(0, len(forwarded) - trusted_hops)]
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+def _user_identity(scope, trusted_hops: int) -> Optional[str]:
+    """
+    The subject of a validly signed bearer token, verified as auth.dependencies
+    does. Forged or expired tokens are keyed by client IP instead, so they can
+    neither spend another user's quota nor dodge the limit by rotating subjects.
+    """
+    for header, value in scope.get("headers", []):
+        if header == b"authorization":
+            scheme, _, credentials = value.decode("latin-1").partition(" ")
+            if scheme.lower() != "bearer" or not credentials:
+                return None
+            try:
+                subject = jwt.decode(credentials, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM]).get("sub")
+            except JWTError:
+                return f"ip:{_client_ip(scope, trusted_hops)}"
+            return str(subject) if subject else hashlib.sha256(credentials.encode()).hexdigest()[:32]
+    return None
+
+
+class RateLimitMiddleware:
+    """
+    ASGI middleware that sheds abusive traffic on the auth and prediction routes
+    before it reaches bcrypt or the chart engine.
+    """
+
+    def __init__(
+        self,
+        app,
+        rules: Sequence[RateLimitRule] = DEFAULT_RULES,
+        backend=None,
+        enabled: bool = RATE_LIMIT_ENABLED,
+        trust_proxy: int = RATE_LIMIT_TRUST_PROXY,
+    ):
+        self.app = app
+        self.rules = list(rules)
+        self.backend = backend or get_rate_limit_backend()
+        self.fallback = self.backend if isinstance(self.backend, MemoryRateLimitBackend) else MemoryRateLimitBackend()
+        self.enabled = enabled
+        self.trust_proxy = trust_proxy
+
+    async def _hit(self, key: str, rule: RateLimitRule) -> RateLimitResult:
+        try:
+            return await self.backend.hit(key, rule.limit, rule.window)
+        except Exception as e:
+            # Fail open onto local counters rather than rejecting traffic when the shared store is down.
+            logger.warning(f"Rate limit backend error, using local counters: {e}")
+            RATE_LIMIT_BACKEND_ERRORS.inc()
+            return await self.fallback.hit(key, rule.limit, rule.window)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.enabled:
+            await self.app(scope, receive, send)
+            return
+        method, path = scope["method"], scope["path"]
+        for rule in self.rules:
+            if not rule.matches(method, path):
+                continue
+            identity = _client_ip(scope, self.trust_proxy) if rule.scope == "ip" else _user_identity(scope, self.trust_proxy)
+            if identity is None:
+                continue
+            result = await self._hit(f"{rule.name}:{rule.scope}:{identity}", rule)
+            RATE_LIMIT_DECISIONS.inc(rule=rule.name, scope=rule.scope, decision="allowed" if result.allowed else "limited")
+            if not result.allowed:
+                response = JSONResponse(
+                    {"detail": "Too many requests"},
+                    status_code=429,
+                    headers={
+                        "Retry-After": str(max(1, int(result.retry_after + 0.999))),
+                        "X-RateLimit-Limit": str(result.limit),
+                        "X-RateLimit-Remaining": "0",
+                    },
+                )
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
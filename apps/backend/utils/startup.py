@@ -0,0 +1,91 @@
+"""
+Cold start report: how long a fresh interpreter takes to import the app and
+build it, broken down by top-level package from `python -X importtime`.
+
+    python -m utils.startup [module] [--top N]
+
+Exits non-zero when the measured cold start exceeds COLD_START_BUDGET_SECONDS
+or one of the SDKs meant to load lazily was imported eagerly.
+"""
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List, NamedTuple, Tuple
+
+# Import plus create_app(), measured in a fresh interpreter.
+COLD_START_BUDGET_SECONDS = float(os.getenv("COLD_START_BUDGET_SECONDS", "1.5"))
+# Imported by their accessors on first use, never at startup.
+LAZY_MODULES = ("openai", "stripe", "firebase_admin", "google.cloud.firestore", "reportlab", "numpy", "pyarrow")
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_ROOT = os.path.dirname(os.path.dirname(BACKEND_DIR))
+
+_PROBE = """
+import sys, time
+started = time.perf_counter()
+import {module}
+imported = time.perf_counter()
+getattr({module}, "create_app", lambda: None)()
+built = time.perf_counter()
+print(imported - started, built - imported)
+print(",".join(m for m in {lazy!r} if m in sys.modules))
+"""
+
+
+class ImportReport(NamedTuple):
+    import_seconds: float
+    create_seconds: float
+    # (top-level package, seconds spent importing its own modules), slowest first
+    packages: List[Tuple[str, float]]
+    eager_lazy_modules: List[str]
+
+    @property
+    def total_seconds(self) -> float:
+        return self.import_seconds + self.create_seconds
+
+
+def _parse_importtime(stderr: str) -> Dict[str, float]:
+    """Sum the self time of every `-X importtime` line per top-level package."""
+    per_package: Dict[str, int] = defaultdict(int)
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|", 2)
+        if not self_us.strip().isdigit():
+            continue  # the header line
+        per_package[name.strip().split(".")[0]] += int(self_us)
+    return {package: microseconds / 1e6 for package, microseconds in per_package.items()}
+
+
+def import_report(module: str = "app_factory") -> ImportReport:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [REPO_ROOT, BACKEND_DIR, env.get("PYTHONPATH")]))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _PROBE.format(module=module, lazy=LAZY_MODULES)],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    timings, eager = result.stdout.splitlines()[-2:]
+    import_seconds, create_seconds = map(float, timings.split())
+    packages = sorted(_parse_importtime(result.stderr).items(), key=lambda item: item[1], reverse=True)
+    return ImportReport(import_seconds, create_seconds, packages, [m for m in eager.split(",") if m])
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Report cold start time against the budget.")
+    parser.add_argument("module", nargs="?", default="app_factory")
+    parser.add_argument("--top", type=int, default=15, help="packages to list")
+    args = parser.parse_args(argv)
+    report = import_report(args.module)
+    print(f"{args.module}: import {report.import_seconds * 1000:.0f} ms, create_app {report.create_seconds * 1000:.0f} ms, "
+          f"budget {COLD_START_BUDGET_SECONDS * 1000:.0f} ms")
+    for package, seconds in report.packages[:args.top]:
+        print(f"  {seconds * 1000:8.1f} ms  {package}")
+    if report.eager_lazy_modules:
+        print(f"Imported at startup but meant to load lazily: {', '.join(report.eager_lazy_modules)}")
+    return 0 if report.total_seconds <= COLD_START_BUDGET_SECONDS and not report.eager_lazy_modules else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,409 @@
+import asyncio
+import contextvars
+import functools
+import json
+import logging
+import os
+import random
+import threading
+import time
+import urllib.request
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from utils.http_metrics import route_template
+
+logger = logging.getLogger(__name__)
+
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "false").lower() == "true"
+# file: JSON lines in TRACING_FILE; otlp: OTLP/HTTP JSON to a local collector.
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "file")
+TRACING_FILE = os.getenv("TRACING_FILE", "traces.jsonl")
+OTEL_EXPORTER_OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+# Fraction of new traces recorded; requests arriving with a sampled traceparent are always kept.
+TRACING_SAMPLE_RATE = float(os.getenv("TRACING_SAMPLE_RATE", "1.0"))
+TRACING_SERVICE_NAME = os.getenv("TRACING_SERVICE_NAME", "astrobalendar-backend")
+TRACING_MAX_QUEUE_SIZE = int(os.getenv("TRACING_MAX_QUEUE_SIZE", "2048"))
+TRACING_EXPORT_INTERVAL_SECONDS = float(os.getenv("TRACING_EXPORT_INTERVAL_SECONDS", "2"))
+TRACING_MAX_EXPORT_BATCH_SIZE = 512
+TRACEPARENT_HEADER = b"traceparent"
+
+
+class Span:
+    """
+    One timed operation in a trace. Spans of the same request share a trace id
+    and point at their parent, so a slow request can be broken down per stage.
+    """
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], sampled: bool, attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.attributes = attributes
+        self.status = "ok"
+        self.error: Optional[str] = None
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self._started = time.perf_counter_ns()
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def record_exception(self, error: BaseException):
+        self.status = "error"
+        self.error = f"{type(error).__name__}: {error}"
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        return None if self.end_ns is None else (self.end_ns - self.start_ns) / 1e6
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": self.duration_ms,
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class _NoopSpan:
+    """Handed out while tracing is disabled so instrumented code needs no checks."""
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def record_exception(self, error: BaseException):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+class FileSpanExporter:
+    """Appends finished spans to a JSON lines file, one span per line."""
+
+    def __init__(self, path: str = TRACING_FILE):
+        self.path = path
+
+    def export(self, spans: List[Span]):
+        with open(self.path, "a") as f:
+            for span in spans:
+                f.write(json.dumps(span.to_dict(), default=str) + "\n")
+
+    def shutdown(self):
+        pass
+
+
+def _otlp_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class OTLPSpanExporter:
+    """Posts spans to an OpenTelemetry collector over OTLP/HTTP with the JSON encoding."""
+
+    def __init__(self, endpoint: str = OTEL_EXPORTER_OTLP_ENDPOINT, service_name: str = TRACING_SERVICE_NAME, timeout: float = 5.0):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.timeout = timeout
+
+    def _encode(self, spans: List[Span]) -> bytes:
+        encoded = []
+        for span in spans:
+            item = {
+                "traceId": span.trace_id,
+                "spanId": span.span_id,
+                "name": span.name,
+                "kind": 1,
+                "startTimeUnixNano": str(span.start_ns),
+                "endTimeUnixNano": str(span.end_ns),
+                "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in span.attributes.items()],
+                # STATUS_CODE_OK = 1, STATUS_CODE_ERROR = 2
+                "status": {"code": 2, "message": span.error or ""} if span.status == "error" else {"code": 1},
+            }
+            if span.parent_id:
+                item["parentSpanId"] = span.parent_id
+            encoded.append(item)
+        payload = {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+            "scopeSpans": [{"scope": {"name": "astrobalendar"}, "spans": encoded}],
+        }]}
+        return json.dumps(payload).encode("utf-8")
+
+    def export(self, spans: List[Span]):
+        request = urllib.request.Request(
+            self.endpoint, data=self._encode(spans), headers={"Content-Type": "application/json"}, method="POST"
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+    def shutdown(self):
+        pass
+
+
+class SimpleSpanProcessor:
+    """Exports every span as soon as it ends, on the calling thread. Meant for tests and debugging."""
+
+    def __init__(self, exporter):
+        self.exporter = exporter
+
+    def on_end(self, span: Span):
+        self.exporter.export([span])
+
+    def force_flush(self):
+        pass
+
+    def shutdown(self):
+        self.exporter.shutdown()
+
+
+class BatchSpanProcessor:
+    """
+    Buffers finished spans and exports them from a background thread, so the
+    request path never waits on disk or on the collector. When the buffer is
+    full new spans are dropped rather than growing memory without bound.
+    Exports happen every `interval` seconds, or early once a full export batch
+    is waiting.
+    """
+
+    def __init__(
+        self,
+        exporter,
+        max_queue_size: int = TRACING_MAX_QUEUE_SIZE,
+        interval: float = TRACING_EXPORT_INTERVAL_SECONDS,
+        max_export_batch_size: int = TRACING_MAX_EXPORT_BATCH_SIZE,
+    ):
+        self.exporter = exporter
+        self.max_queue_size = max_queue_size
+        self.interval = interval
+        self.max_export_batch_size = max_export_batch_size
+        self.dropped = 0
+        self._queue: deque = deque()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._flushed = threading.Condition(self._lock)
+        self._exporting = False
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+
+    def on_end(self, span: Span):
+        with self._lock:
+            if len(self._queue) >= self.max_queue_size:
+                self.dropped += 1
+                return
+            self._queue.append(span)
+            if self._thread is None and not self._stopped:
+                self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+                self._thread.start()
+            if len(self._queue) >= self.max_export_batch_size:
+                self._wakeup.set()
+
+    def _export_pending(self):
+        with self._lock:
+            spans = list(self._queue)
+            self._queue.clear()
+            self._exporting = True
+        try:
+            for start in range(0, len(spans), self.max_export_batch_size):
+                self.exporter.export(spans[start:start + self.max_export_batch_size])
+        except Exception as e:
+            logger.warning(f"Exporting {len(spans)} spans failed: {e}")
+        finally:
+            with self._lock:
+                self._exporting = False
+                self._flushed.notify_all()
+
+    def _run(self):
+        while not self._stopped:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            self._export_pending()
+
+    def force_flush(self, timeout: float = 5.0):
+        if self._thread is None:
+            self._export_pending()
+            return
+        deadline = time.monotonic() + timeout
+        self._wakeup.set()
+        with self._lock:
+            while (self._queue or self._exporting) and time.monotonic() < deadline:
+                self._flushed.wait(deadline - time.monotonic())
+
+    def shutdown(self):
+        self._stopped = True
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+            self._thread = None
+        self._export_pending()
+        self.exporter.shutdown()
+
+
+class Tracer:
+    """
+    Minimal OpenTelemetry-style tracer. The active span is kept in a context
+    variable, so spans nest across awaits and asyncio.to_thread calls without
+    being passed around. Spans of unsampled traces are created but not exported.
+    """
+
+    def __init__(self, processor=None, enabled: bool = TRACING_ENABLED, sample_rate: float = TRACING_SAMPLE_RATE):
+        self.processor = processor
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+
+    def start_span(self, name: str, parent: Optional[Span] = None, root: bool = False, **attributes) -> Span:
+        """
+        Start a span without making it current; the caller must call end_span.
+        The parent defaults to the current span unless `root` is set.
+        """
+        if parent is None and not root:
+            parent = _current_span.get()
+        if parent is not None:
+            return Span(name, parent.trace_id, parent.span_id, parent.sampled, attributes)
+        sampled = self.sample_rate >= 1 or random.random() < self.sample_rate
+        return Span(name, os.urandom(16).hex(), None, sampled, attributes)
+
+    def end_span(self, span: Span):
+        span.end_ns = span.start_ns + (time.perf_counter_ns() - span._started)
+        if span.sampled and self.processor is not None:
+            self.processor.on_end(span)
+
+    @contextmanager
+    def span(self, name: str, parent: Optional[Span] = None, root: bool = False, **attributes):
+        if not self.enabled:
+            yield NOOP_SPAN
+            return
+        span = self.start_span(name, parent=parent, root=root, **attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            self.end_span(span)
+
+    def shutdown(self):
+        if self.processor is not None:
+            self.processor.shutdown()
+
+
+def _default_processor():
+    if TRACING_EXPORTER == "otlp":
+        return BatchSpanProcessor(OTLPSpanExporter())
+    return BatchSpanProcessor(FileSpanExporter())
+
+
+tracer = Tracer(_default_processor() if TRACING_ENABLED else None)
+
+
+def span(name: str, parent: Optional[Span] = None, root: bool = False, **attributes):
+    """Context manager timing the enclosed block as a child of the current span."""
+    return tracer.span(name, parent=parent, root=root, **attributes)
+
+
+def traced(name: str, **attributes):
+    """Decorator wrapping every call of a sync or async function in a span."""
+
+    def decorator(fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                if not tracer.enabled:
+                    return await fn(*args, **kwargs)
+                with tracer.span(name, **attributes):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return fn(*args, **kwargs)
+            with tracer.span(name, **attributes):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+def _parse_traceparent(value: bytes) -> Optional[Span]:
+    """Remote parent from a W3C traceparent header, e.g. 00-<trace id>-<span id>-01."""
+    try:
+        version, trace_id, span_id, flags = value.decode("ascii").split("-")
+        int(trace_id, 16), int(span_id, 16)
+        sampled = bool(int(flags, 16) & 1)
+    except (UnicodeDecodeError, ValueError):
+        return None
+    if len(trace_id) != 32 or len(span_id) != 16 or trace_id == "0" * 32:
+        return None
+    parent = Span("remote", trace_id, None, sampled, {})
+    parent.span_id = span_id
+    return parent
+
+
+class TracingMiddleware:
+    """
+    Opens the root span of each request, continuing the caller's trace when a
+    traceparent header is present, and returns the trace in a traceparent
+    response header so a slow request can be looked up in the exported spans.
+    """
+
+    def __init__(self, app: ASGIApp, tracer_: Optional[Tracer] = None, skip_paths=("/metrics", "/health")):
+        self.app = app
+        self.tracer = tracer_ or tracer
+        self.skip_paths = set(skip_paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not self.tracer.enabled or scope["path"] in self.skip_paths:
+            await self.app(scope, receive, send)
+            return
+
+        parent = None
+        for name, value in scope.get("headers", []):
+            if name == TRACEPARENT_HEADER:
+                parent = _parse_traceparent(value)
+                break
+
+        method = scope["method"]
+        with self.tracer.span(f"{method} {scope['path']}", parent=parent, root=parent is None, **{"http.method": method}) as request_span:
+            async def traced_send(message: Message):
+                if message["type"] == "http.response.start":
+                    request_span.set_attribute("http.status_code", message["status"])
+                    if message["status"] >= 500:
+                        request_span.status = "error"
+                    headers = list(message.get("headers", []))
+                    headers.append((TRACEPARENT_HEADER, request_span.traceparent.encode()))
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            try:
+                await self.app(scope, receive, traced_send)
+            finally:
+                # Named after the route template once routing has run, so spans group per endpoint.
+                route = route_template(scope)
+                request_span.name = f"{method} {route}"
+                request_span.set_attribute("http.route", route)